@@ -1,19 +1,68 @@
 # app.py
 
-import os, json
-from flask import Flask, request, jsonify, render_template, session
+import os
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, Response, request, jsonify, render_template, session, g
 from flask_cors import CORS
-from config import get_logger
-from utils import extract
-from chat import respond
+from config import get_logger, preview
+from utils import extract, guides, scrape, claim_reply, finish_reply, load_reply, post_reply
+from dedup import Deduplicator
+from metrics import ERRORS, QUERY_RESPONSES, observe_query, register_collector, render
+from chat import respond, failed_reply, is_failed_reply
+from timing import start_request
+from sessions import ServerSideSessionInterface, make_backend
 
 # Setup logging
 _LOGGER = get_logger(__name__)
 
+# Worker pool for request stages that can run alongside the rest of the
+# pipeline (currently the guides retrieval, which only depends on the message).
+_PIPELINE = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("pipelineWorkers", 8)),
+    thread_name_prefix="pipeline"
+)
+
+# Reply mode for /query. "sync" answers in the webhook response; "deferred"
+# acknowledges at once, builds the reply on _REPLIES and posts it with
+# chat.postMessage, so slow model calls never time out the outgoing webhook.
+_REPLY_MODE = os.environ.get("replyMode", "sync")
+_REPLIES = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("replyWorkers", 16)),
+    thread_name_prefix="reply"
+)
+
+# Rocket.Chat retries webhooks on timeout. Sync-mode deliveries of a
+# message_id already being answered wait for that answer; later ones get it
+# replayed. "memory" (default) deduplicates within this process at no
+# storage cost; dedupStore="dynamodb" also spans workers via the reply
+# ledger, at the price of a claim and a result write to DynamoDB around
+# every request.
+_DEDUP_SHARED = os.environ.get("dedupStore", "memory") == "dynamodb"
+_DEDUP = Deduplicator(
+    ttl=float(os.environ.get("dedupTtl", 600)),
+    maxsize=int(os.environ.get("dedupCacheSize", 1024)),
+    wait=float(os.environ.get("dedupWait", 60)),
+    poll=float(os.environ.get("dedupPoll", 0.5)),
+    claim=claim_reply if _DEDUP_SHARED else None,
+    load=load_reply if _DEDUP_SHARED else None,
+    finish=finish_reply if _DEDUP_SHARED else None,
+    # Results are (payload, status); failed answers are retried, not replayed
+    keep=lambda result: result[1] < 500 and not is_failed_reply(result[0]),
+)
+
+register_collector(lambda: [(
+    "dedup_deliveries_total", "counter", "/query deliveries by how the message_id was answered.",
+    {(("outcome", k),): v for k, v in _DEDUP.stats().items() if k not in ("inflight", "cached")},
+)])
+
 # Creates a Flask app instance so Flask can locate resources. 
 app = Flask(__name__)
 app.secret_key = os.environ.get("flaskSecret")
 
+# Keep session data (chat logs, resume sections) server-side; the cookie only
+# carries a session key.
+app.session_interface = ServerSideSessionInterface(make_backend())
+
 # Check for dev state. Will raise an error if in Koyeb environment.
 try:
     _ENV      = os.environ.get("flaskEnv")
@@ -38,12 +87,18 @@ def main():
     - Extracts relevant user information from the request payload.
     - Logs request details and extracted user data.
     - Ignores bot-generated messages.
+    - Starts the guides retrieval concurrently with the DynamoDB user lookup
+      and URL scraping, and records per-stage timings.
     - Passes the extracted data to the chatbot response handler.
+    - Answers each message_id once; retried deliveries get the same reply.
+    - In "deferred" reply mode, acknowledges at once and posts the reply to
+      the user's room from a background worker instead.
 
     Returns:
         - JSON response from `respond()` if the request is valid.
         - HTTP 400 error if the request is not JSON.
         - JSON response indicating ignored bot messages.   
+        - An empty JSON acknowledgement in "deferred" reply mode.
     """    
     # Delineate logs
     _LOGGER.info("|" * 51)
@@ -57,11 +112,50 @@ def main():
      
     # Get data and log it
     data = request.get_json() 
-    _LOGGER.info(f"HTTP POST: {json.dumps(data, separators=(',', ':'))}")
+    _LOGGER.info("HTTP POST: %s", preview(data))
+
+    if _REPLY_MODE == "deferred" and isinstance(data, dict):
+        return _defer(data)
+
+    mid = data.get("message_id") if isinstance(data, dict) else None
+    if not mid:
+        return _handle(data)
+
+    # Retries get the original delivery's reply. If that delivery is running
+    # on another worker and does not finish within dedupWait, the retry only
+    # gets an empty acknowledgement.
+    result = _DEDUP.run(str(mid), lambda: _result(_handle(data)))
+    if result is None:
+        return jsonify({})
+    payload, status = result
+    return jsonify(payload), status
+
+
+def _result(response) -> tuple:
+    """Reduce a Flask response to a JSON-serializable (payload, status) pair."""
+    return (response.get_json(silent=True), response.status_code)
+
+
+def _handle(data):
+    """
+    Run the /query pipeline for one request inside the current request context.
+
+    Returns:
+        The Flask response for the request.
+    """
+    timer = start_request()
+
+    # The guides retrieval only needs the message text, so start it now and
+    # let it overlap with the DynamoDB work in extract() and URL scraping.
+    text = data.get("text", "") if isinstance(data, dict) else ""
+    gbl_future = None
+    if isinstance(data, dict) and isinstance(text, str) and not bool(data.get("bot")):
+        gbl_future = _PIPELINE.submit(timer.wrap("guides", guides), text)
     
     # Extract relevant information plus collect & store user data
-    user, uid, new, sid, msg, files, rsme = extract(data)
-    _LOGGER.info(f"User <{user}>: uid <{uid}>, sid <{sid}>, new <{new}>, msg <{msg}>, rmse <{rsme}>, files <{bool(files)}>")
+    with timer.stage("extract"):
+        user, uid, new, sid, msg, files, rsme = extract(data)
+    _LOGGER.info("User <%s>: uid <%s>, sid <%s>, new <%s>, msg <%s>, rmse <%s>, files <%s>", user, uid, sid, new, preview(msg), rsme, bool(files))
     
     session[sid] = session.get(sid, {})
     session[sid]["user_name"] = user
@@ -72,15 +166,91 @@ def main():
         return jsonify({"status": "ignored"})
     
     # ✅ Scrape any URLs and get guiding context before responding
-    from utils import guides, scrape
-    has_urls, failed, urls_failed = scrape(sid, msg)
-    gbl = guides(msg)
+    with timer.stage("scrape"):
+        has_urls, failed, urls_failed = scrape(sid, msg)
+    # Payloads whose text is not a string never started the retrieval; fall
+    # back to the validated message
+    gbl = gbl_future.result() if gbl_future else guides(msg)
+
+    resp = respond(msg=msg, sid=sid, uid=uid, has_urls=has_urls, urls_failed=urls_failed, rsme=rsme, gbl=gbl)
+    _LOGGER.info("Stage timings: %s", timer)
+    return resp
+
+
+def _defer(data: dict):
+    """
+    Acknowledge a webhook delivery immediately and answer it in the background.
+    Deliveries of a message_id that was already claimed are acknowledged
+    without generating anything.
+    """
+    mid = data.get("message_id")
+    if mid and not claim_reply(str(mid)):
+        return jsonify({})
+
+    # The request body was already parsed, so the copied environ only serves
+    # to rebuild the request context (headers, session cookie) on the worker.
+    _REPLIES.submit(_deliver, request.environ.copy(), data)
+    _LOGGER.info(f"Reply to message <{mid}> deferred.")
+    return jsonify({})
+
+
+def _deliver(environ: dict, data: dict) -> None:
+    """
+    Background job: run the pipeline for a deferred request, post the reply to
+    the user's room and record the outcome in the reply ledger.
+    """
+    mid = data.get("message_id")
+    room_id = data.get("channel_id", "")
+    user = data.get("user_name", "")
+    payload = None
+    with app.request_context(environ):
+        try:
+            payload = _handle(data).get_json(silent=True)
+        except Exception as e:
+            _LOGGER.error(f"Deferred reply to message <{mid}> failed: {e}", exc_info=True)
+            ERRORS.inc(kind="deferred")
+            payload = failed_reply()
+        finally:
+            app.session_interface.save_session(app, session._get_current_object(), Response())
+            if "timer" in g:
+                observe_query(g.timer, mode="deferred")
+
+    delivered = True
+    if isinstance(payload, dict) and payload.get("text"):
+        delivered = post_reply(payload, room_id=room_id, user=user)
+    if mid:
+        # Release the claim after a failed answer so a retry tries again
+        finish_reply(str(mid), delivered and not is_failed_reply(payload))
+
+
+@app.after_request
+def _observe(response):
+    """Record status and, if the pipeline ran, stage timings for /query."""
+    if request.endpoint == "main":
+        QUERY_RESPONSES.inc(status=response.status_code)
+        if "timer" in g:
+            observe_query(g.timer)
+    return response
+
+
+@app.teardown_request
+def _count_errors(exc):
+    if exc is not None and request.endpoint == "main":
+        ERRORS.inc(kind="unhandled")
+
+
+# Prometheus-style metrics for this worker process
+@app.route('/metrics')
+def metrics():
+    """
+    Serves request, stage, upstream and cache metrics in the Prometheus text
+    exposition format. Values are per worker process.
+
+    Returns:
+        - Plain-text metrics page.
+    """
+    return Response(render(), mimetype="text/plain; version=0.0.4")
 
-    return respond(msg=msg, sid=sid, uid=uid, has_urls=has_urls, urls_failed=urls_failed, rsme=rsme, gbl=gbl)
-    
-#    else:
-#        return respond(data, user, uid, new, sid, msg, files, rsme)
-    
 # Dev route; displays a basic prompt/response page that uses /query
 @app.route('/dev')
 def dev():
@@ -0,0 +1,220 @@
+# asgi.py
+# Async serving mode: `uvicorn asgi:app`. POST /query awaits the LLMProxy
+# calls instead of holding a thread through them, so one process can keep
+# hundreds of conversations waiting on the model. DynamoDB, session and
+# scraping work still runs on a bounded thread pool. Every other route is
+# served by the Flask app in app.py, which keeps working under gunicorn.
+
+import os, json, asyncio
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.test import EnvironBuilder
+from werkzeug.wrappers import Request, Response
+from flask import g
+from flask.ctx import RequestContext
+from config import get_logger, preview
+from app import app as flask_app, _DEDUP
+from utils import extract, aguides, scrape, stored_turns
+from chat import respond, is_command, prepare_query, generation_args, finish_query
+from llmproxy import agenerate, aclose
+from timing import StageTimer
+from metrics import ERRORS, QUERY_RESPONSES, observe_query
+
+# Setup logging
+_LOGGER = get_logger(__name__)
+
+# Threads for the blocking parts of a request (DynamoDB, sessions, scraping).
+# These calls are short, so far fewer threads than concurrent requests are needed.
+_STORAGE_WORKERS = int(os.environ.get("asyncStorageWorkers", 32))
+_MAX_BODY        = int(os.environ.get("asyncMaxBody", 1024 * 1024))
+_REPLY_MODE      = os.environ.get("replyMode", "sync")
+
+
+async def app(scope, receive, send):
+    """ASGI entry point."""
+    if scope["type"] == "lifespan":
+        return await _lifespan(receive, send)
+    if scope["type"] != "http":
+        return
+
+    body = await _read_body(receive)
+    if body is None:
+        response = Response(json.dumps({"error": "Request body too large"}), status=413, mimetype="application/json")
+    else:
+        environ = _environ(scope, body)
+        # Deferred replies are acknowledged at once by the Flask handler
+        if scope["path"] == "/query" and scope["method"] == "POST" and _REPLY_MODE != "deferred":
+            response = await query(environ, body)
+            QUERY_RESPONSES.inc(status=response.status_code)
+        else:
+            response = await asyncio.to_thread(Response.from_app, flask_app, environ)
+    await _send(send, response)
+
+
+async def query(environ: dict, body: bytes) -> Response:
+    """
+    Async counterpart of `app.main`: same stages, same responses.
+
+    Parameters:
+        environ (dict): WSGI environ built from the ASGI scope, used to push
+            Flask request contexts for the blocking stages.
+        body (bytes): The raw request body.
+
+    Returns:
+        Response: The JSON response, with the session cookie set.
+    """
+    _LOGGER.info("|" * 51)
+    _LOGGER.info("|" * 13 + " NEW INTERACTION STARTED " + "|" * 13)
+    _LOGGER.info("|" * 51)
+
+    request = Request(environ)
+    if not request.is_json:
+        _LOGGER.warning("Error: Non-JSON request. Request blocked.")
+        return _json({"error": "Invalid content type"}, 400)
+    try:
+        data = json.loads(body)
+    except ValueError:
+        _LOGGER.warning("Error: Malformed JSON. Request blocked.")
+        return _json({"error": "Invalid JSON"}, 400)
+    _LOGGER.info("HTTP POST: %s", preview(data))
+
+    sess = await asyncio.to_thread(flask_app.session_interface.open_session, flask_app, request)
+
+    mid = data.get("message_id") if isinstance(data, dict) else None
+    try:
+        if not mid:
+            response = await _pipeline(environ, data, sess)
+        else:
+            # Retries get the original delivery's reply, as in app.main; the
+            # deduplicator is shared with the Flask handler in this process.
+            result = await _DEDUP.arun(str(mid), lambda: _pipeline_result(environ, data, sess))
+            response = _json({}) if result is None else _json(*result)
+    except Exception as e:
+        _LOGGER.error(f"Async /query failed: {e}", exc_info=True)
+        ERRORS.inc(kind="unhandled")
+        return _json({"error": "Internal server error"}, 500)
+
+    await asyncio.to_thread(flask_app.session_interface.save_session, flask_app, sess, response)
+    return response
+
+
+async def _pipeline_result(environ: dict, data, sess) -> tuple:
+    """Run `_pipeline` and reduce its response to a JSON-serializable (payload, status) pair."""
+    response = await _pipeline(environ, data, sess)
+    return (response.get_json(silent=True), response.status_code)
+
+
+async def _pipeline(environ: dict, data, sess) -> Response:
+    """Run the /query stages for one parsed request, sharing `sess` across them."""
+    timer = StageTimer()
+    records = {}
+
+    def run(func, *args, **kwargs):
+        # Blocking stages use flask.session/g, so each runs in its own request
+        # context sharing this request's session, timer and loaded user records.
+        with RequestContext(flask_app, environ, session=sess):
+            g.timer = timer
+            g.user_records = records
+            return func(*args, **kwargs)
+
+    try:
+        # Guides retrieval only needs the message text; start it right away
+        text = data.get("text", "") if isinstance(data, dict) else ""
+        gbl_task = None
+        if isinstance(data, dict) and isinstance(text, str) and not bool(data.get("bot")):
+            gbl_task = asyncio.create_task(_timed(timer, "guides", aguides(text)))
+
+        with timer.stage("extract"):
+            user, uid, new, sid, msg, files, rsme = await asyncio.to_thread(run, extract, data)
+        _LOGGER.info("User <%s>: uid <%s>, sid <%s>, new <%s>, msg <%s>, rmse <%s>, files <%s>", user, uid, sid, new, preview(msg), rsme, bool(files))
+
+        sess[sid] = sess.get(sid, {})
+        sess[sid]["user_name"] = user
+
+        if bool(data.get("bot")) == True:
+            _LOGGER.info("Bot message detected; message ignored.")
+            return _json({"status": "ignored"})
+
+        with timer.stage("scrape"):
+            has_urls, failed, urls_failed = await asyncio.to_thread(run, scrape, sid, msg)
+        gbl = await gbl_task if gbl_task else await aguides(msg)
+
+        if is_command(msg):
+            response = await asyncio.to_thread(
+                run, respond, msg=msg, sid=sid, uid=uid, has_urls=has_urls,
+                urls_failed=urls_failed, rsme=rsme, gbl=gbl
+            )
+        else:
+            stored = await asyncio.to_thread(run, stored_turns, uid)
+            system, query, limits = prepare_query(msg=msg, sid=sid, rsme=rsme, gbl=gbl,
+                                                  history=sess[sid].get("chat_log", []), stored=stored)
+            with timer.stage("generate"):
+                resp = await agenerate(**generation_args(system, query, sid, limits))
+            with timer.stage("parse"):
+                response = _json(await asyncio.to_thread(run, finish_query, msg=msg, sid=sid, uid=uid, resp=resp))
+        _LOGGER.info("Stage timings: %s", timer)
+        return response
+    finally:
+        observe_query(timer, mode="async")
+
+
+async def _timed(timer: StageTimer, name: str, coro):
+    with timer.stage(name):
+        return await coro
+
+
+def _json(payload: dict, status: int = 200) -> Response:
+    return Response(json.dumps(payload), status=status, mimetype="application/json")
+
+
+def _environ(scope: dict, body: bytes) -> dict:
+    headers = [(k.decode("latin-1"), v.decode("latin-1")) for k, v in scope.get("headers", [])]
+    builder = EnvironBuilder(
+        path=scope["path"],
+        base_url=f"{scope.get('scheme', 'http')}://{dict(headers).get('host', 'localhost')}{scope.get('root_path', '')}",
+        query_string=scope.get("query_string", b"").decode("latin-1"),
+        method=scope["method"],
+        headers=headers,
+        data=body,
+    )
+    try:
+        return builder.get_environ()
+    finally:
+        builder.close()
+
+
+async def _read_body(receive) -> bytes | None:
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > _MAX_BODY:
+            return None
+        chunks.append(chunk)
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+
+async def _send(send, response: Response) -> None:
+    await send({
+        "type": "http.response.start",
+        "status": response.status_code,
+        "headers": [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in response.headers.items()],
+    })
+    await send({"type": "http.response.body", "body": response.get_data()})
+
+
+async def _lifespan(receive, send) -> None:
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            loop = asyncio.get_running_loop()
+            loop.set_default_executor(ThreadPoolExecutor(max_workers=_STORAGE_WORKERS, thread_name_prefix="storage"))
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await aclose()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
@@ -0,0 +1,72 @@
+# benchmarks/dynamo_calls.py
+# Count DynamoDB calls made by utils.extract for one /query against a local
+# stub table. Calls made by background threads (write-behind queue, SID pool
+# refiller) are reported separately. No AWS credentials or network access
+# are needed.
+#
+# Usage: python benchmarks/dynamo_calls.py [requests]
+
+import os, sys, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("logDir", "/tmp")
+os.environ.setdefault("awsRegion", "us-east-1")
+os.environ.setdefault("dynamoTable", "benchmark")
+
+from flask import Flask
+from tests.fakes import StubTable
+import utils
+
+
+def _payload(uid: str, n: int) -> dict:
+    return {
+        "user_id": uid,
+        "user_name": f"user{uid}",
+        "text": "Can you help me with my education section?",
+        "message_id": f"m{n}",
+        "channel_id": "c1",
+        "timestamp": str(time.time()),
+    }
+
+
+def run(requests: int = 100, latency: float = 0.0) -> None:
+    table = StubTable(latency)
+    utils._TABLE = table
+    utils._DYNAMO_DB = table
+    utils._INTERACTIONS.resource = table
+
+    # Let the refiller stock the SID pool before the first new user arrives
+    utils._ensure_sid_refiller()
+    time.sleep(0.5 + latency * len(utils._SID_SLOTS) * 2)
+    app = Flask(__name__)
+    app.secret_key = "benchmark"
+
+    for label, uid in (("new user", "u_new"), ("returning user", "u_new")):
+        table.calls.clear()
+        with app.test_request_context():
+            utils.extract(_payload(uid, 0))
+        print(f"{label:<16} {sum(table.calls.values())} calls on the request path {dict(table.calls)}")
+
+    table.calls.clear()
+    start = time.perf_counter()
+    for n in range(requests):
+        with app.test_request_context():
+            utils.extract(_payload("u_new", n))
+    elapsed = time.perf_counter() - start
+    utils._INTERACTIONS.stop()
+    print(f"{requests} returning-user requests: {sum(table.calls.values()) / requests:.2f} calls/request "
+          f"on the request path, {elapsed / requests * 1000:.2f} ms/request at {latency * 1000:.0f} ms/call")
+    print(f"background calls overall: {dict(table.background)}")
+
+    table.calls.clear()
+    start = time.perf_counter()
+    for n in range(requests):
+        with app.test_request_context():
+            utils.extract(_payload(f"burst{n}", n))
+    elapsed = time.perf_counter() - start
+    print(f"{requests} new users in a burst: {sum(table.calls.values()) / requests:.2f} calls/request "
+          f"on the request path {dict(table.calls)}, {elapsed / requests * 1000:.2f} ms/request")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100, latency=0.005)
@@ -0,0 +1,99 @@
+# benchmarks/html_extract.py
+# Throughput and text quality of the HTML-to-text engines in htmltext.py on
+# career-portal pages: the previous BeautifulSoup html.parser path ("bs4")
+# and the streaming lxml extractor ("lxml"). Pages are fed in 64 KB chunks,
+# as they arrive from the network.
+#
+# Quality is measured on generated pages whose content is known: recall is
+# the share of job-description sentences in the output, noise the share of
+# boilerplate phrases (menus, related jobs, cookie banner, footer). Saved
+# pages can be added by passing a directory of .html files; for those only
+# speed and output size are reported.
+#
+# Usage: python benchmarks/html_extract.py [rounds] [html_dir]
+
+import os, sys, glob, json, time, random, tempfile, statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("logDir", tempfile.gettempdir())
+
+import htmltext
+
+_RANDOM = random.Random(0)
+_WORDS = ("analyze data build dashboards partner stakeholders python sql reporting "
+          "metrics design experiments communicate insights team product growth").split()
+_CHUNK = 64 * 1024
+
+
+def _sentence(n: int) -> str:
+    return " ".join(_RANDOM.choice(_WORDS) for _ in range(n)).capitalize() + f" {_RANDOM.randrange(10**6)}."
+
+
+def _page(landmark: bool, related: int = 40, state_kb: int = 300) -> tuple:
+    """Return (html bytes, content sentences, boilerplate phrases)."""
+    content = [_sentence(14) for _ in range(40)]
+    menu = [f"Menu item {i} {_RANDOM.randrange(10**6)}" for i in range(80)]
+    jobs = [f"Related job {i} {_RANDOM.randrange(10**6)}" for i in range(related)]
+    footer = [f"Footer link {i} {_RANDOM.randrange(10**6)}" for i in range(40)]
+    cookie = f"We use cookies to improve your experience {_RANDOM.randrange(10**6)}."
+    state = json.dumps({"jobs": [{"id": i, "text": _sentence(10)} for i in range(state_kb * 8)]})
+
+    links = lambda items: "".join(f'<li class="item"><a href="/x/{i}">{t}</a></li>' for i, t in enumerate(items))
+    description = (
+        "<h1>Data Analyst</h1>"
+        + "".join(f"<p>{s}</p>" for s in content[:20])
+        + "<h2>Requirements</h2><ul>" + "".join(f"<li>{s}</li>" for s in content[20:]) + "</ul>"
+    )
+    body = (
+        f'<div class="top"><div class="logo"><a href="/">Acme Careers</a></div><ul class="menu">{links(menu)}</ul></div>'
+        + f'<div class="cookie-banner"><p>{cookie}</p><button>Accept</button></div>'
+        + (f'<div role="main" class="job">{description}</div>' if landmark else f'<div class="job">{description}</div>')
+        + f'<div class="related"><h3>Similar jobs</h3><ul>{links(jobs)}</ul></div>'
+        + f'<div class="bottom"><ul>{links(footer)}</ul><p>&copy; Acme</p></div>'
+    )
+    html = (
+        '<!DOCTYPE html><html><head><meta charset="utf-8"><title>Data Analyst | Acme Careers</title>'
+        + "<style>" + ".c{color:red}" * 2000 + "</style>"
+        + f"<script>window.__STATE__ = {state};</script></head><body>{body}"
+        + "<script>" + "track();" * 2000 + "</script></body></html>"
+    )
+    return (html.encode(), content, menu + jobs + footer + [cookie])
+
+
+def _chunks(body: bytes):
+    for i in range(0, len(body), _CHUNK):
+        yield body[i:i + _CHUNK]
+
+
+def _time(engine: str, body: bytes, rounds: int) -> tuple:
+    samples, text = [], ""
+    for _ in range(rounds):
+        start = time.perf_counter()
+        text = htmltext.html_to_text(_chunks(body), engine=engine)
+        samples.append(time.perf_counter() - start)
+    return (statistics.median(samples), text)
+
+
+def run(rounds: int = 5, html_dir: str | None = None) -> None:
+    pages = [("with role=main", *_page(True)), ("no landmark", *_page(False))]
+    saved = sorted(glob.glob(os.path.join(html_dir, "*.html"))) if html_dir else []
+    for path in saved:
+        with open(path, "rb") as f:
+            pages.append((os.path.basename(path), f.read(), None, None))
+
+    print(f"{len(pages)} pages, median of {rounds} rounds")
+    for name, body, content, boilerplate in pages:
+        print(f"{name} ({len(body) / 1024:.0f} KB)")
+        for engine in ("bs4", "lxml"):
+            seconds, text = _time(engine, body, rounds)
+            line = f"  {engine:<5} {seconds * 1000:8.1f} ms  {len(body) / seconds / 2**20:7.1f} MB/s  {len(text):7d} chars"
+            if content is not None:
+                recall = sum(s in text for s in content) / len(content)
+                noise = sum(p in text for p in boilerplate) / len(boilerplate)
+                line += f"  recall {recall:6.1%}  noise {noise:6.1%}"
+            print(line)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:3]
+    run(*(int(a) for a in args[:1]), *args[1:2])
@@ -0,0 +1,87 @@
+# benchmarks/ingest_parallel.py
+# Time attachment ingestion (Rocket.Chat download + LLMProxy upload) with a
+# single file worker versus the bounded pool, against a local fake
+# Rocket.Chat file server and a fake LLMProxy endpoint.
+#
+# Usage: python benchmarks/ingest_parallel.py [files] [size_kb]
+
+import os, sys, time, socket, tempfile, threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("logDir", tempfile.gettempdir())
+os.environ.setdefault("awsRegion", "us-east-1")
+os.environ.setdefault("dynamoTable", "benchmark")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    delay = 0.0
+    size = 0
+
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def _reply(self, body: bytes, content_type: str):
+        if self.delay:
+            time.sleep(self.delay)
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeRocketChat(_Handler):
+    """Serves /file-upload/<id>/<name> with `size` bytes of PDF-ish content."""
+    def do_GET(self):
+        self._reply(b"%PDF-1.4\n" + os.urandom(max(0, self.size - 9)), "application/pdf")
+
+
+class FakeProxy(_Handler):
+    """Accepts LLMProxy `add` uploads."""
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self._reply(b"{}", "application/json")
+
+
+def _serve(handler) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run(files: int = 6, size_kb: int = 512, delay: float = 0.2) -> None:
+    FakeRocketChat.size, FakeRocketChat.delay = size_kb * 1024, delay
+    FakeProxy.delay = delay
+    rocket, proxy = _serve(FakeRocketChat), _serve(FakeProxy)
+
+    os.environ.update(rocketUrl=f"http://127.0.0.1:{rocket.server_address[1]}",
+                      rocketUid="bench", rocketToken="bench")
+    import llmproxy, utils
+    llmproxy.end_point = f"http://127.0.0.1:{proxy.server_address[1]}"
+    utils._ROCKET_URL = os.environ["rocketUrl"]
+
+    attachments = [{"_id": f"id{i}", "name": f"resume_{i}.pdf"} for i in range(files)]
+    for workers in (1, 4, files):
+        utils._FILE_POOL = ThreadPoolExecutor(max_workers=workers)
+        start = time.perf_counter()
+        results = utils._ingest_files(attachments, "bench-sid")
+        elapsed = time.perf_counter() - start
+        ok = sum(r["ok"] for r in results)
+        mb = sum(r["bytes"] for r in results) / 1e6
+        print(f"{workers:>2} worker(s): {ok}/{files} ok, {mb:.1f} MB in {elapsed:.2f}s "
+              f"({files / elapsed:.1f} files/s)")
+
+    rocket.shutdown()
+    proxy.shutdown()
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    run(*args)
@@ -0,0 +1,137 @@
+# benchmarks/load_query.py
+# Load-test /query in both serving modes against a fake LLMProxy that takes
+# `delay` seconds per call and an in-memory DynamoDB stub:
+#   - sync: the Flask app on a WSGI server with a fixed number of worker
+#     threads (like gunicorn's gthread worker)
+#   - async: asgi.app under uvicorn in a single event loop
+#
+# Usage: python benchmarks/load_query.py [requests] [concurrency] [sync_workers] [delay]
+
+import os, sys, json, time, socket, asyncio, tempfile, threading, statistics, http.cookiejar
+from concurrent.futures import ThreadPoolExecutor
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _ROOT)
+for _key, _value in {
+    "logDir": tempfile.gettempdir(), "awsRegion": "us-east-1", "dynamoTable": "benchmark",
+    "systemPrompt": os.path.join(_ROOT, "templates", "model", "system.txt"),
+    "welcomePage": os.path.join(_ROOT, "templates", "model", "welcome.md"),
+    "model": "benchmark", "temp": "0", "lastK": "0", "rag": "", "ragK": "0", "ragThr": "0.5",
+}.items():
+    os.environ.setdefault(_key, _value)
+
+import httpx, uvicorn
+from werkzeug.serving import BaseWSGIServer
+from tests.fakes import FakeProxy, ProxyServer, StubTable
+
+
+class _PooledWSGIServer(BaseWSGIServer):
+    """Single-process WSGI server handling requests on a fixed thread pool."""
+    request_queue_size = 1024
+
+    def __init__(self, host: str, port: int, app, workers: int):
+        super().__init__(host, port, app)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="wsgi")
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _serve_sync(workers: int):
+    from app import app
+    server = _PooledWSGIServer("127.0.0.1", _free_port(), app, workers)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.port, server.shutdown
+
+
+def _serve_async():
+    import asgi
+    server = uvicorn.Server(uvicorn.Config(asgi.app, host="127.0.0.1", port=_free_port(),
+                                           log_level="warning", lifespan="on", ws="none"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("uvicorn failed to start")
+        time.sleep(0.05)
+
+    def stop():
+        server.should_exit = True
+        thread.join()
+    return server.config.port, stop
+
+
+async def _load(port: int, requests: int, concurrency: int, tag: str) -> tuple:
+    latencies, errors = [], 0
+    limit = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=0)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=300) as client:
+        # Every request is a different user; never send a session cookie back
+        client.cookies.jar.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+
+        async def one(n: int):
+            nonlocal errors
+            payload = {
+                "user_id": f"{tag}{n}", "user_name": f"user{n}", "message_id": f"{tag}m{n}",
+                "text": f"How should I word bullet point {n} of my {tag} resume?",
+                "channel_id": "c1", "timestamp": str(time.time()),
+            }
+            async with limit:
+                start = time.perf_counter()
+                try:
+                    resp = await client.post("/query", json=payload)
+                    if resp.status_code != 200 or "text" not in resp.json():
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(n) for n in range(requests)))
+        return time.perf_counter() - start, latencies, errors
+
+
+def _report(label: str, elapsed: float, latencies: list, errors: int) -> None:
+    latencies = sorted(latencies)
+    p50 = statistics.median(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{label:<22} {len(latencies) / elapsed:7.1f} req/s   p50 {p50:6.2f}s   p99 {p99:6.2f}s   "
+          f"errors {errors}   ({elapsed:.1f}s total)")
+
+
+def run(requests: int = 400, concurrency: int = 200, sync_workers: int = 8, delay: float = 0.25) -> None:
+    FakeProxy.delay = delay
+    proxy = ProxyServer(("127.0.0.1", 0), FakeProxy)
+    threading.Thread(target=proxy.serve_forever, daemon=True).start()
+
+    import llmproxy, utils
+    llmproxy.end_point = f"http://127.0.0.1:{proxy.server_address[1]}"
+    table = StubTable(latency=0.005)
+    utils._TABLE = utils._DYNAMO_DB = utils._INTERACTIONS.resource = table
+
+    print(f"{requests} requests, {concurrency} concurrent, {delay * 1000:.0f} ms per LLMProxy call")
+    for label, serve, tag in ((f"sync ({sync_workers} threads)", lambda: _serve_sync(sync_workers), "s"),
+                              ("async (1 event loop)", _serve_async, "a")):
+        port, stop = serve()
+        _report(label, *asyncio.run(_load(port, requests, concurrency, tag)))
+        stop()
+    proxy.shutdown()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:5]
+    run(*(int(a) for a in args[:3]), *(float(a) for a in args[3:]))
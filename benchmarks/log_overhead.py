@@ -0,0 +1,115 @@
+# benchmarks/log_overhead.py
+# Per-request cost, paid on the request thread, of the /query hot-path log
+# lines with a long resume in the message, the model reply and the RAG
+# context:
+#   - before: eager f-strings dumping full payloads through a file handler
+#   - after: lazy %-style arguments with size-capped previews, written
+#     through that handler directly or behind the queue handler
+# Requests are spaced `gap_ms` apart, as real ones are by their proxy and
+# DynamoDB waits; that idle time is when the queue listener writes.
+#
+# Usage: python benchmarks/log_overhead.py [requests] [resume_chars] [gap_ms]
+
+import os, sys, json, time, random, logging, tempfile, statistics
+from logging.handlers import TimedRotatingFileHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("logDir", tempfile.gettempdir())
+
+# Record-collection defaults, before config turns them off
+_DEFAULTS = {name: getattr(logging, name) for name in ("_srcfile", "logThreads", "logProcesses", "logMultiprocessing")}
+
+import config
+from config import preview
+_TUNED = {name: getattr(logging, name) for name in _DEFAULTS}
+
+_WORDS = ("led managed built internship python analysis team project customers "
+          "improved reduced revenue research data launch design stakeholders").split()
+_RANDOM = random.Random(0)
+
+
+def _text(chars: int) -> str:
+    words = []
+    while sum(len(w) + 1 for w in words) < chars:
+        words.append(_RANDOM.choice(_WORDS))
+    return " ".join(words)
+
+
+def _payloads(resume_chars: int) -> tuple:
+    msg = "Can you tighten this resume?\n" + _text(resume_chars)
+    data = {"user_id": "u1", "user_name": "user", "message_id": "m1", "channel_id": "c1",
+            "timestamp": "1", "text": msg, "message": {"msg": msg}}
+    query = {"msg": msg, "rsme": True, "context": _text(2000)}
+    inner = {"response": _text(1500), "section": "experience", "sources": ["a", "b"], "human_in_the_loop": False}
+    resp = {"response": json.dumps(inner), "rag_context": _text(6000)}
+    guides = [{"doc_id": i, "chunks": [_text(400)]} for i in range(5)]
+    return data, msg, query, resp, inner, guides
+
+
+def _before(log: logging.Logger, data, msg, query, resp, inner, guides) -> None:
+    log.info(f"HTTP POST: {json.dumps(data, separators=(',', ':'))}")
+    log.info(f"Guiding info retrieved: {guides}")
+    log.info(f"User <user>: uid <u1>, sid <s1>, new <False>, msg <{msg}>, rmse <True>, files <False>")
+    log.info(f"Processing query for session s1 - Message: {msg}")
+    log.info(f"User Query: {json.dumps(query, separators=(',', ':'))}")
+    log.info(f"Response: {resp}")
+    log.info(f"Response Parsed: rag: {resp['rag_context']}, resp: {inner['response']}, section: experience, sources: {inner['sources']}, human_in_the_loop: False")
+    log.debug(f"[QUERY] Latest interaction:\n  User: {msg}\n  Bot: {inner['response']}")
+
+
+def _after(log: logging.Logger, data, msg, query, resp, inner, guides) -> None:
+    log.info("HTTP POST: %s", preview(data))
+    log.info("Guiding info retrieved: %s", preview(guides))
+    log.info("User <%s>: uid <%s>, sid <%s>, new <%s>, msg <%s>, rmse <%s>, files <%s>", "user", "u1", "s1", False, preview(msg), True, False)
+    log.info("Processing query for session %s - Message: %s", "s1", preview(msg))
+    log.info("User Query: %s", preview(query))
+    log.info("Response: %s", preview(resp))
+    log.info("Response Parsed: rag: %s, resp: %s, section: %s, sources: %s, human_in_the_loop: %s",
+             preview(resp["rag_context"]), preview(inner["response"]), "experience", inner["sources"], False)
+    log.debug("[QUERY] Latest interaction:\n  User: %s\n  Bot: %s", preview(msg), preview(inner["response"]))
+
+
+def _logger(name: str, handlers: list) -> logging.Logger:
+    log = logging.getLogger(f"benchmark.{name}")
+    log.handlers = handlers
+    log.setLevel(logging.INFO)
+    log.propagate = False
+    return log
+
+
+def _file_handler(path: str) -> logging.Handler:
+    handler = TimedRotatingFileHandler(path, when="midnight", interval=1, backupCount=7)
+    handler.setFormatter(logging.Formatter("%(asctime)s | %(levelname)-10s | %(name)-10s -- %(message)s"))
+    return handler
+
+
+def run(requests: int = 2000, resume_chars: int = 8000, gap_ms: float = 1.0) -> None:
+    payloads = _payloads(resume_chars)
+    directory = tempfile.mkdtemp()
+    cases = (
+        ("before (eager, file)", _before, _DEFAULTS, [_file_handler(os.path.join(directory, "before.log"))]),
+        ("after (lazy, file)", _after, _TUNED, [_file_handler(os.path.join(directory, "direct.log"))]),
+        ("after (lazy, queue)", _after, _TUNED, config._queue_handlers([_file_handler(os.path.join(directory, "queue.log"))])),
+    )
+
+    print(f"{requests} requests {gap_ms} ms apart, {resume_chars}-char resume, previews capped at {config._PREVIEW_CHARS} chars")
+    for label, emit, settings, handlers in cases:
+        for name, value in settings.items():
+            setattr(logging, name, value)
+        log = _logger(label.split()[0] + label.split()[-1], handlers)
+        samples = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            emit(log, *payloads)
+            samples.append(time.perf_counter() - start)
+            time.sleep(gap_ms / 1000)
+        samples.sort()
+        size = os.path.getsize(handlers[0].baseFilename) if hasattr(handlers[0], "baseFilename") else None
+        written = f"{size / requests / 1024:6.1f} KB/request" if size is not None else "(written by listener)"
+        print(f"{label:<22} mean {statistics.mean(samples) * 1e6:8.1f} us   "
+              f"p99 {samples[int(len(samples) * 0.99)] * 1e6:8.1f} us   {written}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:4]
+    run(*(int(a) for a in args[:2]), *(float(a) for a in args[2:]))
@@ -0,0 +1,112 @@
+# benchmarks/page_cache.py
+# Scrape the same links repeatedly, as users do when they paste a posting
+# more than once, against a local site whose pages take `delay` seconds and
+# honour If-None-Match, and a fake LLMProxy whose uploads take `delay` seconds
+# too. Reports time per scrape, full page downloads, 304s and uploads for:
+#   - cold: empty page cache, new session
+#   - fresh: same session, cache entry younger than pageCacheFresh
+#   - revalidated: same session, entry past pageCacheFresh (conditional GET)
+#   - new session: another session, entry past pageCacheFresh
+#   - no cache: the previous behavior, every scrape downloads and uploads
+#
+# Usage: python benchmarks/page_cache.py [urls] [delay]
+
+import os, sys, time, tempfile, threading
+from http.server import BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("logDir", tempfile.gettempdir())
+os.environ.setdefault("awsRegion", "us-east-1")
+os.environ.setdefault("dynamoTable", "benchmark")
+os.environ.setdefault("scrapeAllowPrivate", "1")
+os.environ.setdefault("pageCachePath", os.path.join(tempfile.mkdtemp(), "pages.sqlite3"))
+
+from tests.fakes import FakeProxy, ProxyServer, StubTable
+
+_PARAGRAPH = "<p>Led a team of five engineers to ship a resume parser used by 3,000 students.</p>"
+_COUNTS = {"200": 0, "304": 0, "uploads": 0}
+_LOCK = threading.Lock()
+
+
+def _count(name: str) -> None:
+    with _LOCK:
+        _COUNTS[name] += 1
+
+
+class FakeSite(BaseHTTPRequestHandler):
+    """Serves a fixed HTML page with an ETag at every path after `delay` seconds."""
+    protocol_version = "HTTP/1.1"
+    delay = 0.0
+
+    def do_GET(self):
+        time.sleep(self.delay)
+        etag = f'"{self.path}-v1"'
+        if self.headers.get("If-None-Match") == etag:
+            _count("304")
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        _count("200")
+        body = f"<html><body><h1>{self.path}</h1>{_PARAGRAPH * 200}</body></html>".encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class CountingProxy(FakeProxy):
+    def do_POST(self):
+        if self.headers.get("request_type") == "add":
+            _count("uploads")
+        super().do_POST()
+
+
+def run(urls: int = 5, delay: float = 0.3) -> None:
+    FakeSite.delay = CountingProxy.delay = delay
+    site = ProxyServer(("127.0.0.1", 0), FakeSite)
+    proxy = ProxyServer(("127.0.0.1", 0), CountingProxy)
+    for server in (site, proxy):
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    import llmproxy, utils
+    from pagecache import PageCache
+    llmproxy.end_point = f"http://127.0.0.1:{proxy.server_address[1]}"
+    utils._TABLE = StubTable()
+    base = f"http://127.0.0.1:{site.server_address[1]}"
+    msg = "Can you use these pages? " + " ".join(f"{base}/page{n}" for n in range(urls))
+
+    print(f"{urls} URLs, {delay * 1000:.0f} ms per page fetch and per upload")
+    cases = (
+        ("cold", "s1", 300, True),
+        ("fresh", "s1", 300, True),
+        ("revalidated", "s1", 0, True),
+        ("new session", "s2", 0, True),
+        ("no cache", "s3", 0, False),
+    )
+    for label, sid, fresh, cached in cases:
+        utils._PAGE_FRESH = fresh
+        if not cached:
+            # An empty cache that evicts every write at once
+            utils._PAGE_CACHE = PageCache(os.path.join(tempfile.mkdtemp(), "pages.sqlite3"), max_bytes=0)
+            utils._TABLE = StubTable()
+        for name in _COUNTS:
+            _COUNTS[name] = 0
+        start = time.perf_counter()
+        result = utils.scrape(sid, msg)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<12} {elapsed:6.2f}s   200s {_COUNTS['200']:>2}   304s {_COUNTS['304']:>2}   "
+              f"uploads {_COUNTS['uploads']:>2}   failed {len(result[2])}/{urls}")
+
+    site.shutdown()
+    proxy.shutdown()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:3]
+    run(*(int(a) for a in args[:1]), *(float(a) for a in args[1:2]))
@@ -0,0 +1,82 @@
+# benchmarks/proxy_latency.py
+# Compare per-call latency of a fresh connection per request (the old
+# module-level requests.post) against llmproxy's pooled keep-alive session,
+# using a local fake LLMProxy endpoint.
+#
+# Usage: python benchmarks/proxy_latency.py [calls]
+
+import os, sys, json, time, socket, threading, statistics
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+
+class FakeProxy(BaseHTTPRequestHandler):
+    """Answers every POST like LLMProxy's `call` request type."""
+    protocol_version = "HTTP/1.1"
+    delay = 0.0
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out as separate writes; without this the
+        # keep-alive case measures Nagle/delayed-ACK stalls, not the pool.
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.delay:
+            time.sleep(self.delay)
+        body = json.dumps({"result": "{}", "rag_context": ""}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(delay: float = 0.0) -> ThreadingHTTPServer:
+    FakeProxy.delay = delay
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeProxy)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _percentiles(samples: list) -> str:
+    samples = sorted(samples)
+    p50 = statistics.median(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    return f"p50 {p50 * 1000:7.3f} ms   p99 {p99 * 1000:7.3f} ms"
+
+
+def _measure(call, calls: int) -> list:
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def run(calls: int = 500) -> None:
+    server = start_server()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ["endPoint"] = url
+
+    import llmproxy
+    llmproxy.end_point = url
+
+    fresh = _measure(lambda: requests.post(url, json={"query": "q"}, headers={"Connection": "close"}), calls)
+    pooled = _measure(lambda: llmproxy.generate(model="m", system="s", query="q"), calls)
+
+    print(f"fresh connection per call  {_percentiles(fresh)}")
+    print(f"pooled keep-alive session  {_percentiles(pooled)}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,94 @@
+# benchmarks/scrape_concurrency.py
+# Time utils.scrape on a message with several links against a local site
+# whose pages take `delay` seconds each and a fake LLMProxy whose uploads take
+# `delay` seconds too:
+#   - serial: the old loop (fresh requests.get + BeautifulSoup, then upload,
+#     one URL after another)
+#   - concurrent: utils.scrape (shared pool, uploads as pages complete)
+#
+# Usage: python benchmarks/scrape_concurrency.py [urls] [delay] [rounds]
+
+import os, sys, time, tempfile, threading, statistics
+from http.server import BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("logDir", tempfile.gettempdir())
+os.environ.setdefault("awsRegion", "us-east-1")
+os.environ.setdefault("dynamoTable", "benchmark")
+os.environ.setdefault("scrapeAllowPrivate", "1")
+os.environ.setdefault("pageCachePath", os.path.join(tempfile.mkdtemp(), "pages.sqlite3"))
+os.environ.setdefault("pageCacheFresh", "0")  # FakeSite sends no validators, so every round refetches
+
+import requests
+from bs4 import BeautifulSoup
+from tests.fakes import FakeProxy, ProxyServer, StubTable
+
+_PARAGRAPH = "<p>Led a team of five engineers to ship a resume parser used by 3,000 students.</p>"
+
+
+class FakeSite(BaseHTTPRequestHandler):
+    """Serves a small HTML page at every path after `delay` seconds."""
+    protocol_version = "HTTP/1.1"
+    delay = 0.0
+
+    def do_GET(self):
+        time.sleep(self.delay)
+        body = f"<html><head><script>x()</script></head><body><nav>menu</nav>{_PARAGRAPH * 200}</body></html>".encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _serial(utils, sid: str, msg: str) -> tuple:
+    failed_urls = []
+    urls = utils._extract_urls(msg)
+    for url in urls:
+        try:
+            response = requests.get(url, headers=utils._SCRAPE_HEADERS)
+            response.raise_for_status()
+            soup = BeautifulSoup(response.text, "html.parser")
+            for unwanted in soup(["script", "style", "header", "footer", "nav", "aside"]):
+                unwanted.extract()
+            page = " ".join(soup.get_text(separator=" ", strip=True).split())
+        except Exception:
+            page = None
+        if page is None or not utils._upload_page(sid, url, page, utils.hashlib.sha256(page.encode()).hexdigest()):
+            failed_urls.append(url)
+    return (bool(urls), bool(failed_urls), failed_urls)
+
+
+def run(urls: int = 5, delay: float = 0.3, rounds: int = 5) -> None:
+    FakeSite.delay = FakeProxy.delay = delay
+    site = ProxyServer(("127.0.0.1", 0), FakeSite)
+    proxy = ProxyServer(("127.0.0.1", 0), FakeProxy)
+    for server in (site, proxy):
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    import llmproxy, utils
+    llmproxy.end_point = f"http://127.0.0.1:{proxy.server_address[1]}"
+    utils._TABLE = StubTable()
+    base = f"http://127.0.0.1:{site.server_address[1]}"
+    msg = "Can you use these pages? " + " ".join(f"{base}/page{n}" for n in range(urls))
+
+    print(f"{urls} URLs, {delay * 1000:.0f} ms per page fetch and per upload, {rounds} rounds")
+    for label, func in (("serial", _serial), ("concurrent", lambda u, sid, m: u.scrape(sid, m))):
+        samples, result = [], None
+        for n in range(rounds):
+            # A new session each round, so the upload ledger never skips a page
+            start = time.perf_counter()
+            result = func(utils, f"{label}-{n}", msg)
+            samples.append(time.perf_counter() - start)
+        print(f"{label:<12} median {statistics.median(samples):6.2f}s   failed {len(result[2])}/{urls}")
+
+    site.shutdown()
+    proxy.shutdown()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:4]
+    run(*(int(a) for a in args[:1]), *(float(a) for a in args[1:2]), *(int(a) for a in args[2:3]))
@@ -0,0 +1,72 @@
+# benchmarks/session_growth.py
+# Show cookie size and per-request latency as a conversation grows, for
+# Flask's default signed-cookie session versus the server-side backends.
+# Each turn appends a user and a bot message to session[sid]["chat_log"],
+# as chat.query does.
+#
+# Usage: python benchmarks/session_growth.py [turns]
+
+import os, sys, time, random, tempfile, warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("logDir", tempfile.gettempdir())
+
+from flask import Flask, session, jsonify
+from werkzeug.test import Client
+from flask.sessions import SecureCookieSessionInterface
+from sessions import ServerSideSessionInterface, MemoryBackend, SQLiteBackend
+
+# Varied text, so the signed cookie's zlib compression doesn't flatter it
+_WORDS = ("led managed built internship python analysis team project customers "
+          "improved reduced revenue research data launch design stakeholders "
+          "quantify impact bullet section education skills summary role").split()
+_RANDOM = random.Random(0)
+
+def _sentence(words: int) -> str:
+    return " ".join(_RANDOM.choice(_WORDS) for _ in range(words))
+
+
+def _make_app(interface) -> Flask:
+    app = Flask(__name__)
+    app.secret_key = "benchmark"
+    app.session_interface = interface
+
+    @app.route("/query", methods=["POST"])
+    def query():
+        sid = "abc123"
+        session[sid] = session.get(sid, {})
+        session[sid].setdefault("chat_log", [])
+        session[sid]["chat_log"].append({"role": "user", "msg": _sentence(25)})
+        session[sid]["chat_log"].append({"role": "bot", "msg": _sentence(80)})
+        return jsonify({"turns": len(session[sid]["chat_log"]) // 2})
+
+    return app
+
+
+def _run(label: str, interface, turns: int, report: tuple) -> None:
+    # werkzeug's Client directly: Flask 2.2's test_client doesn't work with Werkzeug 3
+    client = Client(_make_app(interface))
+    for turn in range(1, turns + 1):
+        start = time.perf_counter()
+        resp = client.post("/query", json={"text": "hi"})
+        elapsed = time.perf_counter() - start
+
+        cookie = client.get_cookie("session")
+        size = len(cookie.value) if cookie else 0
+        if turn in report:
+            note = "  (over 4KB browser limit)" if size > 4096 else ""
+            print(f"{label:<8} turn {turn:>4}: cookie {size:>7} B, {elapsed * 1000:6.2f} ms{note}")
+
+
+def run(turns: int = 150) -> None:
+    # werkzeug warns on every oversized cookie; the table already flags them
+    warnings.simplefilter("ignore", UserWarning)
+    report = tuple(t for t in (1, 10, 25, 50, 100, turns) if t <= turns)
+    _run("cookie", SecureCookieSessionInterface(), turns, report)
+    _run("memory", ServerSideSessionInterface(MemoryBackend()), turns, report)
+    with tempfile.TemporaryDirectory() as tmp:
+        _run("sqlite", ServerSideSessionInterface(SQLiteBackend(os.path.join(tmp, "s.db"))), turns, report)
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 150)
@@ -0,0 +1,50 @@
+# benchmarks/sid_stress.py
+# Allocate SIDs from many threads in several processes at once and check
+# that no SID is ever handed out twice.
+#
+# Usage: python benchmarks/sid_stress.py [processes] [threads] [per_thread]
+
+import os, sys, time, multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("logDir", "/tmp")
+os.environ.setdefault("awsRegion", "us-east-1")
+os.environ.setdefault("dynamoTable", "benchmark")
+
+import utils
+
+
+def _allocate(count: int) -> list:
+    return [utils._gen_sid() for _ in range(count)]
+
+
+def _worker(args) -> tuple:
+    threads, per_thread = args
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        batches = list(pool.map(_allocate, [per_thread] * threads))
+    elapsed = time.perf_counter() - start
+    return [sid for batch in batches for sid in batch], elapsed
+
+
+def run(processes: int = 4, threads: int = 16, per_thread: int = 5000) -> None:
+    # fork so children inherit the parent's already-imported utils, which
+    # is the case the per-process node id has to survive (gunicorn --preload)
+    ctx = multiprocessing.get_context("fork")
+    with ctx.Pool(processes) as pool:
+        results = pool.map(_worker, [(threads, per_thread)] * processes)
+
+    sids = [sid for batch, _ in results for sid in batch]
+    slowest = max(elapsed for _, elapsed in results)
+    unique = len(set(sids))
+    print(f"{len(sids)} SIDs from {processes} processes x {threads} threads, "
+          f"{unique} unique, {len(sids) - unique} duplicates, "
+          f"{len(sids) / slowest:,.0f} allocations/s")
+    if unique != len(sids):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:4]]
+    run(*args)
@@ -0,0 +1,69 @@
+# benchmarks/url_extract.py
+# Per-message cost of finding URLs over a corpus of realistic chat messages
+# (mostly plain questions, some resume excerpts, some with links):
+#   - before: a new URLExtract() for every message
+#   - after: utils._extract_urls (shared extractor, skipped when the message
+#     has no scheme, "www." or dotted name)
+# Both must find the same URLs in every message.
+#
+# Usage: python benchmarks/url_extract.py [rounds]
+
+import os, sys, time, tempfile, statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("logDir", tempfile.gettempdir())
+os.environ.setdefault("awsRegion", "us-east-1")
+os.environ.setdefault("dynamoTable", "benchmark")
+os.environ.setdefault("logLevel", "WARNING")
+
+from urlextract import URLExtract
+import utils
+
+CORPUS = [
+    "hi",
+    "Hello! Can you help me with my resume?",
+    "What should I put in my summary section? I'm a junior studying CS.",
+    "Thanks, that helps a lot.",
+    "How long should a cover letter be for a software internship?",
+    "I led a team of 5 engineers and cut build times by 40%. Is that a good bullet?",
+    "Can you review my experience section?\n- Built a Python ETL pipeline processing 2M rows/day\n- Improved test coverage from 60% to 90%",
+    "Should I list my GPA if it's 3.4?",
+    "ok",
+    "What skills do employers look for in data analyst roles?",
+    "I worked at Acme Corp. as a marketing intern. How do I describe that?",
+    "Is it fine to use a two-column layout?",
+    "My resume is two pages long. Should I cut it down to one?",
+    "Here's the posting: https://careers.example.com/jobs/12345?src=linkedin can you tailor my resume?",
+    "Can you look at my portfolio at www.janedoe.dev and suggest what to highlight?",
+    "Job description is at example.org/careers/data-analyst, what keywords am I missing?",
+    "Compare these two: https://jobs.lever.co/acme/abc and https://boards.greenhouse.io/widgets/jobs/42",
+    "I graduated in May 2024 with a B.S. in Economics.",
+    "What does ATS mean?",
+    "e.g. should I say 'managed' or 'led'?",
+]
+
+
+def _before(msg: str) -> list:
+    return URLExtract().find_urls(msg)
+
+
+def run(rounds: int = 5) -> None:
+    expected = [_before(msg) for msg in CORPUS]
+    found = [utils._extract_urls(msg) for msg in CORPUS]
+    mismatches = [msg for msg, a, b in zip(CORPUS, expected, found) if a != b]
+    skipped = sum(not utils._URL_HINT.search(msg) for msg in CORPUS)
+
+    print(f"{len(CORPUS)} messages ({sum(map(bool, expected))} with URLs, {skipped} skipped by the pre-filter), {rounds} rounds")
+    for label, func in (("before", _before), ("after", utils._extract_urls)):
+        samples = []
+        for _ in range(rounds):
+            for msg in CORPUS:
+                start = time.perf_counter()
+                func(msg)
+                samples.append(time.perf_counter() - start)
+        print(f"{label:<8} mean {statistics.mean(samples) * 1e6:10.1f} us   median {statistics.median(samples) * 1e6:10.1f} us")
+    print(f"mismatches: {len(mismatches)}" + "".join(f"\n  {msg!r}" for msg in mismatches))
+
+
+if __name__ == "__main__":
+    run(*(int(a) for a in sys.argv[1:2]))
@@ -0,0 +1,70 @@
+# cache.py
+
+import time, threading
+from collections import OrderedDict
+
+class TTLCache:
+    """
+    Thread-safe, size-bounded LRU cache whose entries also expire after a TTL.
+
+    Parameters:
+        maxsize (int): Maximum number of entries; the least recently used entry
+            is evicted when a new one would exceed it.
+        ttl (float): Seconds an entry stays valid after it is stored.
+    """
+    def __init__(self, maxsize: int = 256, ttl: float = 3600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Return the cached value for `key`, or `default` if absent or expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value) -> None:
+        """Store `value` under `key`, evicting the least recently used entries if full."""
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        """Remove `key` and return its value (expired or not), or `default`."""
+        with self._lock:
+            entry = self._data.pop(key, None)
+            return default if entry is None else entry[1]
+
+    def clear(self) -> None:
+        """Drop every entry. Counters are kept."""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        """Return size and hit/miss/eviction counters."""
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
@@ -2,16 +2,23 @@
 
 import os, json
 import requests
-from flask import jsonify, session
+from flask import jsonify, session, Response
 from datetime import datetime, timezone
-from config import get_logger
+from config import get_logger, preview
 from llmproxy import generate
-from utils import safe_load_text, update_resume_summary, send_resume_for_review
+from utils import load_template, update_resume_summary, send_resume_for_review, append_turns, stored_turns
+from timing import stage
+from prompt import build_query
+from metrics import ERRORS
  
 
 # Setup logger
 _LOGGER = get_logger(__name__)
 
+# Reply sent when the model's answer can't be used. It is not a real answer,
+# so it is never stored for replay to retries of the same message.
+_FAILED_TEXT = "An error occurred in the response. Please try again. If this continues, please notify the team."
+
 # Model info
 _WELCOME = os.environ.get("welcomePage")
 _SYSTEM  = os.environ.get("systemPrompt")
@@ -22,6 +29,9 @@ _RAG     = os.environ.get("rag")
 _RAG_K   = os.environ.get("ragK")
 _RAG_THR = os.environ.get("ragThr")
 
+# Serialized welcome payload, rebuilt only when the welcome template changes
+_WELCOME_BODY = {"text": None, "body": None}
+
 def welcome(uid: str, user: str):
     """
     Generate and return a welcome message for a new user.
@@ -36,10 +46,18 @@ def welcome(uid: str, user: str):
     Returns:
         A Flask JSON response with the welcome message and action buttons.
     """
-    with open(_WELCOME, "r", encoding="utf-8") as f:
-        welcome = f.read()
-    
     _LOGGER.info(f"Welcomed {user} (uid: {uid})")
+    return Response(_welcome_body(), mimetype="application/json")
+
+
+def _welcome_body() -> str:
+    """
+    Return the welcome payload as a JSON string. The payload is static apart
+    from the template text, so it is serialized once per template version.
+    """
+    welcome = load_template(_WELCOME)
+    if welcome == _WELCOME_BODY["text"]:
+        return _WELCOME_BODY["body"]
 
     response = {
         "text": welcome,
@@ -65,14 +83,16 @@ def welcome(uid: str, user: str):
             }
         ]
     }
-    return jsonify(response)
+    body = json.dumps(response)
+    _WELCOME_BODY.update(text=welcome, body=body)
+    return body
 
 
-def query(msg: str, sid: str, has_urls: bool, urls_failed: list, rsme: bool, gbl: str):
+def query(msg: str, sid: str, has_urls: bool, urls_failed: list, rsme: bool, gbl: str, uid: str = ""):
     """
     Process a user's query and generate a response using the language model.
 
-    The function loads the system prompt from a file, constructs a query payload that
+    The function loads the system prompt (cached in memory), constructs a query payload that
     includes the user's message, guide context, and resume editing flag, then calls the
     language model to generate a response. It also appends action buttons for further steps.
 
@@ -83,13 +103,43 @@ def query(msg: str, sid: str, has_urls: bool, urls_failed: list, rsme: bool, gbl
         urls_failed (list): List of URLs that failed during scraping/upload.
         rsme (bool): Flag indicating if resume editing mode is active.
         gbl (str): Additional context guiding the response.
+        uid (str): The user's unique identifier, used to store the new turns.
 
     Returns:
         A Flask JSON response with the generated text and action buttons.
     """
-    _LOGGER.info(f"Processing query for session {sid} - Message: {msg}")
+    history = session.get(sid, {}).get("chat_log", [])
+    system, query, limits = prepare_query(msg=msg, sid=sid, rsme=rsme, gbl=gbl, history=history,
+                                          stored=stored_turns(uid))
+    with stage("generate"):
+        resp = generate(**generation_args(system, query, sid, limits))
+    with stage("parse"):
+        payload = finish_query(msg=msg, sid=sid, uid=uid, resp=resp)
+    return jsonify(payload)
+
+
+def prepare_query(msg: str, sid: str, rsme: bool, gbl: str, history: list | None = None,
+                  stored: int | None = None) -> tuple:
+    """
+    Build the system prompt and query payload for the language model, fitting
+    the guides, history and RAG context into the prompt budget (see prompt.py).
+
+    Parameters:
+        msg (str): The user's input message.
+        sid (str): The session identifier.
+        rsme (bool): Flag indicating if resume editing mode is active.
+        gbl (str): Additional context guiding the response.
+        history (list, optional): The session's chat log, used to estimate
+                                  the size of the proxy-side history.
+        stored (int, optional): Turns stored for the user (`stored_turns`),
+                                for history missing from the session.
+
+    Returns:
+        tuple: (system, query, limits) to pass to `generation_args`.
+    """
+    _LOGGER.info("Processing query for session %s - Message: %s", sid, preview(msg))
     
-    system = safe_load_text(_SYSTEM)
+    system = load_template(_SYSTEM)
         
     # TODO: get this working sometime in the future
     # if has_urls:
@@ -115,18 +165,30 @@ def query(msg: str, sid: str, has_urls: bool, urls_failed: list, rsme: bool, gbl
     #             """
     #         )
 
-    query = {
-        "msg": msg,
-        "gbl_context": gbl,
-        "resume_editing": rsme,
-        "date": datetime.now(timezone.utc).isoformat(),
-        }
+    query, limits, _ = build_query(
+        system=system,
+        msg=msg,
+        gbl=gbl,
+        rsme=rsme,
+        date=datetime.now(timezone.utc).isoformat(),
+        history=history,
+        stored=stored,
+        lastk=int(_LAST_K),
+        rag_k=int(_RAG_K),
+        rag=bool(_RAG),
+        )
     
-    _LOGGER.info(f"User Query: {json.dumps(query, separators=(',', ':'))}")    
-    query = json.dumps(query, indent=4)
+    _LOGGER.info("User Query: %s", preview(query))
+    return system, query, limits
+
 
-    _LOGGER.info(f"Query parameters: model {_MODEL}, temp: {_TEMP}, lastK: {_LAST_K}, rag_usage: {_RAG}, rag_k: {_RAG_K}, rag_threshold: {_RAG_THR}, session_id: {sid}")
-    resp = generate(
+def generation_args(system: str, query: str, sid: str, limits: dict | None = None) -> dict:
+    """
+    Return the keyword arguments for `generate`/`agenerate` from the model
+    config, with the "lastk", "rag_k" and "rag_usage" in `limits` (from
+    `prepare_query`) taking precedence.
+    """
+    args = dict(
         model=str(_MODEL),
         system=str(system),
         query=str(query),
@@ -137,8 +199,28 @@ def query(msg: str, sid: str, has_urls: bool, urls_failed: list, rsme: bool, gbl
         rag_threshold=float(_RAG_THR),
         session_id=str(sid),
     )
+    args.update(limits or {})
+    _LOGGER.info("Query parameters: model %s, temp: %s, lastK: %s, rag_usage: %s, rag_k: %s, rag_threshold: %s, session_id: %s",
+                 _MODEL, _TEMP, args["lastk"], args["rag_usage"], args["rag_k"], _RAG_THR, sid)
+    return args
 
-    _LOGGER.info(f"Response: {resp}")
+
+def finish_query(msg: str, sid: str, uid: str, resp) -> dict:
+    """
+    Parse the language model's reply, record the turns in the chat history
+    and build the response payload with action buttons. Needs a request
+    context, since the chat log is kept in the session.
+
+    Parameters:
+        msg (str): The user's input message.
+        sid (str): The session identifier.
+        uid (str): The user's unique identifier, used to store the new turns.
+        resp: The value returned by `generate`.
+
+    Returns:
+        dict: The response payload ("text" and optional "attachments").
+    """
+    _LOGGER.info("Response: %s", preview(resp))
 
     try:
         rag = resp.get('rag_context')
@@ -149,7 +231,8 @@ def query(msg: str, sid: str, has_urls: bool, urls_failed: list, rsme: bool, gbl
         incl_human = resp.get('human_in_the_loop', False)
         resp = resp.get('response', "An error occurred; notify the team.") 
             # now response is exclusively the innermost "response" - the real message
-        _LOGGER.info(f"Response Parsed: rag: {rag}, resp: {resp}, section: {section}, sources: {sources}, human_in_the_loop: {incl_human}")
+        _LOGGER.info("Response Parsed: rag: %s, resp: %s, section: %s, sources: %s, human_in_the_loop: %s",
+                     preview(rag), preview(resp), section, sources, incl_human)
 
         # 🧠 Store chat history in session for AI summary later
         if sid not in session:
@@ -158,11 +241,14 @@ def query(msg: str, sid: str, has_urls: bool, urls_failed: list, rsme: bool, gbl
         if "chat_log" not in session[sid]:
             session[sid]["chat_log"] = []
 
-        session[sid]["chat_log"].append({"role": "user", "msg": msg})
-        session[sid]["chat_log"].append({"role": "bot", "msg": resp})
+        turns = [{"role": "user", "msg": msg}, {"role": "bot", "msg": resp}]
+        session[sid]["chat_log"].extend(turns)
 
-        _LOGGER.debug(f"[QUERY] Chat log updated for session {sid}. Total turns: {len(session[sid]['chat_log'])}")
-        _LOGGER.debug(f"[QUERY] Latest interaction:\n  User: {msg}\n  Bot: {resp}")
+        # Persist only the new turns; earlier history is never rewritten
+        append_turns(uid, sid, turns)
+
+        _LOGGER.debug("[QUERY] Chat log updated for session %s. Total turns: %d", sid, len(session[sid]['chat_log']))
+        _LOGGER.debug("[QUERY] Latest interaction:\n  User: %s\n  Bot: %s", preview(msg), preview(resp))
 
      
         # Prepare buttons for user action
@@ -196,14 +282,15 @@ def query(msg: str, sid: str, has_urls: bool, urls_failed: list, rsme: bool, gbl
         context_summary = f"🔎 *Sources:*\n{'\n'.join([f'- {s}' for s in sources])}" if sources else ""
         final_response = f"{resp}\n\n{context_summary}" if context_summary else resp
 
-        return jsonify({
+        return {
             "text": final_response,
             "attachments": [{"title": "Next Steps", "actions": buttons}] if buttons else []
-            })
+            }
     
     except Exception as e:
         _LOGGER.error(f"An error occurred in the response: {e}")
-        return jsonify({"text": "An error occurred in the response. Please try again. If this continues, please notify the team."})
+        ERRORS.inc(kind="response")
+        return failed_reply()
 
 
 def respond(msg: str, sid: str, uid: str, has_urls: bool, urls_failed: list, rsme: bool, gbl: str) -> dict:
@@ -300,4 +387,26 @@ def respond(msg: str, sid: str, uid: str, has_urls: bool, urls_failed: list, rsm
 
     else:
         return query(msg=msg, sid=sid, has_urls=has_urls, urls_failed=urls_failed, 
-                     rsme=rsme, gbl=gbl)
+                     rsme=rsme, gbl=gbl, uid=uid)
+
+
+def is_command(msg: str) -> bool:
+    """Return True if `respond` handles `msg` as a command rather than a model query."""
+    return (
+        msg.lower().startswith(("create_", "edit_"))
+        or msg == "send_to_specialist"
+        or msg.startswith(("approve_", "deny_"))
+    )
+
+
+def failed_reply() -> dict:
+    """Payload sent when no answer could be produced for a message."""
+    return {"text": _FAILED_TEXT}
+
+
+def is_failed_reply(payload) -> bool:
+    """
+    True if `payload` is the `failed_reply` payload, i.e. a retry of the
+    message should be answered again rather than replayed.
+    """
+    return isinstance(payload, dict) and payload.get("text") == _FAILED_TEXT
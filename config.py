@@ -1,23 +1,114 @@
 # config.py
 
-import os, logging
-from logging.handlers import TimedRotatingFileHandler
+import os, json, queue, atexit, itertools, logging
+from logging.handlers import TimedRotatingFileHandler, QueueHandler, QueueListener
 
 # Log directory setup
 _LOG_DIR = os.environ.get("logDir")  # Directory where logs are stored
 _DEFAULT_PATH = os.path.join(_LOG_DIR, "app.log")  # Default log file path
 _KOYEB = os.environ.get("koyebAppId") not in (None, "None")  # Detects if running in Koyeb environment
 
+# "queue" hands records to a background thread that does the formatting and
+# I/O; "direct" writes from the request thread, as before.
+_LOG_HANDLER = os.environ.get("logHandler", "queue")
+_LOG_LEVEL = os.environ.get("logLevel", "INFO").upper()
+_PREVIEW_CHARS = int(os.environ.get("logPreviewChars", 500))  # Cap on logged payloads
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler that enqueues the record as logged. The stock prepare()
+    renders the message (and any preview() arguments) on the calling thread;
+    here that is left to the listener's handlers.
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def _queue_handlers(handlers: list) -> list:
+    # Unbounded, so a slow disk or stdout never blocks a request; the listener
+    # drains what is left at exit.
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return [_DeferredQueueHandler(log_queue)]
+
+
+_handlers = [
+    # If running in Koyeb, log to stdout; otherwise, log to rotating files
+    logging.StreamHandler() if _KOYEB else TimedRotatingFileHandler(_DEFAULT_PATH, when="midnight", interval=1, backupCount=7)
+]
+_handlers[0].setFormatter(logging.Formatter("%(asctime)s | %(levelname)-10s | %(name)-10s -- %(message)s"))
+
+# The log format doesn't use caller, thread or process details, so skip
+# collecting them for every record (see "Optimization" in the logging docs)
+logging._srcfile = None
+logging.logThreads = False
+logging.logProcesses = False
+logging.logMultiprocessing = False
+
 # Configure the root logger
 logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s | %(levelname)-10s | %(name)-10s -- %(message)s",
-    handlers=[
-        # If running in Koyeb, log to stdout; otherwise, log to rotating files
-        logging.StreamHandler() if _KOYEB else TimedRotatingFileHandler(_DEFAULT_PATH, when="midnight", interval=1, backupCount=7)
-    ]
+    level=_LOG_LEVEL,
+    handlers=_queue_handlers(_handlers) if _LOG_HANDLER == "queue" else _handlers
 )
 
+
+class _Preview:
+    __slots__ = ("value", "limit")
+
+    def __init__(self, value, limit: int = _PREVIEW_CHARS):
+        self.value = value
+        self.limit = limit
+
+    def __str__(self) -> str:
+        value = self.value
+        if isinstance(value, (dict, list, tuple)):
+            # Clip before serializing so the cost tracks the preview, not the payload
+            try:
+                value = json.dumps(_clip(value, self.limit), separators=(',', ':'), default=str)
+            except (TypeError, ValueError, RuntimeError):
+                # RuntimeError: the container changed while the listener read it
+                pass
+        text = value if isinstance(value, str) else str(value)
+        if len(text) > self.limit:
+            return f"{text[:self.limit]}... [{len(text)} chars]"
+        return text
+
+
+def _clip(value, limit: int, depth: int = 0):
+    # Copy of `value` with long strings cut and at most `limit` // 10 items per
+    # container, enough to fill a preview of `limit` characters.
+    if isinstance(value, str):
+        return value if len(value) <= limit else f"{value[:limit]}... [{len(value)} chars]"
+    if depth > 8:
+        return "..."
+    if isinstance(value, dict):
+        items = list(itertools.islice(value.items(), max(1, limit // 10)))
+        return {str(k): _clip(v, limit, depth + 1) for k, v in items}
+    if isinstance(value, (list, tuple)):
+        return [_clip(v, limit, depth + 1) for v in value[:max(1, limit // 10)]]
+    return value
+
+
+def preview(value, limit: int = _PREVIEW_CHARS) -> _Preview:
+    """
+    Wrap a value for logging as a lazily rendered, size-capped preview. Pass
+    it as a %-style argument (`_LOGGER.info("Response: %s", preview(resp))`)
+    so nothing is serialized unless the record is emitted, and at most
+    `limit` characters reach the log.
+
+    Args:
+        value: The value to log. Dicts and lists are rendered as compact JSON.
+        limit (int, optional): Character cap (default: `logPreviewChars`).
+
+    Returns:
+        _Preview: An object rendering the preview when formatted.
+    """
+    return _Preview(value, limit)
+
+
 def get_logger(name: str, uid: str = None, stdout: bool = False) -> logging.Logger:
     """
     Creates and returns a logger instance.
@@ -42,5 +133,5 @@ def get_logger(name: str, uid: str = None, stdout: bool = False) -> logging.Logg
         user_handler = TimedRotatingFileHandler(user_log_path, when="midnight", interval=1, backupCount=7)
         user_handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(name)s - %(message)s"))
         logger.addHandler(user_handler)
-        
+
     return logger
@@ -0,0 +1,217 @@
+# dedup.py
+
+import time, asyncio, threading
+from concurrent.futures import Future, TimeoutError
+from cache import TTLCache
+from config import get_logger
+
+# Setup logging
+_LOGGER = get_logger(__name__)
+
+_MISSING = object()
+
+
+class Deduplicator:
+    """
+    Compute a result at most once per key (e.g. a Rocket.Chat message_id),
+    however many times the request is delivered. A delivery that arrives while
+    the first is still running attaches to it and gets the same result; one
+    that arrives afterwards gets the stored result replayed.
+
+    Results are kept in-process for `ttl` seconds. Given a shared ledger
+    (`claim`, `load` and `finish`, see `utils.claim_reply`), deliveries that
+    land on other workers are deduplicated as well: the first worker to claim
+    the key computes, the others poll the ledger for its result. Results must
+    then be JSON-serializable.
+
+    Parameters:
+        ttl (float): Seconds a completed result is replayed from memory.
+        maxsize (int): Maximum results kept in memory.
+        wait (float): Seconds a duplicate waits for an in-flight computation.
+        poll (float): Seconds between ledger reads while waiting on another worker.
+        claim: Callable(key) -> bool; True if this worker should compute.
+        load: Callable(key) -> dict | None; the ledger entry ("status", "response").
+        finish: Callable(key, ok, response); records or releases the claim.
+        keep: Callable(result) -> bool; False for results that must not be
+              replayed (e.g. an error reply). Those are returned to the
+              deliveries already waiting, then forgotten and the claim
+              released, as when `func` raises.
+    """
+    def __init__(self, ttl: float = 600.0, maxsize: int = 1024, wait: float = 60.0,
+                 poll: float = 0.5, claim=None, load=None, finish=None, keep=None):
+        self.wait = wait
+        self.poll = poll
+        self._keep = keep
+        self._claim = claim
+        self._load = load
+        self._finish = finish
+
+        self.computed = 0
+        self.attached = 0
+        self.replayed = 0
+        self.abandoned = 0
+
+        self._results = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def run(self, key: str, func):
+        """
+        Return `func()`'s result for `key`, calling it only if no other
+        delivery of `key` has. If the computation belongs to another worker
+        and has not finished within `wait` seconds, return None.
+        """
+        result = self._results.get(key, _MISSING)
+        if result is not _MISSING:
+            self.replayed += 1
+            _LOGGER.info(f"Duplicate delivery of <{key}>; replaying stored response.")
+            return result
+
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+
+        if not owner:
+            self.attached += 1
+            _LOGGER.info(f"Duplicate delivery of <{key}>; waiting for the original.")
+            try:
+                return future.result(timeout=self.wait)
+            except TimeoutError:
+                self.abandoned += 1
+                return None
+
+        try:
+            result = self._compute(key, func)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    async def arun(self, key: str, afunc):
+        """
+        Awaitable `run` for a coroutine function `afunc`, sharing stored
+        results and in-flight computations with `run`. Ledger calls run on
+        the default executor.
+        """
+        result = self._results.get(key, _MISSING)
+        if result is not _MISSING:
+            self.replayed += 1
+            _LOGGER.info(f"Duplicate delivery of <{key}>; replaying stored response.")
+            return result
+
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+
+        if not owner:
+            self.attached += 1
+            _LOGGER.info(f"Duplicate delivery of <{key}>; waiting for the original.")
+            try:
+                # Shielded so a timeout here never cancels the original's future
+                return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), self.wait)
+            except asyncio.TimeoutError:
+                self.abandoned += 1
+                return None
+
+        try:
+            result = await self._acompute(key, afunc)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stats(self) -> dict:
+        """Return in-flight count and computed/attached/replayed/abandoned counters."""
+        with self._lock:
+            inflight = len(self._inflight)
+        return {
+            "inflight": inflight,
+            "cached": len(self._results),
+            "computed": self.computed,
+            "attached": self.attached,
+            "replayed": self.replayed,
+            "abandoned": self.abandoned,
+        }
+
+    def _compute(self, key: str, func):
+        if self._claim is not None and not self._claim(key):
+            result = self._await_ledger(key)
+            if result is None:
+                self.abandoned += 1
+                return None
+            self.replayed += 1
+            self._results.put(key, result)
+            return result
+
+        try:
+            result = func()
+        except BaseException:
+            if self._finish is not None:
+                self._finish(key, False, None)
+            raise
+
+        self.computed += 1
+        if self._keep is not None and not self._keep(result):
+            if self._finish is not None:
+                self._finish(key, False, None)
+            return result
+        self._results.put(key, result)
+        if self._finish is not None:
+            self._finish(key, True, result)
+        return result
+
+    async def _acompute(self, key: str, afunc):
+        if self._claim is not None and not await asyncio.to_thread(self._claim, key):
+            result = await asyncio.to_thread(self._await_ledger, key)
+            if result is None:
+                self.abandoned += 1
+                return None
+            self.replayed += 1
+            self._results.put(key, result)
+            return result
+
+        try:
+            result = await afunc()
+        except BaseException:
+            if self._finish is not None:
+                await asyncio.to_thread(self._finish, key, False, None)
+            raise
+
+        self.computed += 1
+        if self._keep is not None and not self._keep(result):
+            if self._finish is not None:
+                await asyncio.to_thread(self._finish, key, False, None)
+            return result
+        self._results.put(key, result)
+        if self._finish is not None:
+            await asyncio.to_thread(self._finish, key, True, result)
+        return result
+
+    def _await_ledger(self, key: str):
+        # Another worker holds the claim; wait for it to record its result.
+        # A missing entry means the claim was released (the original failed).
+        deadline = time.monotonic() + self.wait
+        while True:
+            entry = self._load(key)
+            if entry is None:
+                return None
+            if entry.get("status") == "done" and entry.get("response") is not None:
+                return entry["response"]
+            if time.monotonic() + self.poll > deadline:
+                _LOGGER.warning(f"Gave up waiting {self.wait}s for another worker's response to <{key}>.")
+                return None
+            time.sleep(self.poll)
@@ -0,0 +1,204 @@
+# htmltext.py
+
+import os, re, codecs
+from lxml import etree
+from bs4 import BeautifulSoup
+from config import get_logger
+
+# Setup logging
+_LOGGER = get_logger(__name__)
+
+# "lxml" streams the page through lxml's event parser without building a
+# tree and keeps the main content; "bs4" is the previous BeautifulSoup
+# html.parser extraction, kept for comparison and as a fallback.
+_ENGINE = os.environ.get("htmlEngine", "lxml")
+
+# Elements whose text is never content, and page-level regions that are
+# boilerplate unless they sit inside the main content (e.g. an article header
+# holding the job title)
+_SKIP = {"script", "style", "noscript", "template", "svg", "iframe", "object", "canvas", "select"}
+_CHROME = {"header", "footer", "nav", "aside"}
+_CHROME_ROLES = {"banner", "contentinfo", "navigation", "complementary", "search"}
+_MAIN = {"main", "article"}
+_BLOCKS = {
+    "title", "p", "div", "section", "article", "main", "li", "ul", "ol", "dl", "dt", "dd",
+    "table", "tr", "td", "th", "h1", "h2", "h3", "h4", "h5", "h6", "br", "hr",
+    "blockquote", "pre", "form", "fieldset", "figcaption", "address", "details", "summary",
+}
+
+# Main content is used on its own once it has this many characters; without
+# it, blocks with more than _LINK_DENSITY of their text in links (menus,
+# related-job lists, social links) are dropped.
+_MIN_MAIN_CHARS = int(os.environ.get("htmlMinMainChars", 200))
+_LINK_DENSITY = float(os.environ.get("htmlLinkDensity", 0.6))
+
+_META_CHARSET = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([\w.:-]+)""", re.IGNORECASE)
+_BOMS = ((codecs.BOM_UTF8, "utf-8"), (codecs.BOM_UTF16_LE, "utf-16-le"), (codecs.BOM_UTF16_BE, "utf-16-be"))
+_SNIFF_BYTES = 4096
+
+
+class _TextTarget:
+    """
+    lxml parser target collecting the text of each block-level element, with
+    the share of it inside links and whether it lies in the main content.
+    """
+    def __init__(self):
+        self.blocks = []        # (text, link_chars, in_main)
+        self._parts = []
+        self._link_chars = 0
+        self._stack = []        # (tag, skip, main, link) per open element
+        self._skip = 0
+        self._main = 0
+        self._link = 0
+
+    def start(self, tag, attrib):
+        role = (attrib.get("role") or "").lower()
+        skip = (
+            tag in _SKIP
+            or "hidden" in attrib
+            or attrib.get("aria-hidden") == "true"
+            or (not self._main and (tag in _CHROME or role in _CHROME_ROLES))
+        )
+        main = tag in _MAIN or role == "main"
+        link = tag == "a"
+        if tag in _BLOCKS:
+            self._flush()
+        self._stack.append((tag, skip, main, link))
+        self._skip += skip
+        self._main += main
+        self._link += link
+
+    def end(self, tag):
+        # The parser closes implied elements itself; pop until the match
+        # anyway so a stray end tag can never leave a region open
+        if not any(entry[0] == tag for entry in self._stack):
+            return
+        while self._stack:
+            name, skip, main, link = self._stack.pop()
+            self._skip -= skip
+            self._main -= main
+            self._link -= link
+            if name in _BLOCKS:
+                self._flush(main=self._main + main)
+            if name == tag:
+                break
+
+    def data(self, text):
+        if self._skip:
+            return
+        self._parts.append(text)
+        if self._link:
+            self._link_chars += len(text.strip())
+
+    def close(self):
+        self._flush()
+        return self.blocks
+
+    def _flush(self, main: int | None = None) -> None:
+        if not self._parts:
+            return
+        text = " ".join("".join(self._parts).split())
+        if text:
+            self.blocks.append((text, min(self._link_chars, len(text)), bool(self._main if main is None else main)))
+        self._parts = []
+        self._link_chars = 0
+
+
+def _sniff_encoding(head: bytes) -> str:
+    # BOM, then <meta charset> / http-equiv in the first bytes, then UTF-8
+    for bom, name in _BOMS:
+        if head.startswith(bom):
+            return name
+    match = _META_CHARSET.search(head)
+    if match:
+        try:
+            return codecs.lookup(match.group(1).decode("ascii")).name
+        except (LookupError, UnicodeDecodeError):
+            pass
+    return "utf-8"
+
+
+def _select(blocks: list) -> list:
+    main = [b for b in blocks if b[2]]
+    if sum(len(b[0]) for b in main) >= _MIN_MAIN_CHARS:
+        return [b[0] for b in main]
+    kept = [b[0] for b in blocks if b[1] <= _LINK_DENSITY * len(b[0])]
+    return kept or [b[0] for b in blocks]
+
+
+def _lxml_text(chunks, encoding: str | None, max_bytes: int | None) -> str:
+    target = _TextTarget()
+    parser, pending, fed = None, b"", 0
+    for chunk in chunks:
+        if max_bytes is not None and fed + len(chunk) > max_bytes:
+            chunk = chunk[:max_bytes - fed]
+        fed += len(chunk)
+        if parser is None:
+            # Hold back the first bytes until the charset can be sniffed
+            pending += chunk
+            if len(pending) < _SNIFF_BYTES and (max_bytes is None or fed < max_bytes):
+                continue
+            parser = _parser(target, encoding or _sniff_encoding(pending))
+            chunk, pending = pending, b""
+        parser.feed(chunk)
+        if max_bytes is not None and fed >= max_bytes:
+            break
+    if parser is None:
+        if not pending:
+            return ""
+        parser = _parser(target, encoding or _sniff_encoding(pending))
+        parser.feed(pending)
+    try:
+        blocks = parser.close()
+    except etree.LxmlError:
+        # Nothing parseable (e.g. an empty body); keep whatever was collected
+        blocks = target.close()
+    return " ".join(_select(blocks))
+
+
+def _parser(target: _TextTarget, encoding: str) -> etree.HTMLParser:
+    try:
+        return etree.HTMLParser(target=target, encoding=encoding, no_network=True)
+    except (LookupError, etree.LxmlError):
+        return etree.HTMLParser(target=target, encoding="utf-8", no_network=True)
+
+
+def _bs4_text(chunks, encoding: str | None, max_bytes: int | None) -> str:
+    body = b"".join(chunks)
+    if max_bytes is not None:
+        body = body[:max_bytes]
+    soup = BeautifulSoup(body, "html.parser", from_encoding=encoding)
+
+    # Extracting the main content (removing scripts, styles, and ads)
+    for unwanted in soup(["script", "style", "header", "footer", "nav", "aside"]):
+        unwanted.extract()  # Remove these elements
+
+    return " ".join(soup.get_text(separator=" ", strip=True).split())
+
+
+ENGINES = {"lxml": _lxml_text, "bs4": _bs4_text}
+
+
+def html_to_text(chunks, encoding: str | None = None, max_bytes: int | None = None, engine: str | None = None) -> str:
+    """
+    Extract the readable text of an HTML page, whitespace-collapsed.
+
+    Parameters:
+        chunks (Iterable[bytes]): The page body, e.g. a response's
+                                  `iter_content()`; parsing starts with the
+                                  first chunk rather than after the download.
+        encoding (str, optional): Charset declared by the server. Without it
+                                  the charset is sniffed from a BOM or
+                                  <meta> tag, defaulting to UTF-8.
+        max_bytes (int, optional): Stop reading after this many bytes.
+        engine (str, optional): A key of `ENGINES` (default: `htmlEngine`).
+
+    Returns:
+        str: The page text.
+    """
+    name = engine or _ENGINE
+    func = ENGINES.get(name)
+    if func is None:
+        _LOGGER.warning(f"Unknown HTML engine {name!r}, using lxml")
+        func = _lxml_text
+    return func(chunks, encoding, max_bytes)
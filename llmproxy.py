@@ -3,12 +3,95 @@
 # Last update: 03/01/2025
 # Taken from most recent repository update
 
-import os, json, requests
+import os, json, asyncio, requests
+import httpx
+from metrics import UPSTREAM
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # Read in config
 end_point = os.environ.get("endPoint")
 api_key = os.environ.get("apiKey")
 
+# Connection pool settings. Every call goes through one keep-alive session so
+# the TCP+TLS handshake to end_point is paid once per pooled connection rather
+# than once per request, and a stalled proxy can no longer hang a worker.
+pool_size = int(os.environ.get("proxyPoolSize", 10))
+connect_timeout = float(os.environ.get("proxyConnectTimeout", 5))
+read_timeout = float(os.environ.get("proxyReadTimeout", 120))
+max_retries = int(os.environ.get("proxyRetries", 2))
+retry_backoff = float(os.environ.get("proxyBackoff", 0.5))
+
+def _new_session() -> requests.Session:
+    # Only failures where the proxy never processed the request are retried:
+    # connection errors and gateway statuses. Read timeouts are not retried,
+    # since the model call may already be running.
+    retry = Retry(
+        total=max_retries,
+        connect=max_retries,
+        read=0,
+        status=max_retries,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=None,
+        backoff_factor=retry_backoff,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def _count_response(response, *args, **kwargs):
+    UPSTREAM.inc(upstream="llmproxy", op=response.request.headers.get("request_type", ""), status=response.status_code)
+
+_session = _new_session()
+_session.hooks["response"].append(_count_response)
+_timeout = (connect_timeout, read_timeout)
+
+# Async client for the ASGI serving mode (asgi.py). Connections are cheap to
+# hold open while the model runs, so this pool is much larger than the sync one.
+async_pool_size = int(os.environ.get("proxyAsyncPoolSize", 200))
+_RETRY_STATUSES = (502, 503, 504)
+_async_clients = {}
+
+def _async_client() -> httpx.AsyncClient:
+    # httpx clients are bound to the event loop they were first used on
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        limits = httpx.Limits(max_connections=async_pool_size, max_keepalive_connections=async_pool_size)
+        client = httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+                                   event_hooks={"response": [_acount_response]})
+        _async_clients[loop] = client
+    return client
+
+async def _acount_response(response: httpx.Response) -> None:
+    _count_response(response)
+
+async def aclose() -> None:
+    """Close the async client bound to the running event loop, if any."""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+async def _apost(headers: dict, **kwargs) -> httpx.Response:
+    # Same policy as the sync session: retry connection failures and gateway
+    # statuses with exponential backoff, never read timeouts. Unset headers
+    # are dropped, as requests does.
+    headers = {k: v for k, v in headers.items() if v is not None}
+    for attempt in range(max_retries + 1):
+        last = attempt == max_retries
+        try:
+            response = await _async_client().post(end_point, headers=headers, **kwargs)
+        except (httpx.ConnectError, httpx.ConnectTimeout):
+            if last:
+                raise
+        else:
+            if response.status_code not in _RETRY_STATUSES or last:
+                return response
+        await asyncio.sleep(retry_backoff * 2 ** attempt)
+
 def retrieve(
     query: str,
     session_id: str,
@@ -31,13 +114,14 @@ def retrieve(
     msg = None
 
     try:
-        response = requests.post(end_point, headers=headers, json=request)
+        response = _session.post(end_point, headers=headers, json=request, timeout=_timeout)
 
         if response.status_code == 200:
             msg = json.loads(response.text)
         else:
             msg = f"Error: Received response code {response.status_code}"
     except requests.exceptions.RequestException as e:
+        UPSTREAM.inc(upstream="llmproxy", op=headers["request_type"], status="error")
         msg = f"An error occurred: {e}"
     return msg  
 
@@ -74,7 +158,7 @@ def generate(
     msg = None
 
     try:
-        response = requests.post(end_point, headers=headers, json=request)
+        response = _session.post(end_point, headers=headers, json=request, timeout=_timeout)
 
         if response.status_code == 200:
             res = json.loads(response.text)
@@ -82,10 +166,88 @@ def generate(
         else:
             msg = f"Error: Received response code {response.status_code}"
     except requests.exceptions.RequestException as e:
+        UPSTREAM.inc(upstream="llmproxy", op=headers["request_type"], status="error")
         msg = f"An error occurred: {e}"
     return msg	
 
 
+async def aretrieve(
+    query: str,
+    session_id: str,
+    rag_threshold: float,
+    rag_k: int
+    ):
+    """Awaitable `retrieve`; same arguments and return values."""
+
+    headers = {
+        'x-api-key': api_key,
+        'request_type': 'retrieve'
+    }
+
+    request = {
+        'query': query,
+        'session_id': session_id,
+        'rag_threshold': rag_threshold,
+        'rag_k': rag_k
+    }
+
+    try:
+        response = await _apost(headers, json=request)
+
+        if response.status_code == 200:
+            msg = json.loads(response.text)
+        else:
+            msg = f"Error: Received response code {response.status_code}"
+    except httpx.HTTPError as e:
+        UPSTREAM.inc(upstream="llmproxy", op=headers["request_type"], status="error")
+        msg = f"An error occurred: {e}"
+    return msg
+
+
+async def agenerate(
+    model: str,
+    system: str,
+    query: str,
+    temperature: float | None = None,
+    lastk: int | None = None,
+    session_id: str | None = None,
+    rag_threshold: float | None = 0.5,
+    rag_usage: bool | None = False,
+    rag_k: int | None = 0
+    ):
+    """Awaitable `generate`; same arguments and return values."""
+
+    headers = {
+        'x-api-key': api_key,
+        'request_type': 'call'
+    }
+
+    request = {
+        'model': model,
+        'system': system,
+        'query': query,
+        'temperature': temperature,
+        'lastk': lastk,
+        'session_id': session_id,
+        'rag_threshold': rag_threshold,
+        'rag_usage': rag_usage,
+        'rag_k': rag_k
+    }
+
+    try:
+        response = await _apost(headers, json=request)
+
+        if response.status_code == 200:
+            res = json.loads(response.text)
+            msg = {'response':res['result'],'rag_context':res['rag_context']}
+        else:
+            msg = f"Error: Received response code {response.status_code}"
+    except httpx.HTTPError as e:
+        UPSTREAM.inc(upstream="llmproxy", op=headers["request_type"], status="error")
+        msg = f"An error occurred: {e}"
+    return msg
+
+
 
 def upload(multipart_form_data):
 
@@ -96,23 +258,25 @@ def upload(multipart_form_data):
 
     msg = None
     try:
-        response = requests.post(end_point, headers=headers, files=multipart_form_data)
+        response = _session.post(end_point, headers=headers, files=multipart_form_data, timeout=_timeout)
         
         if response.status_code == 200:
             msg = "Successfully uploaded. It may take a short while for the document to be added to your context"
         else:
             msg = f"Error: Received response code {response.status_code}"
     except requests.exceptions.RequestException as e:
+        UPSTREAM.inc(upstream="llmproxy", op=headers["request_type"], status="error")
         msg = f"An error occurred: {e}"
     
     return msg
 
 
 def pdf_upload(
-    path: str,    
+    path: str | None = None,    
     strategy: str | None = None,
     description: str | None = None,
-    session_id: str | None = None
+    session_id: str | None = None,
+    file = None
     ):
     
     params = {
@@ -121,9 +285,15 @@ def pdf_upload(
         'strategy': strategy
     }
 
+    # Either an open binary file object (read from its current position and
+    # left open for the caller) or a path, which is opened and closed here.
+    if file is None:
+        with open(path, 'rb') as f:
+            return pdf_upload(strategy=strategy, description=description, session_id=session_id, file=f)
+
     multipart_form_data = {
         'params': (None, json.dumps(params), 'application/json'),
-        'file': (None, open(path, 'rb'), "application/pdf")
+        'file': (None, file, "application/pdf")
     }
 
     response = upload(multipart_form_data)
@@ -0,0 +1,152 @@
+# metrics.py
+
+import bisect, threading
+from config import get_logger
+
+# Setup logging
+_LOGGER = get_logger(__name__)
+
+# Latency buckets (seconds) covering DynamoDB calls through slow model replies
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+# Prompt-size buckets (estimated tokens)
+TOKEN_BUCKETS = (250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000, 128000)
+
+_REGISTRY = []
+_COLLECTORS = []
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    """
+    Monotonic counter with optional labels, rendered in the Prometheus text
+    format. Increments take one uncontended lock, cheap enough for every request.
+    """
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list:
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_labels(self.labels, key)} {value}" for key, value in values]
+        return lines
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram with optional labels, rendered in the Prometheus
+    text format. Each observation is a bisect and a few additions under a lock.
+    """
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts (last slot is +Inf), sum
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> list:
+        with self._lock:
+            series = sorted((key, (list(counts), total)) for key, (counts, total) in self._series.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(self.labels, key, f'le=\"{bound}\"')} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+def register_collector(func) -> None:
+    """
+    Register `func` to be called on every scrape. It returns a list of
+    (name, type, help, samples) tuples, `samples` being a dict that maps a
+    tuple of (label, value) pairs to the sample's value. Used to
+    export counters other modules already keep (cache and queue stats)
+    without touching their hot paths.
+    """
+    _COLLECTORS.append(func)
+
+
+def render() -> str:
+    """Render every metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in _REGISTRY:
+        lines += metric.render()
+    for collector in _COLLECTORS:
+        try:
+            families = collector()
+        except Exception as e:
+            _LOGGER.error(f"Metrics collector {collector.__name__} failed: {e}", exc_info=True)
+            continue
+        for name, kind, help, samples in families:
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+            for labels, value in samples.items():
+                names, values = zip(*labels) if labels else ((), ())
+                lines.append(f"{name}{_labels(names, values)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# Metrics shared by the request path
+QUERY_SECONDS = Histogram(
+    "query_seconds", "Wall time of /query requests that ran the pipeline.", ("mode",)
+)
+STAGE_SECONDS = Histogram(
+    "query_stage_seconds", "Wall time of each /query stage.", ("stage",)
+)
+QUERY_RESPONSES = Counter(
+    "query_responses_total", "Responses to /query by HTTP status.", ("status",)
+)
+ERRORS = Counter(
+    "errors_total", "Failures while serving /query, by where they happened.", ("kind",)
+)
+UPSTREAM = Counter(
+    "upstream_responses_total", "Responses from upstream services by operation and status (\"error\" if none).",
+    ("upstream", "op", "status")
+)
+
+PROMPT_TOKENS = Histogram(
+    "prompt_tokens", "Estimated tokens per generate() call, by part of the prompt.", ("part",), TOKEN_BUCKETS
+)
+
+
+def observe_query(timer, mode: str = "sync") -> None:
+    """Record a finished /query pipeline run: its total time and every stage's time."""
+    QUERY_SECONDS.observe(timer.total(), mode=mode)
+    for name, seconds in timer.durations().items():
+        STAGE_SECONDS.observe(seconds, stage=name)
@@ -0,0 +1,165 @@
+# pagecache.py
+
+import os, time, sqlite3, tempfile, threading
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from config import get_logger
+
+# Setup logging
+_LOGGER = get_logger(__name__)
+
+# Page cache settings
+_PATH      = os.environ.get("pageCachePath", os.path.join(tempfile.gettempdir(), "pages.sqlite3"))
+_MAX_BYTES = int(os.environ.get("pageCacheMaxBytes", 64 * 1024 * 1024))
+_MAX_AGE   = float(os.environ.get("pageCacheMaxAge", 7 * 86400))
+
+# Query parameters that only track the click, never change the page
+_TRACKING = {"fbclid", "gclid", "msclkid", "mc_cid", "mc_eid", "trk", "trkinfo", "refid"}
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url: str) -> str:
+    """
+    Canonical cache key for a URL: lower-case scheme and host, no default
+    port or fragment, tracking parameters dropped and the rest sorted.
+    URLs without a scheme are taken as https.
+    """
+    if "://" not in url:
+        url = f"https://{url}"
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not (k.lower().startswith("utm_") or k.lower() in _TRACKING)
+    )
+    return urlunsplit((scheme, host, parts.path or "/", urlencode(query), ""))
+
+
+class PageCache:
+    """
+    On-disk cache of extracted page text keyed by normalized URL, shared by
+    every worker on the host through SQLite. Each entry keeps the validators
+    (ETag, Last-Modified) for conditional revalidation and a SHA-256 of the
+    text. Entries older than `max_age` are dropped, and the least recently
+    used ones are evicted once the stored text exceeds `max_bytes`.
+
+    The cache is an optimization only: lookups that fail are misses and
+    writes that fail are logged and skipped, never raised. The database is
+    opened on first use; if it cannot be created (e.g. an unwritable
+    `pageCachePath`), the cache is disabled and every lookup is a miss.
+    """
+    def __init__(self, path: str = _PATH, max_bytes: int = _MAX_BYTES, max_age: float = _MAX_AGE):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.disabled = False
+        self._ready = False
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections may not be shared across threads
+        if self.disabled:
+            raise sqlite3.OperationalError("page cache disabled")
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            try:
+                self._setup()
+                conn = sqlite3.connect(self.path, timeout=5)
+                conn.execute("PRAGMA journal_mode=WAL")
+            except (OSError, sqlite3.Error) as e:
+                self.disabled = True
+                _LOGGER.warning(f"Page cache at {self.path} unavailable, disabling it: {e}")
+                raise sqlite3.OperationalError(str(e)) from e
+            self._local.conn = conn
+        return conn
+
+    def _setup(self) -> None:
+        with self._lock:
+            if self._ready:
+                return
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5)
+            try:
+                with conn:
+                    conn.execute(
+                        "CREATE TABLE IF NOT EXISTS pages ("
+                        "url TEXT PRIMARY KEY, text TEXT NOT NULL, digest TEXT NOT NULL, "
+                        "etag TEXT, last_modified TEXT, size INTEGER NOT NULL, "
+                        "fetched REAL NOT NULL, accessed REAL NOT NULL)"
+                    )
+                    conn.execute("CREATE INDEX IF NOT EXISTS pages_accessed ON pages (accessed)")
+            finally:
+                conn.close()
+            self._ready = True
+
+    def get(self, url: str) -> dict | None:
+        """
+        Return the entry for `url` ("text", "digest", "etag", "last_modified",
+        "fetched"), or None if absent or older than `max_age`.
+        """
+        try:
+            row = self._conn().execute(
+                "SELECT text, digest, etag, last_modified, fetched FROM pages WHERE url = ? AND fetched >= ?",
+                (url, time.time() - self.max_age)
+            ).fetchone()
+        except sqlite3.Error as e:
+            _LOGGER.warning(f"Page cache lookup failed for {url}: {e}")
+            return None
+        if row is None:
+            return None
+        return dict(zip(("text", "digest", "etag", "last_modified", "fetched"), row))
+
+    def put(self, url: str, text: str, digest: str, etag: str | None = None,
+            last_modified: str | None = None) -> None:
+        """Store freshly fetched text for `url`, then evict down to `max_bytes`."""
+        now = time.time()
+        size = len(text.encode("utf-8"))
+        try:
+            with self._conn() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO pages (url, text, digest, etag, last_modified, size, fetched, accessed) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (url, text, digest, etag, last_modified, size, now, now)
+                )
+            self._evict()
+        except sqlite3.Error as e:
+            _LOGGER.warning(f"Page cache write failed for {url}: {e}")
+
+    def touch(self, url: str, revalidated: bool = False) -> None:
+        """Mark `url` as recently used and, after a 304, as freshly fetched."""
+        now = time.time()
+        try:
+            with self._conn() as conn:
+                if revalidated:
+                    conn.execute("UPDATE pages SET fetched = ?, accessed = ? WHERE url = ?", (now, now, url))
+                else:
+                    conn.execute("UPDATE pages SET accessed = ? WHERE url = ?", (now, url))
+        except sqlite3.Error as e:
+            _LOGGER.warning(f"Page cache update failed for {url}: {e}")
+
+    def stats(self) -> dict:
+        """Return the number of entries and bytes of text stored."""
+        try:
+            count, size = self._conn().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages").fetchone()
+        except sqlite3.Error:
+            count, size = 0, 0
+        return {"entries": count, "bytes": size, "max_bytes": self.max_bytes}
+
+    def _evict(self) -> None:
+        with self._conn() as conn:
+            conn.execute("DELETE FROM pages WHERE fetched < ?", (time.time() - self.max_age,))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            # Evict least recently used entries until back under the bound
+            evicted = 0
+            for url, size in conn.execute("SELECT url, size FROM pages ORDER BY accessed").fetchall():
+                if total <= self.max_bytes:
+                    break
+                conn.execute("DELETE FROM pages WHERE url = ?", (url,))
+                total -= size
+                evicted += 1
+        _LOGGER.info(f"Page cache evicted {evicted} page(s); {total} bytes stored.")
@@ -0,0 +1,162 @@
+# prompt.py
+
+import os, json
+from config import get_logger
+from metrics import PROMPT_TOKENS
+
+# Setup logging
+_LOGGER = get_logger(__name__)
+
+# Token budget for everything the model sees on a generate() call: the system
+# prompt, the query (message, guides context) and what the proxy adds on its
+# side (the last `lastk` exchanges and `rag_k` retrieved chunks). Tokens are
+# estimated from characters; the proxy's chunks are taken to be
+# _RAG_CHUNK_TOKENS each.
+_BUDGET          = int(os.environ.get("promptBudget", 12000))
+_CHARS_PER_TOKEN = float(os.environ.get("promptCharsPerToken", 4))
+_RAG_CHUNK_TOKENS = int(os.environ.get("promptRagChunkTokens", 300))
+
+# Webhook deliveries carry no session cookie, so the session's chat log is
+# usually empty. Exchanges the proxy adds beyond it are estimated at
+# _EXCHANGE_TOKENS each. When the number of stored turns is unknown (history
+# table), lastk is also capped at _MAX_LASTK.
+_EXCHANGE_TOKENS = int(os.environ.get("promptExchangeTokens", 250))
+_MAX_LASTK       = int(os.environ.get("promptMaxLastK", 10))
+_MIN_EXCHANGES   = 1  # kept until everything else is down to its minimum
+_TRUNCATED       = " [... truncated]"
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of `text` (characters / `promptCharsPerToken`)."""
+    return int(len(text) / _CHARS_PER_TOKEN) + 1 if text else 0
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def _guide_items(gbl: str) -> list:
+    # Guides arrive as the JSON of the retrieve() result, most relevant first;
+    # anything else (e.g. "No extra context retrieved.") is one opaque item.
+    try:
+        value = json.loads(gbl)
+    except (TypeError, ValueError):
+        return [gbl] if gbl else []
+    return value if isinstance(value, list) else [value]
+
+
+def _exchange_costs(history: list, lastk: int, stored: int | None) -> list:
+    # Estimated tokens of each of the last `lastk` exchanges the proxy will
+    # add, newest first: measured for those in the session's chat log, the
+    # flat estimate for the stored ones beyond it (all `lastk` if unknown).
+    turns = [t.get("msg", "") if isinstance(t, dict) else str(t) for t in history or []]
+    costs = []
+    end = len(turns)
+    while end > 0 and len(costs) < lastk:
+        costs.append(sum(estimate_tokens(str(t)) for t in turns[max(0, end - 2):end]))
+        end -= 2
+    exchanges = lastk if stored is None else min(lastk, (stored + 1) // 2)
+    costs += [_EXCHANGE_TOKENS] * max(0, exchanges - len(costs))
+    return costs
+
+
+def build_query(system: str, msg: str, gbl: str, rsme: bool, date: str, history: list | None,
+                lastk: int, rag_k: int, rag: bool = True, budget: int = _BUDGET,
+                stored: int | None = None) -> tuple:
+    """
+    Assemble the query for generate() within a token budget.
+
+    The system prompt is always sent whole. Everything else is estimated and,
+    while the total is over `budget`, trimmed lowest-value first:
+      1. older exchanges of the history, down to the last one
+      2. lower-ranked guides, down to the top one
+      3. retrieved chunks (`rag_k`), down to one
+      4. the last exchange, the top guide and the last chunk
+      5. the end of the message itself
+    The query is serialized as compact JSON, with the guides embedded rather
+    than as an escaped JSON string.
+
+    Parameters:
+        system (str): The system prompt.
+        msg (str): The user's message.
+        gbl (str): Guides context as returned by `utils.guides`.
+        rsme (bool): Flag indicating if resume editing mode is active.
+        date (str): Timestamp included in the query.
+        history (list): The session's chat log (dicts with "msg"), oldest
+                        first, used to estimate what `lastk` adds.
+        lastk (int): Requested number of history exchanges, capped at
+                     `promptMaxLastK` when `stored` is unknown.
+        rag_k (int): Requested number of retrieved chunks.
+        rag (bool): Whether the proxy adds retrieved chunks at all.
+        budget (int): Token budget (default: `promptBudget`).
+        stored (int, optional): Number of turns stored for the user, if
+                                known; exchanges beyond `history` are
+                                estimated at `promptExchangeTokens` each.
+
+    Returns:
+        tuple: (query, limits, sizes) where `query` is the JSON string to
+               send, `limits` holds the "lastk", "rag_k" and "rag_usage" to
+               use and `sizes` the estimated tokens per part.
+    """
+    if stored is None:
+        lastk = min(lastk, _MAX_LASTK)
+    guides = _guide_items(gbl)
+    guide_costs = [estimate_tokens(_dumps(g)) for g in guides]
+    exchanges = _exchange_costs(history, lastk, stored)
+    chunk = _RAG_CHUNK_TOKENS if rag else 0
+
+    fixed = estimate_tokens(system) + estimate_tokens(_dumps({"msg": "", "gbl_context": [], "resume_editing": rsme, "date": date}))
+    msg_tokens = estimate_tokens(msg)
+    keep = {"history": len(exchanges), "guides": len(guides), "rag": rag_k if rag else 0}
+
+    def total() -> int:
+        return (fixed + msg_tokens + sum(exchanges[:keep["history"]])
+                + sum(guide_costs[:keep["guides"]]) + keep["rag"] * chunk)
+
+    floors = (("history", _MIN_EXCHANGES), ("guides", 1), ("rag", 1), ("history", 0), ("guides", 0), ("rag", 0))
+    for part, floor in floors:
+        while total() > budget and keep[part] > floor:
+            keep[part] -= 1
+
+    over = total() - budget
+    if over > 0 and msg_tokens:
+        keep_chars = max(0, len(msg) - int(over * _CHARS_PER_TOKEN) - len(_TRUNCATED))
+        msg = msg[:keep_chars] + _TRUNCATED
+        msg_tokens = estimate_tokens(msg)
+
+    guides = guides[:keep["guides"]]
+    if not guides:
+        gbl_context = "No extra context retrieved."
+    elif len(guides) == 1 and isinstance(guides[0], str):
+        gbl_context = guides[0]
+    else:
+        gbl_context = guides
+    query = _dumps({"msg": msg, "gbl_context": gbl_context, "resume_editing": rsme, "date": date})
+
+    # With a known turn count, send what was budgeted; otherwise the requested
+    # (capped) lastk unless the history had to be trimmed
+    trimmed = keep["history"] < len(exchanges)
+    limits = {
+        "lastk": keep["history"] if trimmed or stored is not None else lastk,
+        "rag_k": keep["rag"] or rag_k,
+        "rag_usage": bool(keep["rag"]),
+    }
+    sizes = {
+        "system": estimate_tokens(system),
+        "query": estimate_tokens(query),
+        "guides": sum(guide_costs[:keep["guides"]]),
+        "history": sum(exchanges[:keep["history"]]),
+        "rag": keep["rag"] * chunk,
+    }
+    sizes["total"] = sizes["system"] + sizes["query"] + sizes["history"] + sizes["rag"]
+    for part, tokens in sizes.items():
+        PROMPT_TOKENS.observe(tokens, part=part)
+
+    _LOGGER.info(
+        "Prompt tokens (est.): total %d/%d, system %d, query %d (guides %d/%d, %d of %d items), "
+        "history %d (lastk %d, %d of %d estimated exchanges), rag %d (rag_k %d of %d)",
+        sizes["total"], budget, sizes["system"], sizes["query"], sizes["guides"], sum(guide_costs),
+        keep["guides"], len(guide_costs), sizes["history"], limits["lastk"], keep["history"], len(exchanges),
+        sizes["rag"], limits["rag_k"], rag_k
+    )
+    return (query, limits, sizes)
@@ -61,7 +61,8 @@ def _files_attached(data: dict) -> bool:
 
 def _handle_files(data: dict, user: str, sid: str):
     """
-    Process file uploads from the user.
+    Process file uploads from the user. Ingestion runs in the background and
+    the user gets a follow-up message once the files are ready.
 
     Parameters:
         data (dict): The request data containing file info.
@@ -69,14 +70,14 @@ def _handle_files(data: dict, user: str, sid: str):
         sid (str): Session identifier.
 
     Returns:
-        A Flask JSON response indicating success or failure of file upload.
+        A Flask JSON response acknowledging the upload, or an error message.
     """
     _LOGGER.info(f"Detected file upload from {user}. Files: {data['message']['files']}")
-    file_success = upload(data, sid)
-    _LOGGER.info(f"File upload status: {file_success}")
+    ack = upload(data, sid)
+    _LOGGER.info(f"File upload queued: {bool(ack)}")
 
-    if file_success:
-        return jsonify({"text": "✅ File successfully uploaded! What's next?"})
+    if ack:
+        return ack
     else:
         return jsonify({"text": "⚠️ An issue was encountered saving the file. Please try again."})
 
@@ -0,0 +1,217 @@
+# sessions.py
+
+import os, time, sqlite3, secrets, threading
+from collections import OrderedDict
+from flask.sessions import SessionInterface, SecureCookieSession, session_json_serializer
+from config import get_logger
+
+# Setup logging
+_LOGGER = get_logger(__name__)
+
+# Session settings
+_BACKEND     = os.environ.get("sessionBackend", "memory")
+_TTL         = float(os.environ.get("sessionTtl", 86400))
+_MAX_ENTRIES = int(os.environ.get("sessionMaxEntries", 10000))
+_SQLITE_PATH = os.environ.get("sessionPath", os.path.join(os.getcwd(), "tmp", "sessions.sqlite3"))
+_TABLE_NAME  = os.environ.get("sessionTable", os.environ.get("dynamoTable"))
+
+
+class ServerSession(SecureCookieSession):
+    """
+    A session whose data lives in a backend; only `key` goes in the cookie.
+    `has_cookie` records whether the request sent a session cookie at all.
+    """
+    def __init__(self, initial=None, key: str | None = None, new: bool = False, has_cookie: bool = True):
+        super().__init__(initial)
+        self.key = key
+        self.new = new
+        self.has_cookie = has_cookie
+
+
+class MemoryBackend:
+    """
+    In-process LRU store. Entries are kept serialized so requests never share
+    mutable objects. Only suitable when a single worker serves every request.
+    """
+    def __init__(self, maxsize: int = _MAX_ENTRIES):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, key: str) -> str | None:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def save(self, key: str, value: str, ttl: float) -> None:
+        with self._lock:
+            self._data[key] = (time.time() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+
+class SQLiteBackend:
+    """Local SQLite store shared by every worker on the same host."""
+    def __init__(self, path: str = _SQLITE_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions "
+                "(key TEXT PRIMARY KEY, data TEXT NOT NULL, expires REAL NOT NULL)"
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections may not be shared across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def load(self, key: str) -> str | None:
+        row = self._conn().execute(
+            "SELECT data FROM sessions WHERE key = ? AND expires >= ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def save(self, key: str, value: str, ttl: float) -> None:
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (key, data, expires) VALUES (?, ?, ?)",
+                (key, value, time.time() + ttl)
+            )
+            # Opportunistically purge a few expired rows on each write
+            conn.execute(
+                "DELETE FROM sessions WHERE key IN "
+                "(SELECT key FROM sessions WHERE expires < ? LIMIT 16)", (time.time(),)
+            )
+
+    def delete(self, key: str) -> None:
+        with self._conn() as conn:
+            conn.execute("DELETE FROM sessions WHERE key = ?", (key,))
+
+
+class DynamoBackend:
+    """
+    DynamoDB store shared across hosts. Items are keyed on uid "session#<key>"
+    so they can live in the app's main table; `expires` can be used as the
+    table's TTL attribute.
+    """
+    def __init__(self, table):
+        self.table = table
+
+    def load(self, key: str) -> str | None:
+        item = self.table.get_item(Key={"uid": f"session#{key}"}).get("Item")
+        if not item or float(item.get("expires", 0)) < time.time():
+            return None
+        return item["data"]
+
+    def save(self, key: str, value: str, ttl: float) -> None:
+        self.table.put_item(Item={
+            "uid": f"session#{key}",
+            "data": value,
+            "expires": int(time.time() + ttl)
+        })
+
+    def delete(self, key: str) -> None:
+        self.table.delete_item(Key={"uid": f"session#{key}"})
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """
+    Flask session interface that keeps session data in a backend and sends
+    only a random session key in the cookie, so request and response size no
+    longer grow with the conversation.
+    """
+    serializer = session_json_serializer
+
+    def __init__(self, backend, ttl: float = _TTL):
+        self.backend = backend
+        self.ttl = ttl
+
+    def open_session(self, app, request):
+        key = request.cookies.get(self.get_cookie_name(app))
+        if key:
+            try:
+                data = self.backend.load(key)
+            except Exception as e:
+                _LOGGER.error(f"Failed to load session: {e}", exc_info=True)
+                data = None
+            if data is not None:
+                return ServerSession(self.serializer.loads(data), key=key)
+        return ServerSession(key=secrets.token_urlsafe(32), new=True, has_cookie=bool(key))
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.accessed:
+            response.vary.add("Cookie")
+
+        if not session:
+            if session.modified and not session.new:
+                self.backend.delete(session.key)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        # Nested values (e.g. session[sid]["chat_log"]) can change without
+        # marking the session modified, so persist whenever it was touched.
+        if not (session.modified or session.accessed):
+            return
+
+        # Webhook deliveries never send the cookie back, so saving their
+        # sessions would write one unreachable entry per request. Clients
+        # without a cookie get the key only; storage starts once they return it.
+        if session.has_cookie:
+            try:
+                self.backend.save(session.key, self.serializer.dumps(dict(session)), self.ttl)
+            except Exception as e:
+                _LOGGER.error(f"Failed to save session: {e}", exc_info=True)
+                return
+
+        if session.new or self.should_set_cookie(app, session):
+            response.set_cookie(
+                name,
+                session.key,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+            )
+
+
+def make_backend(name: str = _BACKEND):
+    """
+    Build the session backend selected by `sessionBackend`:
+    "memory" (default), "sqlite" or "dynamodb".
+    """
+    if name == "sqlite":
+        return SQLiteBackend()
+    if name == "dynamodb":
+        import boto3
+        resource = boto3.Session(
+            aws_access_key_id=os.environ.get("awsAccessKey"),
+            aws_secret_access_key=os.environ.get("awsSecretKey"),
+            region_name=os.environ.get("awsRegion")
+        ).resource("dynamodb")
+        return DynamoBackend(resource.Table(_TABLE_NAME))
+    if name != "memory":
+        _LOGGER.warning(f"Unknown sessionBackend <{name}>; using in-process memory.")
+    return MemoryBackend()
@@ -0,0 +1,73 @@
+# tests/conftest.py
+# Drives the Flask and ASGI apps in-process against an in-memory DynamoDB
+# stub and a local fake LLMProxy. No AWS credentials or network access needed.
+
+import os, sys, tempfile, threading
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _ROOT)
+for _key, _value in {
+    "logDir": tempfile.gettempdir(), "awsRegion": "us-east-1", "dynamoTable": "test",
+    "systemPrompt": os.path.join(_ROOT, "templates", "model", "system.txt"),
+    "welcomePage": os.path.join(_ROOT, "templates", "model", "welcome.md"),
+    "model": "test", "temp": "0", "lastK": "999999", "rag": "", "ragK": "0", "ragThr": "0.5",
+    "pageCachePath": os.path.join(tempfile.mkdtemp(), "pages.sqlite3"),
+}.items():
+    os.environ.setdefault(_key, _value)
+
+import io, json
+import pytest, httpx
+from tests.fakes import FakeProxy, ProxyServer, StubTable
+
+
+class RecordingProxy(FakeProxy):
+    """FakeProxy that keeps the JSON body of every request in `calls`."""
+    calls = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.calls.append(json.loads(body or b"{}"))
+        self.rfile = io.BytesIO(body)
+        super().do_POST()
+
+
+@pytest.fixture(scope="session")
+def proxy():
+    """Fake LLMProxy answering every call at once; records request bodies."""
+    import llmproxy
+    server = ProxyServer(("127.0.0.1", 0), RecordingProxy)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    llmproxy.end_point = f"http://127.0.0.1:{server.server_address[1]}"
+    yield RecordingProxy
+    server.shutdown()
+
+
+@pytest.fixture
+def table(proxy):
+    """Fresh in-memory table behind every DynamoDB access in utils."""
+    import utils
+    stub = StubTable()
+    utils._TABLE = utils._DYNAMO_DB = utils._INTERACTIONS.resource = stub
+    yield stub
+    utils._INTERACTIONS.flush()
+
+
+@pytest.fixture
+def client(table):
+    """HTTP client for the Flask app (sync /query)."""
+    from app import app
+    with httpx.Client(transport=httpx.WSGITransport(app=app), base_url="http://testserver") as c:
+        yield c
+
+
+@pytest.fixture
+def async_post(table):
+    """POST to the ASGI app (async /query); returns the httpx response."""
+    import asyncio, asgi
+
+    def post(path: str, **kwargs) -> httpx.Response:
+        async def run():
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=asgi.app), base_url="http://testserver") as c:
+                return await c.post(path, **kwargs)
+        return asyncio.run(run())
+    return post
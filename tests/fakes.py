@@ -0,0 +1,146 @@
+# tests/fakes.py
+# In-process stand-ins for the services /query talks to: a DynamoDB table and
+# LLMProxy. Shared by the test suite and the benchmarks; nothing here imports
+# the app modules, so it can be loaded before their environment is set up.
+
+import re, json, time, socket, threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from botocore.exceptions import ClientError
+
+
+_ASSIGNMENT = re.compile(
+    r"([#\w]+)\s*=\s*(?:list_append\(if_not_exists\([#\w]+,\s*(:\w+)\),\s*(:\w+)\)|(:\w+))"
+)
+_CLAUSE = re.compile(r"\b(SET|ADD|REMOVE)\b")
+_INDEX = re.compile(r"([#\w]+)\[(\d+)\]")
+
+
+def _conditional_failure(op: str) -> ClientError:
+    return ClientError({"Error": {"Code": "ConditionalCheckFailedException"}}, op)
+
+
+class StubTable:
+    """In-memory stand-in for a boto3 DynamoDB Table keyed on `uid`."""
+
+    name = "benchmark"
+
+    def __init__(self, latency: float = 0.0):
+        self.items = {}
+        self.calls = Counter()
+        self.background = Counter()
+        self.latency = latency
+
+    def _call(self, name):
+        if threading.current_thread() is threading.main_thread():
+            self.calls[name] += 1
+        else:
+            self.background[name] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def get_item(self, Key, ProjectionExpression=None, ExpressionAttributeNames=None, **kwargs):
+        # Projections are taken as a list of top-level attribute names
+        self._call("get_item")
+        item = self.items.get(Key["uid"])
+        if item and ProjectionExpression:
+            names = ExpressionAttributeNames or {}
+            fields = [names.get(f.strip(), f.strip()) for f in ProjectionExpression.split(",")]
+            item = {f: item[f] for f in fields if f in item}
+        return {"Item": dict(item)} if item else {}
+
+    def put_item(self, Item, ConditionExpression=None, **kwargs):
+        # Any condition starting with attribute_not_exists(uid) is treated as
+        # "fail if the item exists"; trailing OR clauses are ignored.
+        self._call("put_item")
+        if (ConditionExpression or "").startswith("attribute_not_exists(uid)") and Item["uid"] in self.items:
+            raise _conditional_failure("PutItem")
+        self.items[Item["uid"]] = dict(Item)
+        return {}
+
+    def delete_item(self, Key, ConditionExpression=None, **kwargs):
+        self._call("delete_item")
+        if ConditionExpression and Key["uid"] not in self.items:
+            raise _conditional_failure("DeleteItem")
+        old = self.items.pop(Key["uid"], None)
+        return {"Attributes": old} if old and kwargs.get("ReturnValues") == "ALL_OLD" else {}
+
+    def batch_get_item(self, RequestItems, **kwargs):
+        self._call("batch_get_item")
+        return {"Responses": {
+            table: [dict(self.items[k["uid"]]) for k in request["Keys"] if k["uid"] in self.items]
+            for table, request in RequestItems.items()
+        }}
+
+    def batch_write_item(self, RequestItems, **kwargs):
+        # Stands in for the service resource used by the write-behind queue
+        self._call("batch_write_item")
+        for requests in RequestItems.values():
+            for request in requests:
+                item = request["PutRequest"]["Item"]
+                self.items[item["uid"]] = dict(item)
+        return {"UnprocessedItems": {}}
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeValues=None,
+                    ExpressionAttributeNames=None, **kwargs):
+        # Only "SET a = :a" and "SET a = list_append(if_not_exists(a, :empty),
+        # :new)" assignments, "ADD n :n" on numbers and "REMOVE a[0], a[1]" on
+        # lists are understood; conditions on updates are not evaluated.
+        self._call("update_item")
+        names = ExpressionAttributeNames or {}
+        values = ExpressionAttributeValues or {}
+        item = self.items.setdefault(Key["uid"], dict(Key))
+        parts = _CLAUSE.split(UpdateExpression)[1:]
+        for clause, body in zip(parts[::2], parts[1::2]):
+            if clause == "SET":
+                for name, empty, new, value in _ASSIGNMENT.findall(body):
+                    name = names.get(name, name)
+                    if value:
+                        item[name] = values[value]
+                    else:
+                        item[name] = list(item.get(name, values[empty])) + list(values[new])
+            elif clause == "ADD":
+                for name, value in (a.split() for a in body.split(",")):
+                    name = names.get(name, name)
+                    item[name] = item.get(name, 0) + values[value]
+            else:
+                removed = {}
+                for name, index in _INDEX.findall(body):
+                    removed.setdefault(names.get(name, name), set()).add(int(index))
+                for name, indexes in removed.items():
+                    item[name] = [v for i, v in enumerate(item.get(name, [])) if i not in indexes]
+        return {}
+
+
+class FakeProxy(BaseHTTPRequestHandler):
+    """Answers LLMProxy `retrieve` and `call` requests after `delay` seconds."""
+    protocol_version = "HTTP/1.1"
+    delay = 0.0
+
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.delay)
+        if self.headers.get("request_type") == "retrieve":
+            body = json.dumps([])
+        else:
+            reply = json.dumps({"response": "Here is some advice.", "sources": []})
+            body = json.dumps({"result": reply, "rag_context": ""})
+        body = body.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class ProxyServer(ThreadingHTTPServer):
+    """Threaded HTTP server for the fakes, with a deep accept backlog."""
+    daemon_threads = True
+    request_queue_size = 1024
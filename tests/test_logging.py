@@ -0,0 +1,22 @@
+# tests/test_logging.py
+
+import queue, logging
+from config import _DeferredQueueHandler, preview
+
+
+def test_queue_handler_defers_formatting():
+    rendered = []
+
+    class Payload:
+        def __str__(self):
+            rendered.append(True)
+            return "payload"
+
+    log_queue = queue.SimpleQueue()
+    handler = _DeferredQueueHandler(log_queue)
+    record = logging.LogRecord("t", logging.INFO, __file__, 1, "Response: %s", (preview(Payload()),), None)
+    handler.handle(record)
+
+    queued = log_queue.get_nowait()
+    assert not rendered
+    assert queued.getMessage() == "Response: payload"
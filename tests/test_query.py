@@ -0,0 +1,138 @@
+# tests/test_query.py
+
+import pytest
+
+
+def _payload(n: int = 1, **overrides) -> dict:
+    payload = {
+        "user_id": f"u{n}", "user_name": f"user{n}", "message_id": f"m{n}",
+        "text": "How should I word my first bullet point?", "channel_id": "c1", "timestamp": "1",
+    }
+    payload.update(overrides)
+    return payload
+
+
+@pytest.mark.parametrize("text", [None, 42, ["a"]])
+def test_sync_query_non_string_text(client, text):
+    resp = client.post("/query", json=_payload(text=text))
+    assert resp.status_code == 200
+    assert "text" in resp.json()
+
+
+@pytest.mark.parametrize("text", [None, 42])
+def test_async_query_non_string_text(async_post, text):
+    resp = async_post("/query", json=_payload(2, text=text))
+    assert resp.status_code == 200
+    assert "text" in resp.json()
+
+
+def _generations(proxy) -> int:
+    return sum(1 for call in proxy.calls if "system" in call)
+
+
+def test_sync_retry_is_answered_once(client, proxy, table):
+    proxy.calls.clear()
+    first = client.post("/query", json=_payload(3))
+    retry = client.post("/query", json=_payload(3))
+    assert retry.status_code == 200
+    assert retry.json() == first.json()
+    assert _generations(proxy) == 1
+    # The in-process store is the default; no reply ledger items are written
+    assert not [uid for uid in table.items if str(uid).startswith("reply#")]
+
+
+def test_async_retry_is_answered_once(async_post, proxy):
+    proxy.calls.clear()
+    first = async_post("/query", json=_payload(4))
+    retry = async_post("/query", json=_payload(4))
+    assert retry.status_code == 200
+    assert retry.json() == first.json()
+    assert _generations(proxy) == 1
+
+
+def test_returning_user_dynamodb_calls(client, table):
+    client.post("/query", json=_payload(5, message_id="m5a"))
+    table.calls.clear()
+    client.post("/query", json=_payload(5, message_id="m5b"))
+    # One read of the user item and the chat-history append; no reply ledger
+    assert dict(table.calls) == {"get_item": 1, "update_item": 1}
+
+
+def test_user_record_read_without_chat_log(client, table):
+    client.post("/query", json=_payload(6, message_id="m6a"))
+    assert table.items["u6"]["chat_log"]
+    import utils
+    from app import app
+    with app.test_request_context():
+        assert "chat_log" not in utils._load_user("u6")
+        assert list(utils._iter_chat_log("u6", ""))
+
+
+def test_chat_log_on_user_record_is_bounded(client, table, monkeypatch):
+    import utils
+    monkeypatch.setattr(utils, "_USER_MAX_TURNS", 4)
+    monkeypatch.setattr(utils, "_TRIM_SLACK", 2)
+    for i in range(6):
+        client.post("/query", json=_payload(7, message_id=f"m7{i}", text=f"question {i}"))
+    item = table.items["u7"]
+    assert len(item["chat_log"]) == item["chat_turns"] <= 4 + 2
+    assert item["chat_log"][-2]["msg"] == "question 5"
+
+
+def test_cookieless_webhooks_estimate_stored_history(client, proxy, monkeypatch):
+    import chat
+    sizes = []
+    build_query = chat.build_query
+
+    def recording_build_query(**kwargs):
+        result = build_query(**kwargs)
+        sizes.append(result[2])
+        return result
+    monkeypatch.setattr(chat, "build_query", recording_build_query)
+
+    proxy.calls.clear()
+    for i in range(2):
+        # Rocket.Chat webhook deliveries never send the session cookie back
+        client.cookies.clear()
+        client.post("/query", json=_payload(8, message_id=f"m8{i}"))
+    assert [s["history"] > 0 for s in sizes] == [False, True]
+    assert all(call["lastk"] <= 10 for call in proxy.calls if "system" in call)
+
+
+def test_stored_history_is_budgeted_not_capped():
+    from prompt import build_query, _MAX_LASTK
+    args = dict(system="s", msg="m", gbl="", rsme=False, date="d", history=[], lastk=999999, rag_k=0, rag=False)
+    _, limits, sizes = build_query(stored=60, budget=12000, **args)
+    assert limits["lastk"] == 30 > _MAX_LASTK
+    _, limits, _ = build_query(stored=60, budget=2000, **args)
+    assert 0 < limits["lastk"] < 30
+    _, limits, _ = build_query(stored=None, budget=12000, **args)
+    assert limits["lastk"] == _MAX_LASTK
+
+
+def test_failed_answer_is_not_replayed(client, monkeypatch):
+    import chat
+    from chat import is_failed_reply
+    generate = chat.generate
+    monkeypatch.setattr(chat, "generate", lambda **kwargs: {"response": "not json"})
+    first = client.post("/query", json=_payload(9))
+    assert is_failed_reply(first.json())
+
+    monkeypatch.setattr(chat, "generate", generate)
+    retry = client.post("/query", json=_payload(9))
+    assert not is_failed_reply(retry.json())
+    assert client.post("/query", json=_payload(9)).json() == retry.json()
+
+
+def test_async_failed_answer_is_not_replayed(async_post, monkeypatch):
+    import asgi
+    from chat import is_failed_reply
+    agenerate = asgi.agenerate
+
+    async def broken(**kwargs):
+        return {"response": "not json"}
+    monkeypatch.setattr(asgi, "agenerate", broken)
+    assert is_failed_reply(async_post("/query", json=_payload(10)).json())
+
+    monkeypatch.setattr(asgi, "agenerate", agenerate)
+    assert not is_failed_reply(async_post("/query", json=_payload(10)).json())
@@ -0,0 +1,70 @@
+# tests/test_scrape.py
+
+import threading
+from http.server import BaseHTTPRequestHandler
+import pytest
+from tests.fakes import ProxyServer
+
+
+class ScriptPage(BaseHTTPRequestHandler):
+    """Serves a page whose text only appears in scripts, as rendered sites do."""
+    body = b"<html><body><script>" + b"render();" * 10000 + b"</script></body></html>"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def site():
+    server = ProxyServer(("127.0.0.1", 0), ScriptPage)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/job"
+    server.shutdown()
+
+
+def test_requests_html_fallback_is_capped(site, monkeypatch):
+    import utils
+    monkeypatch.setattr(utils, "_SCRAPE_PRIVATE", True)
+    monkeypatch.setattr(utils, "_SCRAPE_MAX_BYTES", 1000)
+    assert len(utils._scrape_requests_html(site)) < 1000
+
+
+def test_requests_html_fallback_checks_host(site):
+    import utils
+    with pytest.raises(ValueError):
+        utils._scrape_requests_html(site)
+
+
+def test_scrape_reports_failing_url_only(table, monkeypatch):
+    import utils
+
+    def scrape_and_upload(sid, url):
+        if "bad" in url:
+            raise RuntimeError("boom")
+        return True
+    monkeypatch.setattr(utils, "_scrape_and_upload", scrape_and_upload)
+    result = utils.scrape("s1", "See https://good.example.com/a and https://bad.example.com/b")
+    assert result == (True, True, ["https://bad.example.com/b"])
+
+
+def test_robust_scrape_bad_port():
+    import utils
+    assert utils._robust_scrape("http://example.com:99999999/job") == (None, None)
+
+
+def test_unwritable_page_cache_is_disabled(tmp_path):
+    from pagecache import PageCache
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    cache = PageCache(str(blocker / "pages.sqlite3"))
+    assert cache.get("https://example.com/") is None
+    cache.put("https://example.com/", "text", "digest")
+    assert cache.disabled
+    assert cache.stats()["entries"] == 0
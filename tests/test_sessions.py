@@ -0,0 +1,34 @@
+# tests/test_sessions.py
+
+from flask import Flask, session
+from werkzeug.test import Client
+from sessions import ServerSideSessionInterface, MemoryBackend
+
+
+def _app(backend) -> Flask:
+    app = Flask(__name__)
+    app.session_interface = ServerSideSessionInterface(backend)
+
+    @app.route("/query", methods=["POST"])
+    def query():
+        session["turns"] = session.get("turns", 0) + 1
+        return {"turns": session["turns"]}
+
+    return app
+
+
+def test_cookieless_requests_are_not_stored():
+    backend = MemoryBackend()
+    client = Client(_app(backend), use_cookies=False)
+    for _ in range(3):
+        resp = client.post("/query")
+        assert resp.json == {"turns": 1}
+        assert "session=" in resp.headers["Set-Cookie"]
+    assert not backend._data
+
+
+def test_session_is_stored_once_the_cookie_comes_back():
+    backend = MemoryBackend()
+    client = Client(_app(backend))
+    assert [client.post("/query").json["turns"] for _ in range(3)] == [1, 1, 2]
+    assert len(backend._data) == 1
@@ -0,0 +1,93 @@
+# timing.py
+
+import time, threading
+from contextlib import contextmanager, nullcontext
+from flask import g, has_app_context
+
+class StageTimer:
+    """
+    Record when each named stage of a request started and finished.
+
+    Offsets are measured from the timer's creation so stages that ran
+    concurrently on other threads can be laid out on one timeline.
+    """
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time the enclosed block as stage `name`."""
+        begin = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            with self._lock:
+                self.stages[name] = (begin - self.start, end - self.start)
+
+    def wrap(self, name: str, func):
+        """Return `func` wrapped so each call is timed as stage `name`."""
+        def timed(*args, **kwargs):
+            with self.stage(name):
+                return func(*args, **kwargs)
+        return timed
+
+    def durations(self) -> dict:
+        """Seconds spent in each recorded stage, by stage name."""
+        with self._lock:
+            return {name: end - begin for name, (begin, end) in self.stages.items()}
+
+    def total(self) -> float:
+        """Seconds elapsed since the timer was created."""
+        return time.perf_counter() - self.start
+
+    def critical_path(self) -> list:
+        """
+        Walk back from the stage that finished last, at each step picking the
+        stage that finished latest before the current one started.
+
+        Returns:
+            list: Stage names in execution order.
+        """
+        with self._lock:
+            stages = dict(self.stages)
+        if not stages:
+            return []
+
+        path = [max(stages, key=lambda s: stages[s][1])]
+        while True:
+            begin = stages[path[-1]][0]
+            before = [s for s in stages if s not in path and stages[s][1] <= begin]
+            if not before:
+                break
+            path.append(max(before, key=lambda s: stages[s][1]))
+        return path[::-1]
+
+    def __str__(self) -> str:
+        # Lets loggers render the summary only if the record is emitted
+        return self.summary()
+
+    def summary(self) -> str:
+        """One-line, log-friendly rendering of every stage and the critical path."""
+        with self._lock:
+            stages = sorted(self.stages.items(), key=lambda kv: kv[1][0])
+        spans = ", ".join(f"{name} {b * 1000:.0f}-{e * 1000:.0f}ms" for name, (b, e) in stages)
+        return f"{spans}; critical path: {' -> '.join(self.critical_path())}; total {self.total() * 1000:.0f}ms"
+
+
+def start_request() -> StageTimer:
+    """Create the timer for the current request and attach it to `flask.g`."""
+    g.timer = StageTimer()
+    return g.timer
+
+
+def stage(name: str):
+    """
+    Time a block against the current request's timer, if there is one.
+    Outside a request (CLI scripts, background jobs) this is a no-op.
+    """
+    if has_app_context() and "timer" in g:
+        return g.timer.stage(name)
+    return nullcontext()
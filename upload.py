@@ -1,72 +1,172 @@
-# upload.py 
+# upload.py
 # Manually add files to the common app RAG directory
 # Note that this can only be used with .pdf files
 
-import os, sys
+import os, sys, glob, json, time, argparse, threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from config import get_logger
-from llmproxy import pdf_upload
+from utils import invalidate_guides, upload_once
 
 _LOGGER = get_logger(__name__)
 _SID = os.environ.get("guidesSid")
+_MANIFEST = ".upload_manifest.json"
 
-def _help():
-    help_text = """Usage: python upload.py /path/to/file.pdf [path/to/file_2.pdf] ...
-    
-    This script uploads one or more PDF files to the ResumAI common RAG session.
-    
-    Arguments:
-      -h, --help    Show this help message and exit.
-    
-    Example:
-      python upload.py /path/to/file_1.pdf /path/to/file_2.pdf
-    """
-    print(help_text)
-    sys.exit(0)
+_EPILOG = """Examples:
+  python upload.py /path/to/file_1.pdf /path/to/file_2.pdf
+  python upload.py guides/ -j 8
+  python upload.py "guides/**/*.pdf" --manifest guides.manifest.json
+"""
 
-if __name__ == "__main__":
-    # Check for help argument
-    if "-h" in sys.argv or "--help" in sys.argv:
-        _help()
-
-    # Ensure at least one file path is provided
-    if len(sys.argv) < 2:
-        print("Error: Provide at least one filepath. Use -h for help.")
-        sys.exit(1)
-
-    fps = sys.argv[1:]
-
-    for fp in fps:
-        try:
-            # If not absolute, check if it exists relative to cwd
-            if not os.path.isabs(fp):
-                p_fp = os.path.join(os.getcwd(), fp)
-                if os.path.exists(p_fp):
-                    _LOGGER.info(f"Resolved relative path: {fp} -> {p_fp}")
-                    fp = p_fp
-                else:
-                    raise FileNotFoundError(f"File not found (absolute or relative): {fp}")
+def _parse_args(argv: list) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="upload.py",
+        description=(
+            "Upload PDF files to the ResumAI common RAG session. Files whose exact "
+            "contents were already uploaded are skipped, and a manifest records "
+            "finished files so an interrupted run can be resumed."
+        ),
+        epilog=_EPILOG,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("paths", nargs="+",
+                        help="PDF files, directories (searched recursively) or glob patterns")
+    parser.add_argument("-j", "--concurrency", type=int, default=4,
+                        help="number of files uploaded at once (default: 4)")
+    parser.add_argument("--manifest", default=_MANIFEST,
+                        help=f"resume manifest path (default: {_MANIFEST})")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="ignore the manifest and consider every file again")
+    return parser.parse_args(argv)
+
+
+def _collect(paths: list) -> list:
+    """
+    Expand files, directories and glob patterns into a sorted list of
+    absolute PDF paths. Missing paths and non-PDFs are reported and skipped.
+    """
+    found = set()
+    for fp in paths:
+        if os.path.isdir(fp):
+            matches = glob.glob(os.path.join(fp, "**", "*"), recursive=True)
+        elif os.path.exists(fp):
+            matches = [fp]
+        else:
+            matches = glob.glob(fp, recursive=True)
+            if not matches:
+                _LOGGER.error(f"File not found (absolute or relative): {fp}")
+                print(f"File not found (absolute or relative): {fp}")
+                continue
 
+        for match in matches:
+            if not os.path.isfile(match):
+                continue
             # Ensure it's a PDF
-            if not fp.lower().endswith(".pdf"):
-                _LOGGER.error(f"Skipping {fp}: Not a PDF file.")
+            if not match.lower().endswith(".pdf"):
+                if not os.path.isdir(fp):
+                    _LOGGER.error(f"Skipping {match}: Not a PDF file.")
                 continue
+            found.add(os.path.abspath(match))
+    return sorted(found)
+
+
+class _Manifest:
+    """
+    JSON record of files already uploaded to the session, keyed by absolute
+    path with the size and mtime they had. Saved after every file so progress
+    survives an interrupted run.
+    """
+    def __init__(self, path: str, sid: str, resume: bool = True):
+        self.path = path
+        self.sid = sid
+        self.entries = {}
+        self._lock = threading.Lock()
+        if resume and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("session_id") == sid:
+                    self.entries = data.get("files", {})
+            except (OSError, ValueError) as e:
+                _LOGGER.warning(f"Ignoring unreadable manifest {path}: {e}")
+
+    @staticmethod
+    def _stamp(fp: str) -> dict:
+        st = os.stat(fp)
+        return {"size": st.st_size, "mtime": st.st_mtime_ns}
+
+    def done(self, fp: str) -> bool:
+        entry = self.entries.get(fp)
+        return bool(entry) and entry.get("stamp") == self._stamp(fp)
 
-            _LOGGER.info(f"Uploading: {fp}")
-
-            resp = pdf_upload(
-                path=fp,
-                session_id=_SID,
-                strategy='smart'
-            )
-            _LOGGER.info(f"Response for {fp}: {resp}")
-            print(f"Upload successful: {fp}")
-
-        except FileNotFoundError as e:
-            _LOGGER.error(str(e))
-            print(str(e))
-        except Exception as e:
-            _LOGGER.error(f"Failed to upload {fp}: {str(e)}")
-            print(f"Upload failed: {fp}")
-
-    print("Upload process completed.")
-    
\ No newline at end of file
+    def record(self, fp: str, status: str) -> None:
+        with self._lock:
+            self.entries[fp] = {"stamp": self._stamp(fp), "status": status, "at": time.time()}
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"session_id": self.sid, "files": self.entries}, f, indent=1)
+            os.replace(tmp, self.path)
+
+
+def _upload(fp: str) -> str:
+    """Upload one file. Returns "uploaded" or "duplicate"; raises on failure."""
+    _LOGGER.info(f"Uploading: {fp}")
+
+    # Files already in the guides session (same bytes) are skipped
+    with open(fp, "rb") as f:
+        resp, duplicate = upload_once(f, _SID, strategy='smart')
+    if duplicate:
+        return "duplicate"
+
+    _LOGGER.info(f"Response for {fp}: {resp}")
+    if not str(resp).startswith("Successfully"):
+        raise RuntimeError(resp)
+    return "uploaded"
+
+
+def main(argv: list) -> int:
+    args = _parse_args(argv)
+    files = _collect(args.paths)
+    if not files:
+        print("Error: No PDF files found. Use -h for help.")
+        return 1
+
+    manifest = _Manifest(args.manifest, _SID, resume=not args.no_resume)
+    todo = [fp for fp in files if not manifest.done(fp)]
+    counts = {"uploaded": 0, "duplicate": 0, "resumed": len(files) - len(todo), "failed": 0}
+    sent_bytes = 0
+    print(f"{len(files)} PDF file(s) found; {counts['resumed']} already done per manifest, {len(todo)} to upload.")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as pool:
+        futures = {pool.submit(_upload, fp): fp for fp in todo}
+        for n, future in enumerate(as_completed(futures), 1):
+            fp = futures[future]
+            try:
+                status = future.result()
+                counts[status] += 1
+                manifest.record(fp, status)
+                if status == "uploaded":
+                    sent_bytes += os.path.getsize(fp)
+                    print(f"[{n}/{len(todo)}] Upload successful: {fp}")
+                else:
+                    print(f"[{n}/{len(todo)}] Already uploaded, skipped: {fp}")
+            except Exception as e:
+                counts["failed"] += 1
+                _LOGGER.error(f"Failed to upload {fp}: {str(e)}")
+                print(f"[{n}/{len(todo)}] Upload failed: {fp}")
+    elapsed = max(time.perf_counter() - start, 1e-9)
+
+    # Running servers cache guides retrievals; make them pick up the new documents
+    if counts["uploaded"]:
+        invalidate_guides()
+
+    print(
+        f"Upload process completed in {elapsed:.1f}s: {counts['uploaded']} uploaded, "
+        f"{counts['duplicate']} duplicate, {counts['resumed']} resumed, {counts['failed']} failed. "
+        f"{len(todo) / elapsed:.2f} files/s, {sent_bytes / 1e6 / elapsed:.2f} MB/s."
+    )
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
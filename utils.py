@@ -1,19 +1,43 @@
 # utils.py
 
-import os, re, time, hashlib, boto3, requests, json
+import os, re, time, random, socket, asyncio, hashlib, secrets, tempfile, ipaddress, itertools, threading, boto3, requests, json
 from time import sleep
-from flask import jsonify, session
+from urllib.parse import urlsplit, urljoin
+from concurrent.futures import ThreadPoolExecutor, wait
+from requests.adapters import HTTPAdapter
+from flask import jsonify, session, g, has_app_context
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
 from urlextract import URLExtract
-from requests_html import HTMLSession
-from bs4 import BeautifulSoup
-from config import get_logger
-from llmproxy import retrieve, pdf_upload, text_upload
+from requests_html import HTML
+from config import get_logger, preview
+from cache import TTLCache
+from writer import WriteBehindQueue
+from pagecache import PageCache, normalize_url
+from htmltext import html_to_text
+from metrics import UPSTREAM, register_collector
+from llmproxy import retrieve, aretrieve, generate, pdf_upload, text_upload
 
 # setup logging
 _LOGGER = get_logger(__name__)
 
-# SID Hash
-_HASH = hashlib.sha1()
+# SID allocation: millisecond timestamp + random per-process node id + a
+# per-process counter. next() on itertools.count is atomic under the GIL, so
+# no lock is needed; the node id is redrawn after a fork.
+_SID_NODE    = {"pid": None, "node": ""}
+_SID_COUNTER = itertools.count()
+
+# Pool of pre-reserved SIDs under uids "free", "free#1", ... A background
+# thread tops it up whenever it falls below the low-water mark; new users
+# claim a slot with a conditional delete and never write on the request path.
+_SID_POOL_DEPTH    = max(1, int(os.environ.get("sidPoolDepth", 20)))
+_SID_POOL_LOW      = int(os.environ.get("sidPoolLowWater", 5))
+_SID_POOL_INTERVAL = float(os.environ.get("sidPoolInterval", 30))
+_SID_POOL_TRIES    = int(os.environ.get("sidPoolClaimTries", 2))
+_SID_SLOTS         = ["free"] + [f"free#{i}" for i in range(1, _SID_POOL_DEPTH)]
+_SID_REFILL        = threading.Event()
+_SID_POOL          = {"pid": None, "thread": None, "empty": False}
+_SID_POOL_LOCK     = threading.Lock()
 
 # AWS connection
 _BOTO3_SESSION = boto3.Session(
@@ -25,11 +49,56 @@ _S3_BUCKET = _BOTO3_SESSION.client("s3")
 _DYNAMO_DB = _BOTO3_SESSION.resource("dynamodb")
 _TABLE     = _DYNAMO_DB.Table(os.environ.get("dynamoTable"))
 
+# Interaction (audit) records are written behind the request in batches,
+# keyed on uid "interaction#<uid>#<mid>" in the interaction table.
+_INTERACTIONS = WriteBehindQueue(
+    _DYNAMO_DB,
+    os.environ.get("interactionTable", os.environ.get("dynamoTable")),
+    maxsize=int(os.environ.get("interactionQueueSize", 10000)),
+    policy=os.environ.get("interactionQueuePolicy", "drop_oldest"),
+    flush_interval=float(os.environ.get("interactionFlushInterval", 1.0))
+)
+
+# Chat history is append-only: one item per turn in the history table
+# (partition key "sid", sort key "seq"). Without a history table, turns are
+# list_append'ed to the user record instead.
+_HISTORY_TABLE = os.environ.get("historyTable")
+_HISTORY       = _DYNAMO_DB.Table(_HISTORY_TABLE) if _HISTORY_TABLE else None
+_HISTORY_PAGE  = int(os.environ.get("historyPageSize", 100))
+
+# Without a history table the user record's chat_log keeps the last
+# userMaxTurns turns; chat_turns counts them so the oldest can be removed
+# without reading the list. Trimming waits for _TRIM_SLACK extra turns so it
+# costs one update every few exchanges rather than one per exchange.
+_USER_MAX_TURNS = int(os.environ.get("userMaxTurns", 200))
+_TRIM_SLACK     = max(2, _USER_MAX_TURNS // 10)
+
+# Only the attributes read on every request; chat_log is fetched on its own
+# when a review summary needs it
+_USER_FIELDS = "sid, rsme, chat_turns"
+
 # Global settings for guiding retrieval
 _GUIDES_SID = os.environ.get("guidesSid")
 _RAG_THR    = os.environ.get("ragThr")
 _RAG_K      = os.environ.get("ragK")
 
+# Cache of guides retrievals. The guides corpus only changes when upload.py is
+# run, which bumps a version stored under uid "guides"; each process checks
+# that version at most every _GUIDES_POLL seconds and drops its cache on change.
+_GUIDES_CACHE = TTLCache(
+    maxsize=int(os.environ.get("guidesCacheSize", 512)),
+    ttl=float(os.environ.get("guidesCacheTtl", 3600))
+)
+_GUIDES_POLL    = float(os.environ.get("guidesVersionPoll", 60))
+_GUIDES_VERSION = {"value": None, "checked": float("-inf")}
+_GUIDES_PROMPT  = "Please provide any salient information on drafting effective resumes related to the following prompt:\n"
+
+# In-memory copies of prompt/welcome templates: path -> (mtime, text, checked).
+# A file's mtime is re-checked at most every _TEMPLATE_CHECK seconds.
+_TEMPLATES      = {}
+_TEMPLATE_CHECK = float(os.environ.get("templateCheckInterval", 5))
+_TEMPLATE_LOCK  = threading.Lock()
+
 # Regular expression to validate UIDs (alphanumeric only)
 _UID_RE = re.compile(r'^[A-Za-z0-9]+$')
 
@@ -38,12 +107,80 @@ _ROCKET_URL   = os.environ.get("rocketUrl")
 _ROCKET_UID   = os.environ.get("rocketUid")
 _ROCKET_TOKEN = os.environ.get("rocketToken")
 
-# Temporary file upload folder and allowed file extensions
-_UPLOADS = os.path.join(os.getcwd(), "tmp")
-if not os.path.exists(_UPLOADS):
-    os.makedirs(_UPLOADS, exist_ok=True)
+# Attachments are spooled in memory up to _SPOOL_MAX_BYTES and only spill to
+# an anonymous temp file (deleted on close) beyond that. Allowed file extensions.
+_SPOOL_MAX_BYTES = int(os.environ.get("spoolMaxBytes", 16 * 1024 * 1024))
 _ALLOWED_FILES = {'pdf'}
 
+# Upload ledger: uid "upload#<sid>#<sha256>" records that those exact bytes
+# were added to that session. A "pending" claim older than _UPLOAD_CLAIM_TTL
+# seconds (e.g. from a crashed upload) may be taken over.
+_UPLOAD_CLAIM_TTL = float(os.environ.get("uploadClaimTtl", 600))
+
+# Reply ledger: uid "reply#<message_id>" records that a webhook delivery is
+# being (or was) answered, and in sync mode the response to replay, so
+# Rocket.Chat retries of the same message never trigger a second generation
+# on any worker. Items carry `expires` for the table's TTL; a "pending" claim
+# older than _REPLY_CLAIM_TTL may be retaken.
+_REPLY_CLAIM_TTL = float(os.environ.get("replyClaimTtl", 600))
+_REPLY_KEEP      = float(os.environ.get("replyLedgerTtl", 86400))
+
+# URL scraping. Every URL in a message is fetched concurrently on a pool shared
+# by all requests, through one pooled session holding at most
+# _SCRAPE_PER_HOST connections to any host. Fetches have strict timeouts, stop
+# reading at _SCRAPE_MAX_BYTES, and only follow redirects to public addresses
+# unless _SCRAPE_PRIVATE is set. Each page is uploaded as soon as it is parsed;
+# the request waits at most _SCRAPE_DEADLINE seconds for all of them.
+_SCRAPE_POOL = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("scrapeWorkers", 8)),
+    thread_name_prefix="scrape"
+)
+_SCRAPE_PER_HOST  = int(os.environ.get("scrapePerHost", 2))
+_SCRAPE_TIMEOUT   = (float(os.environ.get("scrapeConnectTimeout", 3)), float(os.environ.get("scrapeReadTimeout", 10)))
+_SCRAPE_DEADLINE  = float(os.environ.get("scrapeDeadline", 20))
+_SCRAPE_MAX_BYTES = int(os.environ.get("scrapeMaxBytes", 2 * 1024 * 1024))
+_SCRAPE_MAX_URLS  = int(os.environ.get("scrapeMaxUrls", 5))
+_SCRAPE_PRIVATE   = bool(os.environ.get("scrapeAllowPrivate"))
+_SCRAPE_REDIRECTS = 5
+_SCRAPE_TYPES     = ("text/html", "application/xhtml+xml", "text/plain")
+_SCRAPE_HEADERS   = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
+_SCRAPE_SESSION   = requests.Session()
+_SCRAPE_SESSION.mount("http://", HTTPAdapter(pool_connections=16, pool_maxsize=_SCRAPE_PER_HOST, pool_block=True))
+_SCRAPE_SESSION.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=_SCRAPE_PER_HOST, pool_block=True))
+_SCRAPE_SESSION.headers.update(_SCRAPE_HEADERS)
+
+# One URLExtract, built on first use (it loads and compiles the TLD list) and
+# shared by all threads. Messages with no scheme, "www." or dotted name are
+# not passed to it at all.
+_URL_EXTRACTOR = {"extractor": None}
+_URL_EXTRACTOR_LOCK = threading.Lock()
+_URL_HINT = re.compile(r"https?:|www\.|\w\.[^\W\d_]{2}", re.IGNORECASE)
+
+# Scraped page text is cached on disk by normalized URL (see pagecache.py).
+# Entries younger than _PAGE_FRESH seconds are used as is; older ones are
+# revalidated with a conditional GET and served from the cache on a 304, or
+# when the site cannot be reached. Pages are uploaded through the upload
+# ledger keyed on the text's hash, so unchanged text is never re-added to a
+# session.
+_PAGE_CACHE = PageCache()
+_PAGE_FRESH = float(os.environ.get("pageCacheFresh", 300))
+
+# Background ingestion of attachments. After uploading, the job probes the
+# session with retrieve() (exponential backoff from _INGEST_POLL_START up to
+# _INGEST_POLL_MAX seconds between probes, for at most _INGEST_TIMEOUT
+# seconds) and then posts a follow-up message to the user's room.
+_INGEST = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("ingestWorkers", 4)),
+    thread_name_prefix="ingest"
+)
+_FILE_POOL = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("fileWorkers", 4)),
+    thread_name_prefix="ingest-file"
+)
+_INGEST_POLL_START = float(os.environ.get("ingestPollStart", 1))
+_INGEST_POLL_MAX   = float(os.environ.get("ingestPollMax", 8))
+_INGEST_TIMEOUT    = float(os.environ.get("ingestTimeout", 90))
+
 def extract(data) -> tuple:
     """
     Extract and validate user information from the incoming data.
@@ -75,14 +212,22 @@ def extract(data) -> tuple:
     if not _UID_RE.match(uid):
         _LOGGER.warning(f"Potentially invalid characters in user_id: {uid}")
         
-    # Fetch/create SID from DynamoDB
-    sid, new = _get_sid(uid, user)
+    # Single read of the user record; sid and rsme are served from it
+    item = _load_user(uid)
+
+    # Fetch/create SID from the user record
+    sid, new = _get_sid(uid, user, item)
 
-    # Fetch the resume status from DynamoDB
-    rsme = _get_rsme(uid)
+    # Fetch the resume status from the user record
+    rsme = _get_rsme(uid, item)
     
-    # Store conversation in DynamoDB
-    _store_interaction(data, user, uid, sid, bool(files), rsme)
+    # Store conversation in DynamoDB. If another request assigned this user a
+    # SID first, the conditional write fails and we adopt the stored SID.
+    if not _store_interaction(data, user, uid, sid, bool(files), rsme, new) and new:
+        item = _load_user(uid, fresh=True)
+        if item.get("sid"):
+            sid, new = str(item["sid"]), False
+            _LOGGER.info(f"User <{uid}> was assigned SID <{sid}> concurrently; using it.")
 
     return (user, uid, new, sid, msg, files, rsme)
 
@@ -96,6 +241,9 @@ def guides(msg: str) -> str:
     and RAG parameters to obtain additional context for resume drafting. If no context is retrieved,
     a default message is returned.
 
+    Successful retrievals are cached on the normalized message plus rag_k and
+    threshold, since the guides corpus is shared by all users and rarely changes.
+
     Parameters:
         msg (str): The user prompt related to resume drafting.
 
@@ -103,23 +251,94 @@ def guides(msg: str) -> str:
         str: A JSON-formatted string containing the retrieved guiding information, or a default message 
              indicating no extra context was retrieved.
     """
-    message = (
-        "Please provide any salient information on drafting effective resumes related to the following prompt:\n"
-        + msg)
-    
-    resp = retrieve(
-        query = message,
-        session_id= _GUIDES_SID,
-        rag_threshold= _RAG_THR,
-        rag_k= _RAG_K
-        )
-    
+    _sync_guides_version()
+    key = _guides_key(msg)
+
+    resp = _GUIDES_CACHE.get(key)
+    if resp is not None:
+        _LOGGER.info(f"Guiding info served from cache: {_GUIDES_CACHE.stats()}")
+    else:
+        resp = retrieve(
+            query = _GUIDES_PROMPT + msg,
+            session_id= _GUIDES_SID,
+            rag_threshold= _RAG_THR,
+            rag_k= _RAG_K
+            )
+        # retrieve() reports failures as strings; only cache real results
+        if not isinstance(resp, str):
+            _GUIDES_CACHE.put(key, resp)
+    return _format_guides(resp)
+
+
+async def aguides(msg: str) -> str:
+    """
+    Awaitable `guides` for the ASGI serving mode. The cache and its version
+    check are shared with `guides`; only the proxy call is made without
+    holding a thread.
+
+    Parameters:
+        msg (str): The user prompt related to resume drafting.
+
+    Returns:
+        str: Same as `guides`.
+    """
+    await asyncio.to_thread(_sync_guides_version)
+    key = _guides_key(msg)
+
+    resp = _GUIDES_CACHE.get(key)
+    if resp is not None:
+        _LOGGER.info(f"Guiding info served from cache: {_GUIDES_CACHE.stats()}")
+    else:
+        resp = await aretrieve(
+            query = _GUIDES_PROMPT + msg,
+            session_id= _GUIDES_SID,
+            rag_threshold= _RAG_THR,
+            rag_k= _RAG_K
+            )
+        if not isinstance(resp, str):
+            _GUIDES_CACHE.put(key, resp)
+    return _format_guides(resp)
+
+
+def _guides_key(msg: str) -> tuple:
+    return (" ".join(msg.lower().split()), _RAG_K, _RAG_THR)
+
+
+def _format_guides(resp) -> str:
     if not resp: # if resp is empty
         _LOGGER.info("No guiding info found.")
         return "No extra context retrieved."
     else:
-        _LOGGER.info(f"Guiding info retrieved: {resp}")
-        return json.dumps(resp)
+        _LOGGER.info("Guiding info retrieved: %s", preview(resp))
+        return json.dumps(resp, separators=(",", ":"), ensure_ascii=False)
+
+
+def invalidate_guides() -> bool:
+    """
+    Drop cached guides retrievals in this and every other running process.
+
+    Call this after documents are added to the guides session. The local cache
+    is cleared immediately; other processes notice the new version within
+    `guidesVersionPoll` seconds.
+
+    Returns:
+        bool: True if the new version was recorded in DynamoDB, otherwise False.
+    """
+    _GUIDES_CACHE.clear()
+    version = str(time.time())
+    try:
+        _TABLE.put_item(Item={"uid": "guides", "version": version})
+        _GUIDES_VERSION.update(value=version, checked=time.monotonic())
+        _LOGGER.info(f"Guides cache invalidated; new version <{version}>.")
+        return True
+    except Exception as e:
+        _LOGGER.error(f"Failed to record guides version in DynamoDB: {e}", exc_info=True)
+        return False
+
+
+def guides_cache_stats() -> dict:
+    """Return hit/miss/eviction counters for the guides cache."""
+    return _GUIDES_CACHE.stats()
 
 
 def safe_load_text(filepath : str) -> str:
@@ -136,6 +355,40 @@ def safe_load_text(filepath : str) -> str:
         return ""
     
 
+def load_template(filepath: str) -> str:
+    """
+    Return the contents of a template file from memory, reloading it only when
+    its mtime changes. Missing or unreadable files yield an empty string, as
+    with `safe_load_text`.
+
+    Parameters:
+        filepath (str): Path to the template file.
+
+    Returns:
+        str: The file contents.
+    """
+    now = time.monotonic()
+    entry = _TEMPLATES.get(filepath)
+    if entry and now - entry[2] < _TEMPLATE_CHECK:
+        return entry[1]
+
+    with _TEMPLATE_LOCK:
+        entry = _TEMPLATES.get(filepath)
+        try:
+            mtime = os.stat(filepath).st_mtime_ns
+        except (OSError, TypeError):
+            mtime = None
+
+        if entry and entry[0] == mtime:
+            text = entry[1]
+        else:
+            text = safe_load_text(filepath) if mtime is not None else ""
+            _LOGGER.info(f"Loaded template {filepath} (mtime {mtime})")
+
+        _TEMPLATES[filepath] = (mtime, text, now)
+        return text
+
+
 def put_rsme(uid: str, rsme: bool) -> bool:
     """
     Update the 'rsme' attribute for a given user in the DynamoDB table.
@@ -165,80 +418,57 @@ def put_rsme(uid: str, rsme: bool) -> bool:
 
 def scrape(sid: str, msg: str) -> tuple:
     """
-    returns status of if any url scrape failed, and a list of failed urls
-    
-    TODO: fix uploading page content to sid
-    TODO: see the github for an example of how to do it.
+    Fetch every URL in the message concurrently and upload each page's text
+    to the session's RAG as soon as it is ready.
+
+    Parameters:
+        sid (str): The session identifier the pages are uploaded to.
+        msg (str): The user's message.
+
+    Returns:
+        tuple: (has_urls, failed, failed_urls) where `failed_urls` lists the
+               URLs that could not be fetched, parsed or uploaded in time.
     """
-    return (False, False, [])
-    # try:
-    #     urls = list(_extract_urls(msg))
-        
-    #     has_urls = bool(urls)
-    #     failed = False
-    #     failed_urls = list()
-        
-    #     for url in urls:
-    #         page = _robust_scrape(url)
-                        
-    #         if page == None: # ie. web-scraping failed
-    #             failed = True
-    #             failed_urls.append("url")
-    #         else:
-    #             _upload_page(sid, url, page)
-
-    #     return (has_urls, failed, failed_urls)
-
-    # except Exception as e:
-    #     _LOGGER
-    #     return (True, True, "An unknown error occurred when accessing sites; try uploading site content as a PDF.")
+    try:
+        urls = list(dict.fromkeys(_extract_urls(msg)))[:_SCRAPE_MAX_URLS]
+        if not urls:
+            return (False, False, [])
+
+        futures = {_SCRAPE_POOL.submit(_scrape_and_upload, sid, url): url for url in urls}
+        done, pending = wait(futures, timeout=_SCRAPE_DEADLINE)
+        failed_urls = [futures[f] for f in pending] + [futures[f] for f in done if not _scrape_ok(f, futures[f])]
+        if pending:
+            _LOGGER.warning(f"Scraping {len(pending)} URL(s) for session <{sid}> exceeded {_SCRAPE_DEADLINE}s.")
+
+        return (True, bool(failed_urls), failed_urls)
+
+    except Exception as e:
+        _LOGGER.error(f"An unknown error occurred when accessing sites: {e}", exc_info=True)
+        return (True, True, [])
     
 
 def upload(data, sid):
     """
-    Process file attachments from the incoming data: download from Rocket.Chat,
-    upload to the session's RAG, and optionally notify via chat.
+    Process file attachments from the incoming data. Downloading from
+    Rocket.Chat and uploading to the session's RAG happen in a background job,
+    which posts a follow-up chat message once the documents are queryable.
 
     Parameters:
         data (dict): The input data containing file attachment details.
         session_id (str): The session identifier.
 
     Returns:
-        A Flask JSON response indicating success or error.
+        A Flask JSON response acknowledging that ingestion has started.
     """
     user = data.get("user_name", "Unknown")
     room_id = data.get("channel_id", "")
     
     # A file is sent by the user
     if ("message" in data) and ('file' in data['message']):
-        saved_files = []
-
-        for file_info in data["message"]["files"]:
-            file_id = file_info["_id"]
-            filename = file_info["name"]
-
-            # Download file
-            _LOGGER.info(f"Downloading file <{filename}> from Rocket.Chat.")
-            file_path = _download_file(file_id, filename)
-
-            if file_path:
-                saved_files.append(file_path)
-                # upload it to RAG so that session has the file
-                _LOGGER.info(f"Uploading file <{file_path}> to RAG.")
-                _LOGGER.info(f"pdf_upload path = {file_path}, session_id = {sid}, strategy = {'smart'}")
-                response = pdf_upload(
-                    path = file_path,
-                    session_id = sid,
-                    description=filename,
-                    strategy = 'smart'
-                    )
-                _LOGGER.info(f"Response from RAG upload: {response}")
-                sleep(10) # so that documents have time to load
-
-            else:
-                _LOGGER.info(f"Failed to download file.")
-                return jsonify({"error": "Failed to download file"}), 500
-            
+        files = list(data["message"]["files"])
+        _INGEST.submit(_ingest, files, sid, user, room_id)
+        _LOGGER.info(f"Queued ingestion of {len(files)} file(s) for session <{sid}>.")
+
         # Commented out for now because of double messages sent - which is 
         # unnecessary.
         # Send message with the downloaded file
@@ -247,8 +477,228 @@ def upload(data, sid):
         #     _send_message_with_file(room_id, message_text, saved_file)
         #     _LOGGER.info(f"Sending message with {saved_file}\n")
 
-        # _LOGGER.info(f"Files processed and re-sent successfully!")
-        return jsonify({"text": "Files processed and re-sent successfully!"})
+        return jsonify({"text": "📥 Got it! I'm reading your file(s) now and will message you as soon as they're ready."})
+
+
+def upload_once(file, sid: str, description: str | None = None, strategy: str = "smart") -> tuple:
+    """
+    Upload a PDF to a session's RAG unless the same bytes were already added
+    to that session. The file is identified by a SHA-256 of its contents,
+    claimed in the upload ledger with a conditional write before uploading,
+    and released again if the upload fails.
+
+    Parameters:
+        file: An open binary file object, read from the start.
+        sid (str): The target session identifier.
+        description (str): Description passed to `pdf_upload`.
+        strategy (str): Chunking strategy passed to `pdf_upload`.
+
+    Returns:
+        tuple: (response, duplicate) where `response` is the `pdf_upload`
+               result (None for duplicates) and `duplicate` is True if the
+               upload was skipped.
+    """
+    digest = _file_digest(file)
+    key = _claim_upload(sid, digest, description)
+    if key is False:
+        return (None, True)
+
+    response = pdf_upload(file=file, session_id=sid, description=description, strategy=strategy)
+    _settle_upload(key, str(response).startswith("Successfully"), description)
+    return (response, False)
+
+
+def _claim_upload(sid: str, digest: str, name: str | None):
+    """
+    Claim content `digest` for session `sid` in the upload ledger.
+
+    Returns:
+        dict | None | bool: The ledger key to settle after uploading, None if
+                            the ledger is unavailable (upload without dedup),
+                            or False if the content was already added.
+    """
+    key = {"uid": f"upload#{sid}#{digest}"}
+    now = time.time()
+
+    try:
+        _TABLE.put_item(
+            Item={**key, "status": "pending", "claimed_at": int(now), "name": name or ""},
+            ConditionExpression="attribute_not_exists(uid) OR (#status = :pending AND claimed_at < :stale)",
+            ExpressionAttributeNames={"#status": "status"},
+            ExpressionAttributeValues={":pending": "pending", ":stale": int(now - _UPLOAD_CLAIM_TTL)}
+        )
+        return key
+    except Exception as e:
+        if isinstance(e, ClientError) and e.response.get("Error", {}).get("Code") == "ConditionalCheckFailedException":
+            _LOGGER.info(f"Skipping duplicate upload <{name}> ({digest[:12]}) to session <{sid}>")
+            return False
+        _LOGGER.warning(f"Upload ledger unavailable, uploading without dedup: {e}")
+        return None
+
+
+def _settle_upload(key: dict | None, ok: bool, name: str | None) -> None:
+    """Mark a claimed upload done, or release the claim if the upload failed."""
+    if key is None:
+        return
+    try:
+        if ok:
+            _TABLE.update_item(
+                Key=key,
+                UpdateExpression="SET #status = :done",
+                ExpressionAttributeNames={"#status": "status"},
+                ExpressionAttributeValues={":done": "done"}
+            )
+        else:
+            _TABLE.delete_item(Key=key)
+    except Exception as e:
+        _LOGGER.error(f"Failed to update upload ledger for <{name}>: {e}", exc_info=True)
+
+
+def claim_reply(mid: str) -> bool:
+    """
+    Claim the right to answer Rocket.Chat message `mid` with a conditional
+    write to the reply ledger. If the ledger is unavailable the claim is
+    granted, since a duplicate reply beats no reply.
+
+    Parameters:
+        mid (str): The Rocket.Chat message_id.
+
+    Returns:
+        bool: True if this delivery should be answered, False if another
+              delivery of the same message already claimed it.
+    """
+    now = time.time()
+    try:
+        _TABLE.put_item(
+            Item={"uid": f"reply#{mid}", "status": "pending", "claimed_at": int(now), "expires": int(now + _REPLY_KEEP)},
+            ConditionExpression="attribute_not_exists(uid) OR (#status = :pending AND claimed_at < :stale)",
+            ExpressionAttributeNames={"#status": "status"},
+            ExpressionAttributeValues={":pending": "pending", ":stale": int(now - _REPLY_CLAIM_TTL)}
+        )
+        return True
+    except Exception as e:
+        if isinstance(e, ClientError) and e.response.get("Error", {}).get("Code") == "ConditionalCheckFailedException":
+            _LOGGER.info(f"Message <{mid}> already claimed by another delivery.")
+            return False
+        _LOGGER.warning(f"Reply ledger unavailable, answering <{mid}> without dedup: {e}")
+        return True
+
+
+def finish_reply(mid: str, delivered: bool, response=None) -> None:
+    """
+    Mark a claimed message as answered, storing `response` (JSON-serializable)
+    for replay to later deliveries if given, or release the claim if the reply
+    could not be delivered so a webhook retry may try again.
+    """
+    key = {"uid": f"reply#{mid}"}
+    try:
+        if delivered and response is not None:
+            _TABLE.update_item(
+                Key=key,
+                UpdateExpression="SET #status = :done, #response = :response",
+                ExpressionAttributeNames={"#status": "status", "#response": "response"},
+                ExpressionAttributeValues={":done": "done", ":response": json.dumps(response)}
+            )
+        elif delivered:
+            _TABLE.update_item(
+                Key=key,
+                UpdateExpression="SET #status = :done",
+                ExpressionAttributeNames={"#status": "status"},
+                ExpressionAttributeValues={":done": "done"}
+            )
+        else:
+            _TABLE.delete_item(Key=key)
+    except Exception as e:
+        _LOGGER.error(f"Failed to update reply ledger for <{mid}>: {e}", exc_info=True)
+
+
+def load_reply(mid: str) -> dict | None:
+    """
+    Read a message's reply ledger entry.
+
+    Returns:
+        dict | None: {"status", "response"} where `response` is the stored
+                     response (or None), or None if the message is unclaimed
+                     or the ledger is unavailable.
+    """
+    try:
+        item = _TABLE.get_item(Key={"uid": f"reply#{mid}"}, ConsistentRead=True).get("Item")
+    except Exception as e:
+        _LOGGER.error(f"Failed to read reply ledger for <{mid}>: {e}", exc_info=True)
+        return None
+    if not item:
+        return None
+    response = item.get("response")
+    return {"status": item.get("status"), "response": json.loads(response) if response else None}
+
+
+def post_reply(payload: dict, room_id: str = "", user: str = "") -> bool:
+    """
+    Post a /query response payload ("text" and optional "attachments") to the
+    user's room, or to "@user" if the room is unknown.
+
+    Returns:
+        bool: True if Rocket.Chat accepted the message, otherwise False.
+    """
+    return _post_message(payload["text"], room_id=room_id, channel=f"@{user}",
+                         attachments=payload.get("attachments"))
+
+
+def append_turns(uid: str, sid: str, turns: list) -> bool:
+    """
+    Append chat turns to the stored history without rewriting earlier turns.
+
+    Parameters:
+        uid (str): The user's unique identifier.
+        sid (str): The session identifier.
+        turns (list): Turns to append, e.g. [{"role": "user", "msg": "..."}].
+
+    Returns:
+        bool: True if the turns were stored, otherwise False.
+    """
+    if not turns:
+        return True
+
+    try:
+        if _HISTORY is not None:
+            # Sort keys are time-ordered so a Query returns turns in order
+            base = time.time_ns()
+            with _HISTORY.batch_writer() as batch:
+                for i, turn in enumerate(turns):
+                    batch.put_item(Item={"sid": sid, "seq": f"{base:020d}#{i}", "uid": uid, **turn})
+        else:
+            _TABLE.update_item(
+                Key={"uid": uid},
+                UpdateExpression="SET chat_log = list_append(if_not_exists(chat_log, :empty), :turns) ADD chat_turns :n",
+                ExpressionAttributeValues={":empty": [], ":turns": turns, ":n": len(turns)}
+            )
+            _trim_chat_log(uid, sid, len(turns))
+        _LOGGER.info(f"Appended {len(turns)} turn(s) to chat history for session <{sid}>")
+        return True
+    except Exception as e:
+        _LOGGER.error(f"Failed to append chat history for session <{sid}>: {e}", exc_info=True)
+        return False
+
+
+def _trim_chat_log(uid: str, sid: str, added: int) -> None:
+    # The count comes from the record already loaded for this request
+    item = _load_user(uid)
+    count = int(item.get("chat_turns", 0)) + added
+    item["chat_turns"] = count
+    if count <= _USER_MAX_TURNS + _TRIM_SLACK:
+        return
+
+    # Removing from the front is safe against concurrent appends, which only
+    # add to the end
+    excess = count - _USER_MAX_TURNS
+    _TABLE.update_item(
+        Key={"uid": uid},
+        UpdateExpression="REMOVE " + ", ".join(f"chat_log[{i}]" for i in range(excess)) + " ADD chat_turns :n",
+        ExpressionAttributeValues={":n": -excess}
+    )
+    item["chat_turns"] = _USER_MAX_TURNS
+    _LOGGER.info(f"Trimmed {excess} oldest turn(s) from the chat log of session <{sid}>")
+
 
 def update_resume_summary(sid, section, content):
     """
@@ -262,7 +712,7 @@ def update_resume_summary(sid, section, content):
     session[sid]["resume_summary"][section] = content
 
     # 🔍 DEBUG: Log the entire resume after updating
-    _LOGGER.debug(f"Updated resume summary for session {sid}: {session[sid]['resume_summary']}")
+    _LOGGER.debug("Updated resume summary for session %s: %s", sid, preview(session[sid]['resume_summary']))
 
     # Generate formatted summary
     formatted_summary = "\n".join(
@@ -281,36 +731,36 @@ def send_resume_for_review(sid, uid):
     Falls back to DynamoDB if chat_log not in session memory.
     """
     _LOGGER.info(f"Sending resume review request for session {sid}")
-    _LOGGER.debug(f"[REVIEW] Session keys: {list(session.keys())}")
-    _LOGGER.debug(f"[REVIEW] Session[{sid}]: {session.get(sid, {})}")
+    _LOGGER.debug("[REVIEW] Session keys: %s", list(session.keys()))
+    _LOGGER.debug("[REVIEW] Session[%s]: %s", sid, preview(session.get(sid, {})))
 
     # Step 1: Try to get chat history from memory
     chat_log = session.get(sid, {}).get("chat_log", [])
 
-    # Step 2: Fallback to DynamoDB if needed
+    # Step 2: Fallback to the stored history if needed, read a page at a time
     if not chat_log:
         _LOGGER.warning(f"No in-memory chat log found for session {sid}. Trying DynamoDB...")
-        try:
-            response = _TABLE.get_item(Key={"uid": uid})  # ✅ fixed
-            chat_log = response.get("Item", {}).get("chat_log", [])
-            _LOGGER.info(f"Fallback chat_log loaded from DynamoDB. Entries: {len(chat_log)}")
-        except Exception as e:
-            _LOGGER.error(f"Failed to retrieve chat_log from DynamoDB: {e}")
-            chat_log = []
+        chat_log = _iter_chat_log(uid, sid)
 
     # Step 3: Build prompt or fallback message
-    if not chat_log:
-        summary_text = "No detailed summary available. Please review the resume edits manually."
-    else:
-        prompt = (
-            "You are a helpful assistant summarizing a resume editing session between a user and a bot.\n"
-            "Return a bullet-point summary of the changes and suggestions discussed, clearly labeled as 'Summary of Edits:'\n\n"
-        )
+    prompt = (
+        "You are a helpful assistant summarizing a resume editing session between a user and a bot.\n"
+        "Return a bullet-point summary of the changes and suggestions discussed, clearly labeled as 'Summary of Edits:'\n\n"
+    )
+    turns = 0
+    try:
         for pair in chat_log:
             role = pair.get("role", "unknown")
             msg = pair.get("msg", "")
             prompt += f"{role.capitalize()}: {msg}\n"
+            turns += 1
+    except Exception as e:
+        _LOGGER.error(f"Failed to retrieve chat_log from DynamoDB: {e}")
+    _LOGGER.info(f"Chat log loaded for review. Entries: {turns}")
 
+    if not turns:
+        summary_text = "No detailed summary available. Please review the resume edits manually."
+    else:
         # Step 4: Call LLM to summarize
         try:
             summary_response = generate(
@@ -427,20 +877,55 @@ def test_send_resume_for_review(sid):
     return response_data
 
 
+def _sync_guides_version() -> None:
+    """
+    Clear the guides cache if another process published a new guides version.
+    Checks DynamoDB at most once every `guidesVersionPoll` seconds.
+    """
+    now = time.monotonic()
+    if now - _GUIDES_VERSION["checked"] < _GUIDES_POLL:
+        return
+    _GUIDES_VERSION["checked"] = now
+
+    try:
+        version = _TABLE.get_item(Key={"uid": "guides"}).get("Item", {}).get("version")
+    except Exception as e:
+        _LOGGER.warning(f"Could not check guides version: {e}")
+        return
+
+    if version != _GUIDES_VERSION["value"]:
+        if _GUIDES_VERSION["value"] is not None:
+            _LOGGER.info(f"Guides version changed to <{version}>; clearing guides cache.")
+            _GUIDES_CACHE.clear()
+        _GUIDES_VERSION["value"] = version
+
+
 def _gen_sid() -> str:
     """
-    Generate a unique session identifier (SID) using the current epoch time.
+    Generate a unique session identifier (SID) without shared mutable state.
+
+    The SID is a 12-hex-digit millisecond timestamp, an 8-hex-digit random
+    node id drawn once per process, and a 6-hex-digit per-process counter, so
+    two SIDs can only collide if two processes draw the same 32-bit node id
+    and hit the same counter value in the same millisecond.
 
     Returns:
-        str: A 10-character hexadecimal string.
+        str: A 26-character hexadecimal string.
     """
-    _HASH.update(str(time.time()).encode('utf-8'))
-    return _HASH.hexdigest()[:10]
+    pid = os.getpid()
+    if _SID_NODE["pid"] != pid:
+        _SID_NODE.update(pid=pid, node=secrets.token_hex(4))
+    count = next(_SID_COUNTER) & 0xFFFFFF
+    return f"{time.time_ns() // 1_000_000:012x}{_SID_NODE['node']}{count:06x}"
 
 
-def _new_sid() -> bool:
+def _new_sid(slot: str = "free") -> bool:
     """
     Reserve a new free session ID in the DynamoDB table for future assignment.
+    The write is conditional, so an unclaimed reservation is never replaced.
+
+    Parameters:
+        slot (str): The pool slot (uid) to reserve the SID under.
 
     Returns:
         bool: True if the free SID was successfully stored, otherwise False.
@@ -449,20 +934,146 @@ def _new_sid() -> bool:
         sid = _gen_sid()
         _TABLE.put_item(
             Item={
-                "uid": str("free"),
+                "uid": str(slot),
                 "sid": str(sid),
                 "created_at": str(time.time()).encode('utf-8')
-            }
+            },
+            ConditionExpression="attribute_not_exists(uid)"
         )
         
-        _LOGGER.info(f"Reserved new free SID <{sid}> for future assignment.")    
+        _LOGGER.info(f"Reserved new free SID <{sid}> in slot <{slot}> for future assignment.")    
         return True
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") == "ConditionalCheckFailedException":
+            _LOGGER.debug(f"Slot <{slot}> already holds a free SID; nothing to do.")
+            return True
+        _LOGGER.error(f"Error creating overhead SID in DynamoDB: {e}", exc_info=True)
+        return False
     except Exception as e:
         _LOGGER.error(f"Error creating overhead SID in DynamoDB: {e}", exc_info=True)
         return False
-       
 
-def _get_sid(uid: str, user: str = "UnknownName") -> tuple:
+
+def _claim_free_sid() -> str | None:
+    """
+    Atomically claim a reserved SID from the pool. Each conditional delete
+    returns the old item to exactly one caller, so two requests can never
+    claim the same SID. A few random slots are tried so that a burst of new
+    users spreads across the pool instead of contending on one item.
+
+    Returns:
+        str | None: The claimed SID, or None if no reserved SID was found.
+    """
+    _ensure_sid_refiller()
+    if _SID_POOL["empty"]:
+        return None
+
+    try:
+        for slot in random.sample(_SID_SLOTS, min(_SID_POOL_TRIES, len(_SID_SLOTS))):
+            try:
+                resp = _TABLE.delete_item(
+                    Key={"uid": slot},
+                    ConditionExpression="attribute_exists(sid)",
+                    ReturnValues="ALL_OLD"
+                )
+            except ClientError as e:
+                if e.response.get("Error", {}).get("Code") == "ConditionalCheckFailedException":
+                    continue
+                raise
+            sid = resp.get("Attributes", {}).get("sid")
+            if sid:
+                return str(sid)
+
+        # Skip further claims until the refiller has topped the pool up
+        _SID_POOL["empty"] = True
+        return None
+    finally:
+        _SID_REFILL.set()
+
+
+def _refill_sid_pool() -> int:
+    """
+    Top the SID pool back up to its full depth if it is below the low-water mark.
+
+    Returns:
+        int: The number of SIDs reserved.
+    """
+    table = _TABLE.name
+    resp = _DYNAMO_DB.batch_get_item(RequestItems={
+        table: {"Keys": [{"uid": slot} for slot in _SID_SLOTS], "ProjectionExpression": "uid"}
+    })
+    filled = {item["uid"] for item in resp.get("Responses", {}).get(table, [])}
+    # Slots that could not be read this round are treated as filled
+    filled |= {k["uid"] for k in resp.get("UnprocessedKeys", {}).get(table, {}).get("Keys", [])}
+
+    added = 0
+    if len(filled) < _SID_POOL_LOW or _SID_POOL["empty"]:
+        for slot in _SID_SLOTS:
+            if slot not in filled and _new_sid(slot):
+                added += 1
+        _LOGGER.info(f"SID pool refilled: {len(filled)} -> {len(filled) + added} of {len(_SID_SLOTS)}")
+    _SID_POOL["empty"] = False
+    return added
+
+
+def _sid_refiller() -> None:
+    """Background loop that keeps the SID pool above its low-water mark."""
+    while True:
+        _SID_REFILL.wait(_SID_POOL_INTERVAL)
+        _SID_REFILL.clear()
+        try:
+            _refill_sid_pool()
+        except Exception as e:
+            _LOGGER.error(f"Failed to refill SID pool: {e}", exc_info=True)
+            time.sleep(_SID_POOL_INTERVAL)
+
+
+def _ensure_sid_refiller() -> None:
+    """Start the SID pool refiller in this process if it is not running."""
+    pid = os.getpid()
+    thread = _SID_POOL["thread"]
+    if _SID_POOL["pid"] == pid and thread is not None and thread.is_alive():
+        return
+    with _SID_POOL_LOCK:
+        thread = _SID_POOL["thread"]
+        if _SID_POOL["pid"] == pid and thread is not None and thread.is_alive():
+            return
+        thread = threading.Thread(target=_sid_refiller, name="sid-pool-refiller", daemon=True)
+        _SID_POOL.update(pid=pid, thread=thread)
+        thread.start()
+        _SID_REFILL.set()
+
+
+def _load_user(uid: str, fresh: bool = False) -> dict:
+    """
+    Load the DynamoDB record for a user once per request.
+
+    Only the attributes in `_USER_FIELDS` are read, and the item is cached on
+    `flask.g` so that the SID and resume status lookups made while serving one
+    request share a single `get_item`.
+
+    Parameters:
+        uid (str): The user's unique identifier.
+        fresh (bool): If True, bypass the per-request cache and re-read the item.
+
+    Returns:
+        dict: The stored item, or an empty dict if the user is unknown or on error.
+    """
+    cache = g.setdefault("user_records", {}) if has_app_context() else {}
+    if not fresh and uid in cache:
+        return cache[uid]
+
+    try:
+        item = _TABLE.get_item(Key={"uid": uid}, ProjectionExpression=_USER_FIELDS).get("Item", {})
+    except Exception as e:
+        _LOGGER.error(f"Error loading user record <{uid}> from DynamoDB: {e}", exc_info=True)
+        item = {}
+
+    cache[uid] = item
+    return item
+
+
+def _get_sid(uid: str, user: str = "UnknownName", item: dict | None = None) -> tuple:
     """
     Retrieve the session ID (SID) associated with a given user ID (uid).
     If no SID exists, assign a free or new SID to the user.
@@ -470,34 +1081,33 @@ def _get_sid(uid: str, user: str = "UnknownName") -> tuple:
     Parameters:
         uid (str): The user's unique identifier.
         username (str): The user's name (default is "UnknownName").
+        item (dict): The user record from `_load_user`; loaded if not given.
 
     Returns:
         tuple: A tuple (sid, is_new) where 'sid' is the session ID (str)
                and 'is_new' is a boolean indicating if the user is new.
     """
     sid = ""
+    if item is None:
+        item = _load_user(uid)
     
     try:
-        # Check if SID already exists in DynamoDB
-        resp = _TABLE.get_item(Key={"uid": uid})
-        if "Item" in resp:
-            sid = resp["Item"]["sid"]
+        # Check if SID already exists in the user record
+        if item.get("sid"):
+            sid = item["sid"]
             _LOGGER.info(f"User <{uid}> has existing SID <{sid}>")
             return (str(sid), False)
 
-        # If no SID, try to assign a free SID.
-        resp = _TABLE.get_item(Key={"uid": "free"}) # "free" because thats the UID
-        if "Item" in resp:
-            sid = resp["Item"]["sid"]
-            _TABLE.delete_item(Key={"uid": "free"}) # Remove free SID after assignment
+        # If no SID, try to claim a reserved SID from the pool.
+        sid = _claim_free_sid()
+        if sid:
             _LOGGER.info(f"Assigned existing free SID <{sid}> to user <{uid}>")
-        # If not, create a new SID and store it
+        # If not, create a new SID locally; the background refiller restocks
+        # the pool, so nothing is reserved on the request path.
         else:
             sid = _gen_sid()
             _LOGGER.info(f"No free SID found. Created new SID <{sid}> for user <{uid}>")
 
-        # Reserve another free SID for future assignments.
-        _new_sid()
         return (str(sid), True)
     
     except Exception as e:
@@ -505,31 +1115,77 @@ def _get_sid(uid: str, user: str = "UnknownName") -> tuple:
         return (str(""), False)
 
 
-def _get_rsme(uid: str) -> bool | None:
+def _get_rsme(uid: str, item: dict | None = None) -> bool | None:
     """
-    Retrieve the resume editing (rsme) status for a user from DynamoDB.
+    Retrieve the resume editing (rsme) status for a user from their record.
 
     Parameters:
         uid (str): The user's unique identifier.
+        item (dict): The user record from `_load_user`; loaded if not given.
 
     Returns:
         bool | None: The resume editing status if found, or None if not set or on error.
     """
-    try:
-        resp = _TABLE.get_item(Key={"uid": uid})
-        if "Item" in resp:
-            rsme = resp["Item"]["rsme"]
-            if rsme == None:
-                _LOGGER.info(f"User <{uid}> has no resume editing status set.")
-                return None
-            else:
-                _LOGGER.info(f"User <{uid}> has resumes editing status: {rsme}")
-                return rsme
-        else:
-            raise LookupError
-    except Exception as e:
-        _LOGGER.info("Error accessing DynamoDB for resume editing status. Assuming rsme is None.", exc_info=False)
+    if item is None:
+        item = _load_user(uid)
+
+    rsme = item.get("rsme")
+    if rsme == None:
+        _LOGGER.info(f"User <{uid}> has no resume editing status set.")
+        return None
+
+    _LOGGER.info(f"User <{uid}> has resumes editing status: {rsme}")
+    return rsme
+
+
+def stored_turns(uid: str) -> int | None:
+    """
+    Number of chat turns stored on the user's record, from the record already
+    loaded for this request.
+
+    Parameters:
+        uid (str): The user's unique identifier.
+
+    Returns:
+        int | None: The turn count; 0 for a user with no record, None when it
+                    is not tracked (history table, or records predating it).
+    """
+    if _HISTORY is not None:
         return None
+    item = _load_user(uid)
+    if not item:
+        return 0
+    return int(item["chat_turns"]) if "chat_turns" in item else None
+
+
+def _iter_chat_log(uid: str, sid: str):
+    """
+    Yield a session's chat turns in order, fetching them a page at a time.
+
+    Parameters:
+        uid (str): The user's unique identifier (used without a history table).
+        sid (str): The session identifier.
+
+    Yields:
+        dict: Turns of the form {"role": ..., "msg": ...}.
+    """
+    if _HISTORY is None:
+        item = _TABLE.get_item(Key={"uid": uid}, ProjectionExpression="chat_log").get("Item", {})
+        yield from item.get("chat_log", [])
+        return
+
+    kwargs = {
+        "KeyConditionExpression": Key("sid").eq(sid),
+        "ProjectionExpression": "#role, msg",
+        "ExpressionAttributeNames": {"#role": "role"},
+        "Limit": _HISTORY_PAGE,
+    }
+    while True:
+        page = _HISTORY.query(**kwargs)
+        yield from page.get("Items", [])
+        if "LastEvaluatedKey" not in page:
+            return
+        kwargs["ExclusiveStartKey"] = page["LastEvaluatedKey"]
 
 
 def _validate(vValue, vName : str = "unknown", vType : type = str, 
@@ -544,26 +1200,34 @@ def _validate(vValue, vName : str = "unknown", vType : type = str,
         value_name (str): The name of the value (for logging purposes).
         expected_type (type): The expected type of the value.
         default_value: The default value to return if validation fails.
-        log_level: The logging level to use if validation fails.
+        log_level: The logger method or numeric level to use if validation fails.
 
     Returns:
         The original value if valid; otherwise, the default_value.
     """
     if not isinstance(vValue, vType):
-        _LOGGER.log(
-            log_level,
-            f"Received non-{vType.__name__} for {vName}: {vValue}"
-        )
+        message = f"Received non-{vType.__name__} for {vName}: {vValue}"
+        # Callers pass a logger method (e.g. _LOGGER.warning) or a numeric level
+        if callable(log_level):
+            log_level(message)
+        else:
+            _LOGGER.log(log_level, message)
         return vValueDefault
     
     return vValue
 
 
 def _store_interaction(data: dict, user: str, uid: str, sid: str, files: bool,
-                       rsme: bool) -> bool:
+                       rsme: bool, new: bool = False) -> bool:
     """
     Store conversation interaction data in the DynamoDB table.
 
+    The interaction record is handed to a write-behind queue and written in
+    batches by a background thread, so the reply never waits on it. Only a
+    new user's SID assignment is written synchronously, with a conditional
+    `update_item` that fails if another request assigned one first; other
+    fields on the user record (e.g. `rsme` from `put_rsme`) are left untouched.
+
     Parameters:
         interaction_data (dict): The full payload of interaction data.
         username (str): The user's name.
@@ -571,19 +1235,32 @@ def _store_interaction(data: dict, user: str, uid: str, sid: str, files: bool,
         sid (str): The session identifier.
         has_files (bool): Flag indicating whether files were attached.
         rsme_status (bool): The resume editing status.
+        new (bool): Flag indicating the SID was just assigned to this user.
 
     Returns:
-        bool: True if the interaction was successfully stored, otherwise False.
+        bool: True if the interaction was accepted for storage, otherwise False.
     """    
     try:
         timestamp = data.get("timestamp", "UnknownTimestamp")
+        mid = data.get("message_id") or f"UnknownMessageID-{time.time_ns()}"
+
+        if new:
+            _TABLE.update_item(
+                Key={"uid": uid},
+                UpdateExpression="SET #sid = :sid, #user = :user",
+                ConditionExpression="attribute_not_exists(#sid) OR #sid = :sid",
+                ExpressionAttributeNames={"#sid": "sid", "#user": "user"},
+                ExpressionAttributeValues={":sid": sid, ":user": user},
+            )
+            _LOGGER.info(f"SID <{sid}> saved for new user <{uid}>")
 
         # init user data structure
         interaction = {
+            "uid": f"interaction#{uid}#{mid}",                  # record key
             "user": user,
-            "uid": uid,                                         # user id
+            "user_id": uid,                                     # user id
             "sid": sid ,                                        # session id
-            "mid": data.get("message_id", "UnknownMessageID"),  # message id
+            "mid": mid,                                         # message id
             "cid": data.get("channel_id", "UnknownChannelID"),  # channel id
             "timestamp": timestamp,
             "token": data.get("token", ""),
@@ -593,109 +1270,447 @@ def _store_interaction(data: dict, user: str, uid: str, sid: str, files: bool,
             "rsme": rsme
         }        
 
-        # ✅ Store chat_log if it exists
-        chat_log = session.get(sid, {}).get("chat_log", [])
-        if chat_log:
-           interaction["chat_log"] = chat_log
-       
-        # Store interaction in DynamoDB
-        _TABLE.put_item(Item=interaction)
-        _LOGGER.info(f"Conversation history saved for user <{uid}> at {timestamp}")
+        # Queue interaction for DynamoDB
+        _INTERACTIONS.put(interaction)
+        _LOGGER.info(f"Conversation history queued for user <{uid}> at {timestamp}")
         return True
+
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") == "ConditionalCheckFailedException":
+            _LOGGER.warning(f"User <{uid}> was assigned a SID concurrently; <{sid}> not saved.")
+            return False
+        _LOGGER.error(f"Failed to save conversation history to DynamoDB: {e}", exc_info=True)
+        return False
         
     except Exception as e:
         _LOGGER.error(f"Failed to save conversation history to DynamoDB: {e}", exc_info=True)
         return False   
 
 
-def _upload_page(sid: str, url: str, page: str) -> bool:
-    """Upload page contents to session RAG as text files"""
-    try:
-        text_upload(text=page, description=url, session_id=sid)
-        _LOGGER.info(f"Page {url} successfully uploaded to session: {sid}")
+def interaction_queue_stats() -> dict:
+    """Return depth, drop and flush-latency counters for the interaction queue."""
+    return _INTERACTIONS.stats()
+
+
+def _collect_metrics() -> list:
+    # Exported on /metrics from counters the cache and queue already keep
+    cache = _GUIDES_CACHE.stats()
+    queue = _INTERACTIONS.stats()
+    pages = _PAGE_CACHE.stats()
+    guides = (("cache", "guides"),)
+    return [
+        ("page_cache_entries", "gauge", "Scraped pages cached on disk.", {(): pages["entries"]}),
+        ("page_cache_bytes", "gauge", "Bytes of scraped page text cached on disk.", {(): pages["bytes"]}),
+        ("cache_hits_total", "counter", "Cache lookups served from memory.", {guides: cache["hits"]}),
+        ("cache_misses_total", "counter", "Cache lookups that went upstream.", {guides: cache["misses"]}),
+        ("cache_entries", "gauge", "Entries currently cached.", {guides: cache["size"]}),
+        ("interaction_queue_depth", "gauge", "Interaction records waiting to be written.", {(): queue["depth"]}),
+        ("interaction_records_total", "counter", "Interaction records by outcome.", {
+            (("outcome", "written"),): queue["written"],
+            (("outcome", "failed"),): queue["failed"],
+            (("outcome", "dropped"),): queue["dropped"],
+        }),
+        ("interaction_flush_seconds_total", "counter", "Time spent writing interaction batches.", {(): queue["flush_seconds_total"]}),
+    ]
+
+register_collector(_collect_metrics)
+
+
+def _upload_page(sid: str, url: str, page: str, digest: str) -> bool:
+    """
+    Upload page contents to session RAG as text files, unless text with the
+    same `digest` was already added to the session (which counts as success).
+    """
+    key = _claim_upload(sid, digest, url)
+    if key is False:
         return True
+
+    ok = False
+    try:
+        response = text_upload(text=page, description=url, session_id=sid)
+        ok = str(response).startswith("Successfully")
+        if not ok:
+            _LOGGER.error(f"Failed to upload page {url}: {response}")
+        else:
+            _LOGGER.info(f"Page {url} successfully uploaded to session: {sid}")
     except Exception as e:
         _LOGGER.error(f"Exception raised when uploading page: {url}")  
-        return False
+    _settle_upload(key, ok, url)
+    return ok
 
 
 def _extract_urls(msg: str) -> list:
     """Extract URLs in many different formats from the message."""
+    if not msg or not _URL_HINT.search(msg):
+        return []
     try:
-        extractor = URLExtract()
+        extractor = _URL_EXTRACTOR["extractor"]
+        if extractor is None:
+            with _URL_EXTRACTOR_LOCK:
+                if _URL_EXTRACTOR["extractor"] is None:
+                    _URL_EXTRACTOR["extractor"] = URLExtract()
+                extractor = _URL_EXTRACTOR["extractor"]
         urls = extractor.find_urls(msg)
-        _LOGGER.info(f"Extracted urls: {urls}")
+        _LOGGER.info("Extracted urls: %s", urls)
         return urls
     except Exception as e:
         _LOGGER.warning(f"An error occurred when extracting urls: {e}")
         return []
 
 
+def _scrape_ok(future, url: str) -> bool:
+    """Result of a finished `_scrape_and_upload`; an exception counts as a failure of that URL only."""
+    try:
+        return bool(future.result())
+    except Exception as e:
+        _LOGGER.error(f"Scraping {url} failed: {e}", exc_info=True)
+        return False
+
+
+def _scrape_and_upload(sid: str, url: str) -> bool:
+    """Scrape one URL and upload its text. Runs on the scrape pool; never raises."""
+    start = time.perf_counter()
+    page, digest = _robust_scrape(url)
+    ok = bool(page) and _upload_page(sid, url, page, digest)
+    _LOGGER.info(f"Scraped {url} for session <{sid}>: ok={ok}, chars={len(page or '')}, {time.perf_counter() - start:.2f}s")
+    return ok
+
+
+def _public_host(host: str) -> bool:
+    """True if every address `host` resolves to is publicly routable."""
+    try:
+        infos = socket.getaddrinfo(host, None, proto=socket.IPPROTO_TCP)
+    except (socket.gaierror, UnicodeError):
+        return False
+    return bool(infos) and all(ipaddress.ip_address(info[4][0].split("%")[0]).is_global for info in infos)
+
+
+def _fetch_page(url: str, cached: dict | None = None, parse=None) -> tuple:
+    """
+    Fetch a page through the pooled scrape session, following redirects only
+    to allowed hosts and reading at most `scrapeMaxBytes`. With a `cached`
+    page cache entry, the request is conditional on its ETag/Last-Modified.
+    With `parse`, the body is handed to `parse(chunks, content_type,
+    encoding)` as it arrives and its result is returned in place of the body.
+    Raises on HTTP errors, disallowed hosts and non-text content types.
+
+    Returns:
+        tuple: (body, content_type, encoding, final_url, validators) where
+               `body` is None if the server answered 304 Not Modified,
+               `encoding` is None unless the server declared a charset, and
+               `validators` holds the response's "etag" and "last_modified".
+    """
+    if "://" not in url:
+        url = f"https://{url}"
+
+    headers = {}
+    if cached and cached.get("etag"):
+        headers["If-None-Match"] = cached["etag"]
+    if cached and cached.get("last_modified"):
+        headers["If-Modified-Since"] = cached["last_modified"]
+
+    for _ in range(_SCRAPE_REDIRECTS + 1):
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"Unsupported URL: {url}")
+        if not _SCRAPE_PRIVATE and not _public_host(parts.hostname):
+            raise ValueError(f"Refusing to fetch non-public host {parts.hostname}")
+
+        with _SCRAPE_SESSION.get(url, headers=headers, timeout=_SCRAPE_TIMEOUT, stream=True, allow_redirects=False) as response:
+            if response.is_redirect:
+                url = urljoin(url, response.headers["Location"])
+                continue
+            validators = {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+            if response.status_code == 304:
+                return (None, None, None, url, validators)
+            response.raise_for_status() # raises of 400 or 500 error in response
+
+            content_type = response.headers.get("Content-Type", "text/html").split(";")[0].strip().lower()
+            if content_type not in _SCRAPE_TYPES:
+                raise ValueError(f"Unsupported content type {content_type}")
+
+            charset = "charset=" in response.headers.get("Content-Type", "")
+            encoding = response.encoding if charset else None
+            chunks = _capped_chunks(response, url)
+            body = parse(chunks, content_type, encoding) if parse else b"".join(chunks)
+            return (body, content_type, encoding, url, validators)
+
+    raise ValueError(f"Too many redirects for {url}")
+
+
+def _capped_chunks(response, url: str):
+    """Yield the response body in chunks, stopping after `scrapeMaxBytes`."""
+    read = 0
+    for chunk in response.iter_content(chunk_size=64 * 1024):
+        if read + len(chunk) >= _SCRAPE_MAX_BYTES:
+            _LOGGER.info(f"{url} truncated at {_SCRAPE_MAX_BYTES} bytes")
+            yield chunk[:_SCRAPE_MAX_BYTES - read]
+            return
+        read += len(chunk)
+        yield chunk
+
+
+def _page_text(chunks, content_type: str, encoding: str | None) -> str:
+    """Readable text of a fetched page, parsed while it downloads (see htmltext.py)."""
+    if content_type == "text/plain":
+        return " ".join(b"".join(chunks).decode(encoding or "utf-8", errors="replace").split())
+    return html_to_text(chunks, encoding)
+
+
 def _scrape_requests_html(url: str) -> str:
     """
     Scraps web content using requests-html. 
     Raises an HTTPError if the status isn't successful.
     Returns the text as a string.
     
-    Note that error is handled in _robust_scrape
+    Note that error is handled in _robust_scrape. The page is fetched through
+    `_fetch_page`, so the same size cap and host checks apply.
     """
-    session = HTMLSession()
-    response = session.get(url)
-    response.raise_for_status()
+    body, _, encoding, url, _ = _fetch_page(url)
+    if body is None:
+        return ""
+    text = HTML(url=url, html=body, default_encoding=encoding or "utf-8").text
     _LOGGER.info(f"{url} scraped with requests-html")
-    return response.html.text
+    return text
 
 
-def _scrape_bs4(url: str) -> str:
+def _scrape_page(url: str, cached: dict | None = None) -> tuple:
     """
-    Fetch the text content of a webpage using requests + BeautifulSoup.
-    Raises an HTTPError if the status isn't successful.
-    Returns the text as a string.
+    Fetch the text content of a webpage using the pooled scrape session,
+    extracting it while the page downloads. Raises if the fetch fails (see
+    `_fetch_page`). Returns (text, final_url, validators); `text` is None if
+    the page is unchanged since `cached` was fetched.
     
     Note that error is handled in _robust_scrape
     """
-    
-    headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}    
-    response = requests.get(url, headers=headers)
+    text, _, _, url, validators = _fetch_page(url, cached, parse=_page_text)
+    if text is not None:
+        _LOGGER.info(f"{url} scraped")
+    return (text, url, validators)
 
-    response.raise_for_status() # raises of 400 or 500 error in response
-    
-    soup = BeautifulSoup(response.text, "html.parser")
 
-    # Extracting the main content (removing scripts, styles, and ads)
-    for unwanted in soup(["script", "style", "header", "footer", "nav", "aside"]):
-        unwanted.extract()  # Remove these elements
+def _robust_scrape(url: str) -> tuple:
+    """
+    Return the text of `url` and its SHA-256, from the page cache while the
+    entry is fresh or the server reports it unchanged. Otherwise attempts to
+    scrape using the pooled session and the HTML text extractor first. Only
+    if that succeeds but yields no text (e.g. a page rendered by scripts) is
+    requests-html tried. If the fetch fails, a cached copy is used when there
+    is one.
 
-    text = soup.get_text(separator=" ", strip=True)  # Extract clean text
-    
-    # Limit length to avoid very long output
-    clean_text = " ".join(text.split())  # First 500 words
-    return clean_text
+    Returns:
+        tuple: (text, digest), or (None, None) if no text was obtained.
+    """
+    try:
+        key = normalize_url(url)
+    except ValueError as e:
+        # e.g. a port that is not a number
+        _LOGGER.error(f"Failed to scrape {url}: {e}")
+        return (None, None)
+
+    cached = _PAGE_CACHE.get(key)
+    if cached and time.time() - cached["fetched"] < _PAGE_FRESH:
+        _PAGE_CACHE.touch(key)
+        _LOGGER.info(f"{url} served from page cache")
+        return (cached["text"], cached["digest"])
 
-    soup = BeautifulSoup(response.text, "html.parser")
-    _LOGGER.info(f"{url} scraped with BeautifulSoup")
-    return soup.get_text()
+    try:
+        text, final_url, validators = _scrape_page(url, cached)
+    except Exception as e:
+        if cached:
+            _LOGGER.warning(f"Failed to refresh {url}, using cached copy: {e}")
+            _PAGE_CACHE.touch(key)
+            return (cached["text"], cached["digest"])
+        _LOGGER.error(f"Failed to scrape {url}: {e}")
+        return (None, None)
+
+    if text is None and not cached:
+        # A 304 to an unconditional request; there is nothing to serve
+        _LOGGER.error(f"Failed to scrape {url}: unexpected 304 Not Modified")
+        return (None, None)
+
+    if text is None:
+        _LOGGER.info(f"{url} not modified, served from page cache")
+        _PAGE_CACHE.touch(key, revalidated=True)
+        return (cached["text"], cached["digest"])
+
+    if not text:
+        try:
+            text = _scrape_requests_html(final_url)
+        except Exception as e:
+            _LOGGER.error(f"Requests-html failed to scrape {url}: {e}")
+        if not text:
+            return (None, None)
 
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    _PAGE_CACHE.put(key, text, digest, validators["etag"], validators["last_modified"])
+    return (text, digest)
 
-def _robust_scrape(url: str) -> str | None:
+
+def _ingest(files: list, sid: str, user: str, room_id: str) -> None:
     """
-    Attempts to scrape using BeautifulSoup first,
-    If that fails, uses requests-html.
-    If both fail, returns None.
+    Background job: download and upload every attachment concurrently, wait
+    until the session answers retrievals with the new content, and tell the
+    user which files made it. Runs outside any Flask request.
     """
     try:
-        return _scrape_bs4(url)
+        baseline = _probe_session(sid)
+        results = _ingest_files(files, sid)
+        uploaded = [r["name"] for r in results if r["ok"] and not r["duplicate"]]
+        duplicates = [r["name"] for r in results if r["duplicate"]]
+        failed = [r["name"] for r in results if not r["ok"]]
+
+        ready = _wait_until_queryable(sid, baseline) if uploaded else False
+
+        if uploaded and ready:
+            text = f"✅ {', '.join(uploaded)} {'is' if len(uploaded) == 1 else 'are'} ready! What's next?"
+        elif uploaded:
+            text = f"⏳ {', '.join(uploaded)} uploaded and should be available in a moment. What's next?"
+        elif duplicates:
+            text = f"📄 {', '.join(duplicates)} {'is' if len(duplicates) == 1 else 'are'} already in our conversation's context. What's next?"
+        else:
+            text = "⚠️ An issue was encountered saving the file. Please try again."
+        if uploaded and duplicates:
+            text += f"\n📄 Already in context: {', '.join(duplicates)}."
+        if (uploaded or duplicates) and failed:
+            text += f"\n⚠️ Could not add: {', '.join(failed)}. Please try sending them again."
+
+        _post_message(text, room_id=room_id, channel=f"@{user}")
+
     except Exception as e:
-        _LOGGER.error(f"BeautifulSoup failed to scrape {url}: {e}")
-        pass
+        _LOGGER.error(f"File ingestion failed for session <{sid}>: {e}", exc_info=True)
+        _post_message("⚠️ An issue was encountered saving the file. Please try again.",
+                      room_id=room_id, channel=f"@{user}")
+
+
+def _ingest_files(files: list, sid: str) -> list:
+    """
+    Download and upload attachments on the bounded file pool.
+
+    Returns:
+        list: One status dict per file, in the order given (see `_ingest_file`).
+    """
+    start = time.perf_counter()
+    results = list(_FILE_POOL.map(lambda f: _ingest_file(f, sid), files))
+    ok = sum(r["ok"] for r in results)
+    total = sum(r["bytes"] for r in results)
+    _LOGGER.info(f"Ingested {ok}/{len(results)} file(s), {total} bytes, for session <{sid}> in {time.perf_counter() - start:.2f}s")
+    return results
+
+
+def _ingest_file(file_info: dict, sid: str) -> dict:
+    """
+    Download one attachment from Rocket.Chat and upload it to the session's RAG
+    (skipped if the same bytes were already added). Never raises, so one bad
+    file cannot stop the others.
+
+    Returns:
+        dict: {"name", "ok", "duplicate", "bytes", "download_s", "upload_s", "error"}
+    """
+    filename = file_info.get("name", "file")
+    result = {"name": filename, "ok": False, "duplicate": False, "bytes": 0,
+              "download_s": 0.0, "upload_s": 0.0, "error": None}
 
     try:
-        return _scrape_requests_html(url)
+        # Download file
+        start = time.perf_counter()
+        spool = _download_file(file_info.get("_id"), filename)
+        result["download_s"] = time.perf_counter() - start
+        if not spool:
+            result["error"] = "download failed"
+            return result
+
+        # upload it to RAG so that session has the file
+        with spool:
+            result["bytes"] = spool.tell()
+            spool.seek(0)
+            start = time.perf_counter()
+            response, result["duplicate"] = upload_once(spool, sid, description=filename, strategy='smart')
+            result["upload_s"] = time.perf_counter() - start
+        result["ok"] = result["duplicate"] or str(response).startswith("Successfully")
+        if not result["ok"]:
+            result["error"] = str(response)
+
     except Exception as e:
-        _LOGGER.error(f"Requests-html failed to scrape {url}: {e}")
-        pass
-    
-    return None
+        result["error"] = str(e)
+
+    finally:
+        _LOGGER.info(
+            f"File <{filename}> for session <{sid}>: ok={result['ok']}, duplicate={result['duplicate']}, bytes={result['bytes']}, "
+            f"download={result['download_s']:.2f}s, upload={result['upload_s']:.2f}s, error={result['error']}"
+        )
+    return result
+
+
+def _file_digest(file) -> str:
+    """Return the SHA-256 hex digest of a binary file object, rewound to the start."""
+    file.seek(0)
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: file.read(1024 * 1024), b""):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def _probe_session(sid: str):
+    """Return a cheap retrieval from the session, used to detect new documents."""
+    return retrieve(query="resume", session_id=sid, rag_threshold=0.0, rag_k=50)
+
+
+def _wait_until_queryable(sid: str, baseline) -> bool:
+    """
+    Poll the session with exponential backoff until its retrieval result
+    changes from `baseline` (i.e. new documents are indexed).
+
+    Returns:
+        bool: True once the new content is queryable, False on timeout.
+    """
+    delay = _INGEST_POLL_START
+    deadline = time.monotonic() + _INGEST_TIMEOUT
+    while time.monotonic() + delay <= deadline:
+        sleep(delay)
+        probe = _probe_session(sid)
+        if probe and not isinstance(probe, str) and probe != baseline:
+            return True
+        delay = min(delay * 2, _INGEST_POLL_MAX)
+
+    _LOGGER.warning(f"Uploaded documents for session <{sid}> not queryable after {_INGEST_TIMEOUT}s.")
+    return False
+
+
+def _post_message(text: str, room_id: str = "", channel: str = "", attachments: list | None = None) -> bool:
+    """
+    Post a message to a Rocket.Chat room (by id) or channel/user (e.g. "@name").
+
+    Returns:
+        bool: True if Rocket.Chat accepted the message, otherwise False.
+    """
+    if not _ROCKET_URL or not _ROCKET_UID or not _ROCKET_TOKEN:
+        _LOGGER.error("Rocket.Chat environment variables are missing.")
+        return False
+
+    payload = {"text": text}
+    if room_id:
+        payload["roomId"] = room_id
+    else:
+        payload["channel"] = channel
+    if attachments:
+        payload["attachments"] = attachments
+
+    try:
+        response = requests.post(
+            f"{_ROCKET_URL}/api/v1/chat.postMessage",
+            json=payload,
+            headers={"X-User-Id": _ROCKET_UID, "X-Auth-Token": _ROCKET_TOKEN},
+            timeout=10
+        )
+        _LOGGER.info(f"Rocket.Chat postMessage to <{room_id or channel}>: {response.status_code}")
+        UPSTREAM.inc(upstream="rocketchat", op="postMessage", status=response.status_code)
+        return response.status_code == 200
+    except requests.exceptions.RequestException as e:
+        UPSTREAM.inc(upstream="rocketchat", op="postMessage", status="error")
+        _LOGGER.error(f"Failed to post message to Rocket.Chat: {e}")
+        return False
 
 
 def _allowed_files(filename):
@@ -704,26 +1719,40 @@ def _allowed_files(filename):
 
 
 def _download_file(file_id, filename):
-    """Download file from Rocket.Chat and save locally."""
-
-    if _allowed_files(filename):
-        file_url = f"{_ROCKET_URL}/file-upload/{file_id}/{filename}"
-        headers = {
-            "X-User-Id": _ROCKET_UID,
-            "X-Auth-Token": _ROCKET_TOKEN
-        }
-
-        response = requests.get(file_url, headers=headers, stream=True)
-        if response.status_code == 200:
-            local_path = os.path.join(_UPLOADS, filename)
-            _LOGGER.info(f"Local filepath: {local_path}")
-            with open(local_path, "wb") as file:
-                for chunk in response.iter_content(chunk_size=8192):
-                    file.write(chunk)
-            return local_path
-    
-    print(f"INFO - some issue with {filename} with {response.status_code} code")
-    return None
+    """
+    Download a file from Rocket.Chat into a spooled buffer. Nothing is written
+    to disk unless the file exceeds `spoolMaxBytes`, and then only to an
+    anonymous temp file that is removed when the buffer is closed.
+
+    Returns:
+        SpooledTemporaryFile | None: The buffer positioned at its end (so
+        `tell()` is the size), or None if the file was not allowed or the
+        download failed. The caller must close it.
+    """
+    if not _allowed_files(filename):
+        _LOGGER.info(f"Skipping {filename}: file type not allowed")
+        return None
+
+    file_url = f"{_ROCKET_URL}/file-upload/{file_id}/{filename}"
+    headers = {
+        "X-User-Id": _ROCKET_UID,
+        "X-Auth-Token": _ROCKET_TOKEN
+    }
+
+    with requests.get(file_url, headers=headers, stream=True, timeout=(5, 60)) as response:
+        UPSTREAM.inc(upstream="rocketchat", op="download", status=response.status_code)
+        if response.status_code != 200:
+            _LOGGER.info(f"Some issue with {filename} with {response.status_code} code")
+            return None
+
+        spool = tempfile.SpooledTemporaryFile(max_size=_SPOOL_MAX_BYTES)
+        try:
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                spool.write(chunk)
+        except Exception:
+            spool.close()
+            raise
+        return spool
 
 
 def _send_message_with_file(room_id, message, file_path):
@@ -733,10 +1762,11 @@ def _send_message_with_file(room_id, message, file_path):
         "X-User-Id": _ROCKET_UID,
         "X-Auth-Token": _ROCKET_TOKEN
     }
-    files = {"file": (os.path.basename(file_path), open(file_path, "rb"))}
     data = {"msg": message}
 
-    response = requests.post(url, headers=headers, files=files, data=data)
+    with open(file_path, "rb") as f:
+        files = {"file": (os.path.basename(file_path), f)}
+        response = requests.post(url, headers=headers, files=files, data=data)
     if response.status_code != 200:
         return {"error": f"Failed to upload file, Status Code: {response.status_code}, Response: {response.text}"}
     try:
@@ -0,0 +1,186 @@
+# writer.py
+
+import time, queue, atexit, threading
+from config import get_logger
+
+# Setup logging
+_LOGGER = get_logger(__name__)
+
+# DynamoDB accepts at most 25 put requests per batch_write_item call
+_MAX_BATCH = 25
+
+class WriteBehindQueue:
+    """
+    Buffer DynamoDB items in memory and write them from a background thread
+    with `batch_write_item`, so callers never wait on the write.
+
+    Parameters:
+        resource: A boto3 DynamoDB service resource (or anything with a
+            compatible `batch_write_item`).
+        table_name (str): The table the items are written to.
+        key (str): The table's partition key, used to collapse duplicates
+            within a batch (DynamoDB rejects batches with repeated keys).
+        maxsize (int): Maximum buffered items. Bounds memory use.
+        policy (str): What to do when the buffer is full: "drop_newest"
+            discards the incoming item, "drop_oldest" discards the oldest
+            buffered item, "block" waits up to `block_timeout` seconds.
+        flush_interval (float): Seconds to wait for a batch to fill up.
+    """
+    def __init__(self, resource, table_name: str, key: str = "uid", maxsize: int = 10000,
+                 policy: str = "drop_oldest", flush_interval: float = 1.0,
+                 block_timeout: float = 0.5, retries: int = 3):
+        self.resource = resource
+        self.table_name = table_name
+        self.key = key
+        self.policy = policy
+        self.flush_interval = flush_interval
+        self.block_timeout = block_timeout
+        self.retries = retries
+
+        self.enqueued = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.flushes = 0
+        self.flush_seconds = 0.0
+        self.last_flush_seconds = 0.0
+
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopping = threading.Event()
+        self._registered = False
+
+    def put(self, item: dict) -> bool:
+        """
+        Buffer `item` for writing. Never raises; returns False if the item (or,
+        under "drop_oldest", an older one) had to be dropped.
+        """
+        self._ensure_started()
+        try:
+            if self.policy == "block":
+                self._queue.put(item, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(item)
+            self.enqueued += 1
+            return True
+        except queue.Full:
+            pass
+
+        if self.policy == "drop_oldest":
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                self._queue.put_nowait(item)
+                self.enqueued += 1
+            except queue.Full:
+                pass
+
+        self.dropped += 1
+        _LOGGER.warning(f"Write-behind queue for {self.table_name} is full ({self.policy}); dropped an item.")
+        return False
+
+    def flush(self) -> None:
+        """Synchronously write everything currently buffered."""
+        while True:
+            batch = self._drain(_MAX_BATCH)
+            if not batch:
+                return
+            self._write(batch)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Stop the worker and flush what is left. Registered to run at exit."""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.flush()
+
+    def stats(self) -> dict:
+        """Return queue depth, drop/write counters and flush latency."""
+        return {
+            "depth": self._queue.qsize(),
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "written": self.written,
+            "failed": self.failed,
+            "flushes": self.flushes,
+            "flush_seconds_total": self.flush_seconds,
+            "last_flush_seconds": self.last_flush_seconds,
+        }
+
+    def _ensure_started(self) -> None:
+        # Started lazily so importing modules (CLI scripts, forked workers)
+        # don't carry a thread they never use.
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping.clear()
+                self._thread = threading.Thread(
+                    target=self._run, name=f"write-behind-{self.table_name}", daemon=True
+                )
+                self._thread.start()
+                if not self._registered:
+                    atexit.register(self.stop)
+                    self._registered = True
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+
+            # Give the batch a moment to fill before writing it
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < _MAX_BATCH:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._write(batch)
+
+    def _drain(self, limit: int) -> list:
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: list) -> None:
+        start = time.perf_counter()
+
+        # Later items win when the same key appears twice in one batch
+        unique = {item[self.key]: item for item in batch}
+        requests = [{"PutRequest": {"Item": item}} for item in unique.values()]
+
+        attempt = 0
+        try:
+            while requests:
+                resp = self.resource.batch_write_item(RequestItems={self.table_name: requests})
+                requests = resp.get("UnprocessedItems", {}).get(self.table_name, [])
+                if not requests:
+                    break
+                attempt += 1
+                if attempt > self.retries:
+                    raise RuntimeError(f"{len(requests)} item(s) still unprocessed after {self.retries} retries")
+                time.sleep(0.05 * 2 ** attempt)
+            self.written += len(unique)
+        except Exception as e:
+            failed = len(requests) if requests else len(unique)
+            self.failed += failed
+            self.written += len(unique) - failed
+            _LOGGER.error(f"Write-behind flush to {self.table_name} failed for {failed} item(s): {e}", exc_info=True)
+
+        elapsed = time.perf_counter() - start
+        self.flushes += 1
+        self.flush_seconds += elapsed
+        self.last_flush_seconds = elapsed